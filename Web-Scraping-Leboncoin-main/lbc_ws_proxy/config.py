@@ -25,6 +25,12 @@ if not BROWSER_AUTH:
 # URL du WebSocket pour le navigateur Bright Data
 SBR_WS_CDP = f'wss://{BROWSER_AUTH}@brd.superproxy.io:9222'
 
+# Téléchargement des photos (voir image_fetcher.py) : threads, requêtes simultanées
+# par hôte et intervalle minimal (secondes) entre deux requêtes vers un même hôte
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", 8))
+IMAGE_PER_HOST = int(os.getenv("IMAGE_PER_HOST", 4))
+IMAGE_MIN_INTERVAL = float(os.getenv("IMAGE_MIN_INTERVAL", 0.1))
+
 # Configuration de la base de données PostgreSQL
 hostname = os.getenv("POSTGRESQL_HOST", "localhost")
 port = os.getenv("POSTGRESQL_PORT", "5432")
@@ -1,8 +1,5 @@
-import urllib.request
-import ssl
 import psycopg2
 from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
 from typing import Dict, List, Optional
 import asyncio
 import json
@@ -11,6 +8,7 @@ import datetime
 import os
 from contextlib import suppress
 from config import *
+from image_fetcher import ImageFetcher
 
 
 # Logique Metier et Methode principale pour le scraping des annonces Leboncoin avec Playwright et Bright Data
@@ -102,42 +100,25 @@ def save_to_db(data: Dict, url: str, image_paths: List[Optional[str]], screensho
         cursor.close()
         conn.close()
 
-# Fonction pour télécharger une image avec gestion automatique des erreurs et des délais
+# Session partagée pour les photos, à travers le proxy résidentiel (voir image_fetcher.py)
+image_fetcher = ImageFetcher(
+    proxy,
+    headers={
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/129.0.0.0 Safari/537.36',
+        'Accept': 'image/avif,image/webp,image/apng,image/*,*/*;q=0.8',
+        'Accept-Language': 'fr-FR,fr;q=0.9,en-US;q=0.8,en;q=0.7',
+        'Referer': 'https://www.leboncoin.fr/'
+    },
+    max_workers=IMAGE_WORKERS,
+    per_host=IMAGE_PER_HOST,
+    min_interval=IMAGE_MIN_INTERVAL
+)
+
+# Fonction pour télécharger une image (connexions réutilisées, nouvelles tentatives sur 429/5xx)
 # Paramètre : url (str) – lien direct de l’image à télécharger
 # Retourne le contenu de l’image sous forme de bytes si succès, sinon None
-@retry(
-    stop=stop_after_attempt(3),
-    wait=wait_exponential(multiplier=1, min=4, max=10),
-    retry=retry_if_exception_type((urllib.error.URLError, urllib.error.HTTPError))
-)
 def fetch_image(url: str) -> Optional[bytes]:
-    """Télécharge une image en utilisant urllib.request avec le proxy résidentiel."""
-    try:
-        opener = urllib.request.build_opener(
-            urllib.request.ProxyHandler({'https': proxy, 'http': proxy}),
-            urllib.request.HTTPSHandler(context=ssl._create_unverified_context())
-        )
-        opener.addheaders = [
-            ('User-Agent', 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/129.0.0.0 Safari/537.36'),
-            ('Accept', 'image/avif,image/webp,image/apng,image/*,*/*;q=0.8'),
-            ('Accept-Language', 'fr-FR,fr;q=0.9,en-US;q=0.8,en;q=0.7'),
-            ('Accept-Encoding', 'gzip, deflate, br'),
-            ('Connection', 'keep-alive'),
-            ('Referer', 'https://www.leboncoin.fr/')
-        ]
-        response = opener.open(url, timeout=10)
-        if response.getcode() == 200:
-            print(f"Image téléchargée avec succès depuis {url} (Statut: {response.getcode()})")
-            return response.read()
-        else:
-            print(f"Échec du téléchargement de l'image depuis {url} (Statut: {response.getcode()})")
-            return None
-    except (urllib.error.URLError, urllib.error.HTTPError) as e:
-        print(f"Erreur lors du téléchargement de l'image {url}: {str(e)}")
-        return None
-    except Exception as e:
-        print(f"Erreur inattendue lors du téléchargement de l'image {url}: {str(e)}")
-        return None
+    return image_fetcher.fetch(url)
 
 # Fonction de sauvegarde complète des données issues du scraping
 # Paramètres :
@@ -167,9 +148,12 @@ def save_data(
     image_urls = incoming_data.get('images', {}).get('urls', [])
     error_count = 0
 
-    for i, url in enumerate(image_urls, start=1):
+    # Téléchargement en parallèle, dans l'ordre des URLs ; l'espacement des requêtes
+    # vers un même hôte remplace la pause d'une seconde entre deux images
+    images = image_fetcher.fetch_all(image_urls)
+
+    for i, (image_url, image_data) in enumerate(zip(image_urls, images), start=1):
         try:
-            image_data = fetch_image(url)
             if image_data:
                 image_filename = f"{request_dir}/image_{timestamp}_{i}.jpeg"
                 with open(image_filename, "wb") as img_file:
@@ -179,12 +163,11 @@ def save_data(
             else:
                 image_paths.append(None)
                 error_count += 1
-                print(f"Échec du téléchargement de l'image {i} depuis {url}")
-            time.sleep(1)  # Délai pour éviter les blocages
+                print(f"Échec du téléchargement de l'image {i} depuis {image_url}")
         except Exception as e:
             image_paths.append(None)
             error_count += 1
-            print(f"Échec du téléchargement de l'image {i} depuis {url}: {str(e)}")
+            print(f"Échec du téléchargement de l'image {i} depuis {image_url}: {str(e)}")
 
     incoming_data.pop('image_1', None)  # Nettoyage si image_1 était présent
     incoming_data['image_paths'] = image_paths
@@ -341,7 +324,6 @@ async def scrape_search(url: str, analyzer: WebScrapingPerformanceAnalyzer) -> O
                         'ges': get_object_by_value(search_data.get("attributes", []), "key", "ges"),
                         'description': search_data.get("body", None),
                         'images': {"urls": search_data.get('images', {}).get('urls', [])},
-                        'image_1': fetch_image(search_data.get('images', {}).get('urls', [None])[0]) if search_data.get('images', {}).get('urls') else None,
                         "html_content": html_content
                     }
 
@@ -0,0 +1,117 @@
+"""
+Scraping groupé des annonces d'un utilisateur (rafraîchissement de ses biens enregistrés).
+
+Les annonces sont scrapées simultanément, au plus SITE_CONCURRENCY[site] à la fois
+par site, avec les connexions du pool de navigateurs (browser_pool.py). Les
+résultats sont ensuite écrits dans saved_properties en une seule transaction
+(save_many_to_db) plutôt qu'annonce par annonce.
+
+Usage (ligne de commande) :
+    python batch_scrape.py annonces.json --user-id 12
+où annonces.json contient une liste [{"url": "...", "id": 123}, ...].
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import Dict, List
+from urllib.parse import urlparse
+
+from config import WebScrapingPerformanceAnalyzer, SITE_CONCURRENCY
+from lbc_ws_proxy_methods import browser_pool, property_row, save_many_to_db, scrape_search
+
+# Sites dont ce scraper sait lire les annonces
+SUPPORTED_SITES = ("leboncoin.fr",)
+# Nombre maximal d'annonces par lot
+MAX_BATCH_SIZE = 200
+
+
+def site_of(url: str) -> str:
+    """'https://www.leboncoin.fr/ad/...' -> 'leboncoin.fr' (None si le site n'est pas pris en charge)."""
+    host = (urlparse(url).hostname or "").lower()
+    return next((site for site in SUPPORTED_SITES if host == site or host.endswith("." + site)), None)
+
+
+def item_id(row: tuple):
+    # property_row se termine par (id, user_id)
+    return row[-2]
+
+
+async def scrape_batch(items: List[Dict], user_id: int, analyzer: WebScrapingPerformanceAnalyzer) -> Dict:
+    """
+    Scrape les annonces [{"url", "id"}] puis les enregistre en base.
+    Retourne l'état de chaque annonce (saved, not_found, failed, unsupported) et la durée totale.
+    """
+    started = time.perf_counter()
+    semaphores = {}
+
+    async def scrape_one(item):
+        status = {"id": item["id"], "url": item["url"]}
+        site = site_of(item["url"])
+        if site is None:
+            return {**status, "status": "unsupported"}, None
+
+        semaphore = semaphores.setdefault(site, asyncio.Semaphore(SITE_CONCURRENCY.get(site, 1)))
+        async with semaphore:
+            item_started = time.perf_counter()
+            try:
+                data = await scrape_search(item["url"], analyzer, item["id"], user_id, save_to_database=False)
+            except Exception as e:
+                data = None
+                status["error"] = str(e)
+            status["duration_s"] = round(time.perf_counter() - item_started, 2)
+        if data is None:
+            return {**status, "status": "failed"}, None
+        row = property_row(item["id"], user_id, data, item["url"], data.get("image_paths"), data.get("screenshot_path"))
+        return status, row
+
+    results = await asyncio.gather(*(scrape_one(item) for item in items))
+
+    rows = [row for _, row in results if row is not None]
+    db_error = None
+    try:
+        saved = await asyncio.to_thread(save_many_to_db, user_id, rows)
+    except Exception as e:
+        print(f"Erreur lors de l'enregistrement du lot : {str(e)}")
+        saved, db_error = set(), str(e)
+
+    statuses = []
+    for status, row in results:
+        if row is not None and db_error is not None:
+            status.update(status="failed", error=db_error)
+        elif row is not None:
+            status["status"] = "saved" if item_id(row) in saved else "not_found"
+        statuses.append(status)
+
+    counts = {}
+    for status in statuses:
+        counts[status["status"]] = counts.get(status["status"], 0) + 1
+    return {"items": statuses, "counts": counts, "duration_s": round(time.perf_counter() - started, 2)}
+
+
+def validate_items(items) -> List[Dict]:
+    """Liste [{"url", "id"}] vérifiée ; lève ValueError si le lot est mal formé."""
+    if not isinstance(items, list) or not items:
+        raise ValueError("'items' doit être une liste non vide de {url, id}.")
+    if len(items) > MAX_BATCH_SIZE:
+        raise ValueError(f"Au plus {MAX_BATCH_SIZE} annonces par lot.")
+    for item in items:
+        if not isinstance(item, dict) or not item.get("url") or item.get("id") is None:
+            raise ValueError("Chaque annonce doit avoir les champs 'url' et 'id'.")
+    return [{"url": item["url"], "id": item["id"]} for item in items]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scraping groupé d'annonces Leboncoin")
+    parser.add_argument("fichier", help="Fichier JSON : liste de {url, id}")
+    parser.add_argument("--user-id", type=int, required=True, help="Propriétaire des annonces (saved_properties.user_id)")
+    args = parser.parse_args()
+
+    with open(args.fichier, encoding="utf-8") as f:
+        batch = validate_items(json.load(f))
+
+    report = browser_pool.run(scrape_batch(batch, args.user_id, WebScrapingPerformanceAnalyzer()))
+    for entry in report["items"]:
+        print(f"{entry['status']:<12} {entry['id']:<8} {entry['url']}")
+    print(f"{report['counts']} en {report['duration_s']} s")
+    browser_pool.close()
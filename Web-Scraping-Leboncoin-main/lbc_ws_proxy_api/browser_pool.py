@@ -0,0 +1,203 @@
+"""
+Pool de connexions CDP vers le navigateur distant Bright Data.
+
+Chaque scraping ouvrait sa propre connexion (connect_over_cdp) puis la fermait :
+la poignée de main avec le navigateur distant était payée à chaque annonce. Le
+pool garde jusqu'à max_size connexions ouvertes, prête une page neuve par
+scraping et remplace les connexions déconnectées, inactives depuis plus de
+idle_timeout secondes ou utilisées max_uses fois.
+
+Les objets Playwright sont liés à la boucle asyncio qui les a créés : le pool a
+donc sa propre boucle, dans un thread, et les routes Flask y exécutent leurs
+coroutines avec pool.run(...) au lieu de asyncio.run(...).
+"""
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager, suppress
+
+from playwright.async_api import async_playwright
+
+# Intervalle entre deux passages de fermeture des connexions inactives (secondes)
+REAP_INTERVAL = 30
+
+
+class _Connection:
+    """Connexion CDP ouverte et son contexte de navigation."""
+
+    def __init__(self, browser, context):
+        self.browser = browser
+        self.context = context
+        self.last_used = time.monotonic()
+        self.uses = 0
+
+    @property
+    def healthy(self) -> bool:
+        return self.browser.is_connected()
+
+
+class BrowserPool:
+    """Connexions CDP réutilisées d'un scraping à l'autre, avec taille maximale."""
+
+    def __init__(self, ws_endpoint: str, max_size: int = 4, idle_timeout: float = 300,
+                 max_uses: int = 50, connect_timeout: float = 30000):
+        self.ws_endpoint = ws_endpoint
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.max_uses = max_uses
+        self.connect_timeout = connect_timeout
+
+        self._playwright = None
+        self._idle = []      # connexions disponibles, la dernière rendue en fin de liste
+        self._size = 0       # connexions ouvertes ou en cours d'ouverture (prêtées comprises)
+        self._condition = asyncio.Condition()
+        self._start_lock = asyncio.Lock()
+        self._stats = {
+            "acquires": 0, "reused": 0, "connections_opened": 0,
+            "discarded": 0, "evicted": 0, "acquire_total_s": 0.0, "acquire_max_s": 0.0,
+        }
+
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, name="browser-pool", daemon=True).start()
+        asyncio.run_coroutine_threadsafe(self._reap(), self.loop)
+
+    def run(self, coro, timeout: float = None):
+        """Exécute la coroutine dans la boucle du pool et attend son résultat (appel bloquant)."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+    @asynccontextmanager
+    async def page(self):
+        """
+        Prête une page neuve. À la sortie, la page est fermée et la connexion rendue au
+        pool, ou fermée si le scraping a échoué (session bloquée ou déconnectée).
+        """
+        connection, page = await self._acquire()
+        failed = False
+        try:
+            yield page
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            with suppress(Exception):
+                await page.close()
+            await self._release(connection, failed)
+
+    def stats(self) -> dict:
+        """Compteurs du pool : latence d'obtention d'une page et taux de réutilisation des connexions."""
+        s = dict(self._stats)
+        acquires = s.pop("acquires")
+        total = s.pop("acquire_total_s")
+        longest = s.pop("acquire_max_s")
+        return {
+            **s,
+            "acquires": acquires,
+            "size": self._size,
+            "idle": len(self._idle),
+            "max_size": self.max_size,
+            "reuse_ratio": round(s["reused"] / acquires, 3) if acquires else None,
+            "acquire_avg_ms": round(total / acquires * 1000, 1) if acquires else None,
+            "acquire_max_ms": round(longest * 1000, 1),
+        }
+
+    def close(self):
+        """Ferme toutes les connexions disponibles et Playwright."""
+        self.run(self._close())
+
+    async def _acquire(self):
+        started = time.perf_counter()
+        while True:
+            connection, reused = await self._checkout()
+            try:
+                # Ouvrir la page sert aussi de sonde : une connexion réutilisée hors d'usage est remplacée
+                page = await connection.context.new_page()
+            except Exception:
+                await self._discard(connection)
+                if not reused:
+                    raise
+                continue
+
+            elapsed = time.perf_counter() - started
+            self._stats["acquires"] += 1
+            self._stats["reused"] += int(reused)
+            self._stats["acquire_total_s"] += elapsed
+            self._stats["acquire_max_s"] = max(self._stats["acquire_max_s"], elapsed)
+            return connection, page
+
+    async def _checkout(self):
+        """(connexion, réutilisée) : la dernière connexion rendue, sinon une nouvelle dans la limite max_size."""
+        async with self._condition:
+            while True:
+                while self._idle:
+                    connection = self._idle.pop()
+                    if connection.healthy:
+                        return connection, True
+                    self._size -= 1
+                    self._stats["discarded"] += 1
+                if self._size < self.max_size:
+                    self._size += 1
+                    break
+                await self._condition.wait()
+
+        try:
+            return await self._connect(), False
+        except BaseException:
+            async with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+
+    async def _connect(self) -> _Connection:
+        async with self._start_lock:
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+        browser = await self._playwright.chromium.connect_over_cdp(self.ws_endpoint, timeout=self.connect_timeout)
+        context = browser.contexts[0] if browser.contexts else await browser.new_context()
+        self._stats["connections_opened"] += 1
+        return _Connection(browser, context)
+
+    async def _release(self, connection: _Connection, failed: bool):
+        connection.uses += 1
+        connection.last_used = time.monotonic()
+        if failed or not connection.healthy or connection.uses >= self.max_uses:
+            await self._discard(connection)
+            return
+        async with self._condition:
+            self._idle.append(connection)
+            self._condition.notify()
+
+    async def _discard(self, connection: _Connection):
+        async with self._condition:
+            self._size -= 1
+            self._stats["discarded"] += 1
+            self._condition.notify()
+        with suppress(Exception):
+            await connection.browser.close()
+
+    async def _reap(self):
+        """Ferme régulièrement les connexions inactives depuis plus de idle_timeout secondes."""
+        while True:
+            await asyncio.sleep(REAP_INTERVAL)
+            now = time.monotonic()
+            async with self._condition:
+                expired = [c for c in self._idle if not c.healthy or now - c.last_used > self.idle_timeout]
+                if not expired:
+                    continue
+                self._idle = [c for c in self._idle if c not in expired]
+                self._size -= len(expired)
+                self._stats["evicted"] += len(expired)
+                self._condition.notify(len(expired))
+            for connection in expired:
+                with suppress(Exception):
+                    await connection.browser.close()
+
+    async def _close(self):
+        async with self._condition:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+        for connection in idle:
+            with suppress(Exception):
+                await connection.browser.close()
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
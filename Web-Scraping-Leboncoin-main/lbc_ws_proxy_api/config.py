@@ -1,5 +1,7 @@
 import os
 import datetime
+import matplotlib
+matplotlib.use("Agg")  # pas d'affichage : les graphiques sont seulement enregistrés
 import matplotlib.pyplot as plt
 import pandas as pd
 from dotenv import load_dotenv
@@ -24,6 +26,48 @@ if not BROWSER_AUTH:
 # URL du WebSocket pour le navigateur Bright Data
 SBR_WS_CDP = f'wss://{BROWSER_AUTH}@brd.superproxy.io:9222'
 
+# Voie rapide : page obtenue par une requête HTTP à travers le proxy avant de recourir au navigateur (voir html_fetcher.py)
+SCRAPE_HTTP_FAST_PATH = os.getenv("SCRAPE_HTTP_FAST_PATH", "true").lower() in ("1", "true", "yes")
+# Blocage des images, polices, médias et scripts tiers pendant le chargement des pages (voir resource_blocking.py)
+SCRAPE_BLOCK_RESOURCES = os.getenv("SCRAPE_BLOCK_RESOURCES", "true").lower() in ("1", "true", "yes")
+
+# Échéance (ms) de l'attente du bandeau de consentement, tous sélecteurs confondus
+CONSENT_TIMEOUT = int(os.getenv("CONSENT_TIMEOUT", 3000))
+
+# Captures d'écran (voir screenshots.py) : mode par défaut (none, inline, deferred), format (jpeg, webp, png),
+# qualité JPEG/WebP et capture de la page entière plutôt que de la seule partie visible
+SCREENSHOT_MODE = os.getenv("SCREENSHOT_MODE", "none")
+SCREENSHOT_FORMAT = os.getenv("SCREENSHOT_FORMAT", "jpeg")
+SCREENSHOT_QUALITY = int(os.getenv("SCREENSHOT_QUALITY", 70))
+SCREENSHOT_FULL_PAGE = os.getenv("SCREENSHOT_FULL_PAGE", "false").lower() in ("1", "true", "yes")
+
+# Téléchargement des photos (voir image_fetcher.py) : threads, requêtes simultanées
+# par hôte et intervalle minimal (secondes) entre deux requêtes vers un même hôte
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", 8))
+IMAGE_PER_HOST = int(os.getenv("IMAGE_PER_HOST", 4))
+IMAGE_MIN_INTERVAL = float(os.getenv("IMAGE_MIN_INTERVAL", 0.1))
+# Photos stockées une seule fois par contenu (voir image_store.py), sous le dossier servi par /images
+IMAGE_STORE_DIR = "scraped_data"
+# Miniatures et copies WebP (voir image_variants.py) : largeurs en pixels et processus de conversion
+IMAGE_VARIANT_WIDTHS = [int(w) for w in os.getenv("IMAGE_VARIANT_WIDTHS", "320,800").split(",") if w.strip()]
+IMAGE_VARIANT_WORKERS = int(os.getenv("IMAGE_VARIANT_WORKERS", 2))
+
+# Pool de connexions au navigateur (voir browser_pool.py)
+BROWSER_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", 4))
+BROWSER_POOL_IDLE_TIMEOUT = int(os.getenv("BROWSER_POOL_IDLE_TIMEOUT", 300))
+BROWSER_POOL_MAX_USES = int(os.getenv("BROWSER_POOL_MAX_USES", 50))
+
+# File de travaux de scraping (voir scrape_jobs.py)
+SCRAPE_WORKERS = int(os.getenv("SCRAPE_WORKERS", BROWSER_POOL_SIZE))
+SCRAPE_QUEUE_SIZE = int(os.getenv("SCRAPE_QUEUE_SIZE", 100))
+
+# Scrapings simultanés par site lors d'un scraping groupé, ex: "leboncoin.fr=4"
+SITE_CONCURRENCY = {
+    site.strip(): int(limit)
+    for site, limit in (entry.split("=") for entry in os.getenv("SCRAPE_SITE_CONCURRENCY", "").split(",") if "=" in entry)
+}
+SITE_CONCURRENCY.setdefault("leboncoin.fr", BROWSER_POOL_SIZE)
+
 # Configuration de la base de données PostgreSQL
 hostname = os.getenv("POSTGRESQL_HOST", "localhost")
 port = os.getenv("POSTGRESQL_PORT", "5432")
@@ -59,18 +103,23 @@ class WebScrapingPerformanceAnalyzer:
             'response_sizes': [],
             'screenshot_success': [],
             'proxy_counts': [],  # Nombre de proxies utilisés (fixe à 1 pour Bright Data)
-            'node_counts': []    # Nombre de nœuds parcourus (requêtes réseau)
+            'node_counts': [],   # Nombre de nœuds parcourus (requêtes réseau)
+            'bytes_received': [],  # Octets reçus par le navigateur pour la page
+            'load_times': [],    # Durée du chargement de la page (secondes)
+            'tiers': []          # Voie d'obtention de la page (http ou browser)
         }
 
     # Méthode pour enregistrer les métriques d’une session de scraping
     # Paramètres : execution_time (float), request_count (int), error_count (int),
     # data_points (int), success_rate (float), response_size (int),
-    # screenshot_success (bool), proxy_count (int), node_count (int)
+    # screenshot_success (bool), proxy_count (int), node_count (int),
+    # bytes_received (int), load_time (float), tier (str)
     # Remplit la structure de données avec les métriques fournies
     def log_performance(self, execution_time: float, request_count: int,
                         error_count: int, data_points: int,
                         success_rate: float, response_size: int,
-                        screenshot_success: bool, proxy_count: int, node_count: int):
+                        screenshot_success: bool, proxy_count: int, node_count: int,
+                        bytes_received: int = 0, load_time: float = 0.0, tier: str = None):
         self.performance_data['timestamps'].append(datetime.datetime.now())
         self.performance_data['execution_times'].append(execution_time)
         self.performance_data['request_counts'].append(request_count)
@@ -81,6 +130,9 @@ class WebScrapingPerformanceAnalyzer:
         self.performance_data['screenshot_success'].append(screenshot_success)
         self.performance_data['proxy_counts'].append(proxy_count)
         self.performance_data['node_counts'].append(node_count)
+        self.performance_data['bytes_received'].append(bytes_received)
+        self.performance_data['load_times'].append(load_time)
+        self.performance_data['tiers'].append(tier)
 
     # Méthode pour générer et sauvegarder des graphiques basés sur les performances enregistrées
     # Paramètre : output_file (str) — nom du fichier image de sortie (par défaut "performance_analysis.png")
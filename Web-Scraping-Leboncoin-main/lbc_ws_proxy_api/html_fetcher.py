@@ -0,0 +1,103 @@
+"""
+Voie rapide du scraping : la page d'annonce obtenue par une simple requête HTTP.
+
+Le JSON __NEXT_DATA__ lu par parse_search est le plus souvent déjà présent dans
+le HTML renvoyé par le serveur : une requête GET à travers le proxy résidentiel,
+sur une session dont les connexions restent ouvertes, suffit alors, sans passer
+par le navigateur distant. Si la réponse est refusée (protection anti-robots)
+ou incomplète, scrape_search se rabat sur le navigateur.
+
+TierStats compte les scrapings réussis par voie ("http" ou "browser") et leur latence.
+"""
+import threading
+import time
+from typing import Dict, Optional
+
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Le proxy Bright Data présente son propre certificat
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+
+class HtmlFetcher:
+    """Session HTTP partagée pour télécharger le HTML des annonces."""
+
+    def __init__(self, proxy: str = None, headers: Dict[str, str] = None, pool_size: int = 8,
+                 timeout: float = 15, verify: bool = False):
+        self.timeout = timeout
+        self.verify = verify
+
+        self.session = requests.Session()
+        if proxy:
+            self.session.proxies = {"http": proxy, "https": proxy}
+        self.session.headers.update(headers or {})
+        # Une seule nouvelle tentative, sur erreur serveur : un refus (403) renvoie vers le navigateur
+        retry = Retry(total=1, backoff_factor=0.5, status_forcelist=(500, 502, 503, 504), allowed_methods=("GET",))
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "refused": 0, "errors": 0, "bytes": 0, "seconds": 0.0}
+
+    def fetch(self, url: str) -> Optional[str]:
+        """HTML de la page, ou None si la requête échoue ou est refusée."""
+        started = time.perf_counter()
+        outcome, html = "errors", None
+        try:
+            response = self.session.get(url, timeout=self.timeout, verify=self.verify)
+            if response.status_code == 200:
+                outcome, html = None, response.text
+            else:
+                outcome = "refused"
+                print(f"Requête HTTP refusée pour {url} (statut {response.status_code})")
+        except requests.RequestException as e:
+            print(f"Erreur lors de la requête HTTP vers {url} : {e}")
+
+        with self._lock:
+            self._stats["requests"] += 1
+            self._stats["seconds"] += time.perf_counter() - started
+            if outcome:
+                self._stats[outcome] += 1
+            else:
+                self._stats["bytes"] += len(html)
+        return html
+
+    def stats(self) -> dict:
+        with self._lock:
+            s = dict(self._stats)
+        s["avg_ms"] = round(s["seconds"] / s["requests"] * 1000, 1) if s["requests"] else None
+        s["seconds"] = round(s["seconds"], 2)
+        return s
+
+
+class TierStats:
+    """Scrapings réussis par voie d'obtention de la page, et leur latence."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tiers = {}
+
+    def record(self, tier: str, latency: float):
+        with self._lock:
+            t = self._tiers.setdefault(tier, {"count": 0, "total_s": 0.0, "max_s": 0.0})
+            t["count"] += 1
+            t["total_s"] += latency
+            t["max_s"] = max(t["max_s"], latency)
+
+    def stats(self) -> dict:
+        with self._lock:
+            tiers = {tier: dict(t) for tier, t in self._tiers.items()}
+        total = sum(t["count"] for t in tiers.values())
+        return {
+            tier: {
+                "count": t["count"],
+                "share": round(t["count"] / total, 3),
+                "avg_ms": round(t["total_s"] / t["count"] * 1000, 1),
+                "max_ms": round(t["max_s"] * 1000, 1),
+            }
+            for tier, t in tiers.items()
+        }
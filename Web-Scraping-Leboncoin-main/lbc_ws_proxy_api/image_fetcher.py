@@ -0,0 +1,105 @@
+"""
+Téléchargement des photos d'annonces à travers le proxy résidentiel.
+
+Une seule session HTTP (requests) est partagée par tous les téléchargements :
+les connexions, et le tunnel ouvert à travers le proxy, sont gardées ouvertes
+d'une image à l'autre au lieu de refaire la poignée de main TLS à chaque photo.
+Les photos d'une annonce sont téléchargées en parallèle (max_workers threads),
+avec au plus per_host requêtes simultanées vers un même hôte, espacées d'au
+moins min_interval secondes.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Le proxy Bright Data présente son propre certificat
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+
+class ImageFetcher:
+    """Session HTTP partagée et téléchargements parallèles limités par hôte."""
+
+    def __init__(self, proxy: str = None, headers: Dict[str, str] = None, max_workers: int = 8,
+                 per_host: int = 4, min_interval: float = 0.0, timeout: float = 10,
+                 retries: int = 3, verify: bool = False):
+        self.per_host = per_host
+        self.min_interval = min_interval
+        self.timeout = timeout
+        self.verify = verify
+
+        self.session = requests.Session()
+        if proxy:
+            self.session.proxies = {"http": proxy, "https": proxy}
+        self.session.headers.update(headers or {})
+        retry = Retry(total=retries, backoff_factor=1, status_forcelist=(429, 500, 502, 503, 504),
+                      allowed_methods=("GET",))
+        adapter = HTTPAdapter(pool_connections=10, pool_maxsize=max_workers, max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="image")
+        self._lock = threading.Lock()
+        self._hosts = {}       # hôte -> [sémaphore, instant de la dernière requête]
+        self._stats = {"requests": 0, "errors": 0, "bytes": 0, "seconds": 0.0}
+
+    def fetch(self, url: str) -> Optional[bytes]:
+        """Contenu de l'image, ou None en cas d'échec."""
+        semaphore = self._host_slot(url)
+        with semaphore:
+            self._wait_turn(url)
+            started = time.perf_counter()
+            try:
+                response = self.session.get(url, timeout=self.timeout, verify=self.verify)
+                response.raise_for_status()
+                content = response.content
+            except requests.RequestException as e:
+                print(f"Erreur lors du téléchargement de l'image {url} : {e}")
+                content = None
+            elapsed = time.perf_counter() - started
+
+        with self._lock:
+            self._stats["requests"] += 1
+            self._stats["seconds"] += elapsed
+            if content is None:
+                self._stats["errors"] += 1
+            else:
+                self._stats["bytes"] += len(content)
+        return content
+
+    def fetch_all(self, urls: List[str]) -> List[Optional[bytes]]:
+        """Contenus des images, dans l'ordre des URLs (None pour un échec)."""
+        return list(self._executor.map(self.fetch, urls))
+
+    def stats(self) -> dict:
+        with self._lock:
+            s = dict(self._stats)
+        s["avg_ms"] = round(s["seconds"] / s["requests"] * 1000, 1) if s["requests"] else None
+        s["seconds"] = round(s["seconds"], 2)
+        return s
+
+    def _host_slot(self, url: str) -> threading.BoundedSemaphore:
+        host = urlparse(url).hostname
+        with self._lock:
+            if host not in self._hosts:
+                self._hosts[host] = [threading.BoundedSemaphore(self.per_host), 0.0]
+            return self._hosts[host][0]
+
+    def _wait_turn(self, url: str):
+        """Espace d'au moins min_interval secondes les débuts de requêtes vers un même hôte."""
+        if self.min_interval <= 0:
+            return
+        host = urlparse(url).hostname
+        with self._lock:
+            slot = self._hosts[host]
+            start = max(time.monotonic(), slot[1] + self.min_interval)
+            slot[1] = start
+        delay = start - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
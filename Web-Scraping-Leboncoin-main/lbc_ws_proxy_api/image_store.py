@@ -0,0 +1,158 @@
+"""
+Stockage des photos d'annonces par empreinte de contenu (SHA-256).
+
+Chaque photo est écrite une seule fois, sous blobs/<2 premiers caractères>/<empreinte>.<ext> :
+re-scraper une annonce, ou deux annonces partageant une photo, ne duplique pas le
+fichier. Un index SQLite associe l'URL source à l'empreinte, ce qui permet de ne
+pas retélécharger une URL déjà connue. saved_properties.image_paths référence
+directement les blobs ; ceux qu'aucune annonce ne référence plus sont supprimés
+par collect_garbage, avec leurs déclinaisons.
+
+Usage (nettoyage) :
+    python image_store.py gc [--dry-run] [--min-age-hours 24]
+"""
+import argparse
+import glob
+import hashlib
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Optional, Set
+
+BLOB_DIR = "blobs"
+# Miniatures et copies WebP des blobs (voir image_variants.py)
+DERIVED_DIR = "derived"
+INDEX_FILE = "index.sqlite"
+HASH_PATTERN = re.compile(r"[0-9a-f]{64}")
+
+
+def guess_extension(content: bytes) -> str:
+    """Extension d'après la signature du fichier (jpeg par défaut, comme les noms historiques)."""
+    if content.startswith(b"\x89PNG"):
+        return "png"
+    if content[:4] == b"RIFF" and content[8:12] == b"WEBP":
+        return "webp"
+    if content[4:12] in (b"ftypavif", b"ftypavis"):
+        return "avif"
+    return "jpeg"
+
+
+class ImageStore:
+    """Blobs adressés par contenu sous `root`, avec l'index URL -> empreinte."""
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(os.path.join(root, BLOB_DIR), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(root, INDEX_FILE), check_same_thread=False)
+        with self._lock, self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS urls (url TEXT PRIMARY KEY, hash TEXT NOT NULL, "
+                "ext TEXT NOT NULL, size INTEGER NOT NULL, stored_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS urls_hash ON urls (hash)")
+
+    def relative_path(self, digest: str, ext: str) -> str:
+        """Chemin du blob relatif au dossier servi (ex: blobs/3f/3f9a...e1.jpeg)."""
+        return f"{BLOB_DIR}/{digest[:2]}/{digest}.{ext}"
+
+    def lookup(self, url: str) -> Optional[str]:
+        """Chemin relatif du blob déjà téléchargé depuis cette URL, ou None."""
+        with self._lock:
+            row = self._db.execute("SELECT hash, ext FROM urls WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            return None
+        path = self.relative_path(*row)
+        try:
+            # Blob réutilisé : comme dans put, sa date le protège du nettoyage
+            os.utime(os.path.join(self.root, path))
+        except FileNotFoundError:
+            # Le blob a pu être supprimé par le nettoyage depuis l'indexation
+            return None
+        return path
+
+    def put(self, url: str, content: bytes) -> str:
+        """Enregistre le contenu (s'il n'existe pas déjà) et l'URL source. Retourne le chemin relatif."""
+        digest = hashlib.sha256(content).hexdigest()
+        ext = guess_extension(content)
+        path = self.relative_path(digest, ext)
+        target = os.path.join(self.root, path)
+        if not os.path.exists(target):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            # Écriture dans un fichier temporaire puis renommage : jamais de blob partiel
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(target), suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(content)
+            os.replace(tmp, target)
+        else:
+            # Blob réutilisé : sa date le protège du nettoyage le temps que l'annonce soit enregistrée
+            os.utime(target)
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO urls (url, hash, ext, size, stored_at) VALUES (?, ?, ?, ?, ?)",
+                (url, digest, ext, len(content), time.time())
+            )
+        return path
+
+    def collect_garbage(self, referenced: Set[str], min_age: float = 86400, dry_run: bool = False) -> dict:
+        """
+        Supprime les blobs dont l'empreinte n'est pas dans `referenced` et plus anciens que
+        min_age secondes (un scraping en cours n'a pas encore enregistré ses chemins).
+        """
+        limit = time.time() - min_age
+        report = {"blobs": 0, "removed": 0, "freed_bytes": 0}
+        removed = []
+        for directory, _, files in os.walk(os.path.join(self.root, BLOB_DIR)):
+            for name in files:
+                digest = name.split(".")[0]
+                if not HASH_PATTERN.fullmatch(digest):
+                    continue
+                report["blobs"] += 1
+                path = os.path.join(directory, name)
+                stat = os.stat(path)
+                if digest in referenced or stat.st_mtime > limit:
+                    continue
+                report["removed"] += 1
+                report["freed_bytes"] += stat.st_size
+                removed.append(digest)
+                derived = glob.glob(os.path.join(self.root, DERIVED_DIR, digest[:2], f"{digest}_*"))
+                report["freed_bytes"] += sum(os.path.getsize(p) for p in derived)
+                if not dry_run:
+                    for p in [path, *derived]:
+                        os.remove(p)
+        if removed and not dry_run:
+            with self._lock, self._db:
+                self._db.executemany("DELETE FROM urls WHERE hash = ?", [(digest,) for digest in removed])
+        return report
+
+
+def referenced_hashes(conn) -> Set[str]:
+    """Empreintes présentes dans les image_paths de saved_properties."""
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT image_paths FROM saved_properties WHERE image_paths IS NOT NULL")
+        return {digest for (paths,) in cursor for path in paths or [] if path
+                for digest in HASH_PATTERN.findall(path)}
+
+
+if __name__ == "__main__":
+    import psycopg2
+
+    from config import DB_CONFIG, IMAGE_STORE_DIR
+
+    parser = argparse.ArgumentParser(description="Stockage des photos d'annonces")
+    parser.add_argument("command", choices=["gc"])
+    parser.add_argument("--dry-run", action="store_true", help="Affiche ce qui serait supprimé sans rien supprimer")
+    parser.add_argument("--min-age-hours", type=float, default=24, help="Âge minimal des blobs supprimés")
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        referenced = referenced_hashes(conn)
+    finally:
+        conn.close()
+    report = ImageStore(IMAGE_STORE_DIR).collect_garbage(referenced, args.min_age_hours * 3600, args.dry_run)
+    print(f"{report['blobs']} blobs, {report['removed']} non référencés "
+          f"({report['freed_bytes'] / 1e6:.1f} Mo){' (simulation)' if args.dry_run else ' supprimés'}")
@@ -0,0 +1,150 @@
+"""
+Déclinaisons des photos stockées (voir image_store.py) : miniatures et WebP.
+
+Les cartes du frontend affichaient les JPEG en taille réelle. Juste après le
+téléchargement d'une photo, un pool de processus en crée des copies réduites
+(largeurs IMAGE_VARIANT_WIDTHS, en WebP et en JPEG) et une copie WebP en taille
+réelle, sous derived/<2 premiers caractères>/<empreinte>_<largeur|full>.<ext>.
+La route /images choisit la déclinaison d'après ?w= et ?format= (ou l'en-tête
+Accept), voir ImageVariants.select.
+
+Le pool démarre ses processus par un serveur forkserver (qui n'importe que ce
+module) et non par fork : l'application a déjà des threads (navigateur, travaux)
+quand le pool est créé, et un fork en copierait les verrous dans un état
+quelconque. Une photo que Pillow ne sait pas traiter est notée en échec : elle
+n'est plus soumise et l'original est servi à la place de ses déclinaisons.
+"""
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional
+
+from PIL import Image, ImageOps
+
+from image_store import BLOB_DIR, DERIVED_DIR, HASH_PATTERN
+
+WEBP_QUALITY = 80
+JPEG_QUALITY = 82
+
+
+def make_variants(source: str, root: str, widths: List[int]) -> List[str]:
+    """Crée les déclinaisons de `source` (chemin absolu du blob). Exécuté dans un processus du pool."""
+    digest = os.path.basename(source).split(".")[0]
+    directory = os.path.join(root, DERIVED_DIR, digest[:2])
+    os.makedirs(directory, exist_ok=True)
+
+    created = []
+    with Image.open(source) as original:
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+
+        for width in [*widths, None]:
+            copy = image.copy()
+            if width:
+                # Seule la largeur est contrainte ; jamais d'agrandissement
+                copy.thumbnail((width, copy.height), Image.LANCZOS)
+            formats = [("webp", {"quality": WEBP_QUALITY, "method": 4})]
+            if width:
+                formats.append(("jpeg", {"quality": JPEG_QUALITY, "optimize": True, "progressive": True}))
+            for fmt, options in formats:
+                target = os.path.join(directory, f"{digest}_{width or 'full'}.{fmt}")
+                tmp = f"{target}.{os.getpid()}.tmp"
+                (copy.convert("RGB") if fmt == "jpeg" else copy).save(tmp, fmt.upper(), **options)
+                os.replace(tmp, target)
+                created.append(target)
+    return created
+
+
+class ImageVariants:
+    """Génère les déclinaisons en arrière-plan et choisit celle à servir."""
+
+    def __init__(self, root: str, widths: List[int], workers: int = 2):
+        self.root = root
+        self.widths = sorted(widths)
+        self.workers = workers
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = set()
+        # Blobs dont la création des déclinaisons a échoué : pas de nouvelle tentative
+        self._failed = set()
+        self._stats = {"submitted": 0, "generated": 0, "errors": 0, "seconds": 0.0}
+
+    def submit(self, relative_path: str):
+        """Planifie la création des déclinaisons d'un blob (sans attendre, une seule fois à la fois)."""
+        with self._lock:
+            if relative_path in self._pending or relative_path in self._failed:
+                return
+            self._pending.add(relative_path)
+            self._stats["submitted"] += 1
+            if self._executor is None:
+                # Les processus n'exécutent que make_variants : le serveur ne précharge que ce module
+                context = multiprocessing.get_context("forkserver")
+                context.set_forkserver_preload([__name__])
+                self._executor = ProcessPoolExecutor(self.workers, mp_context=context)
+            executor = self._executor
+        started = time.perf_counter()
+        future = executor.submit(make_variants, os.path.join(self.root, relative_path), self.root, self.widths)
+        future.add_done_callback(lambda f: self._done(relative_path, executor, f, started))
+
+    def failed(self, relative_path: str) -> bool:
+        """True si les déclinaisons de ce blob n'ont pas pu être créées."""
+        with self._lock:
+            return relative_path in self._failed
+
+    def select(self, relative_path: str, width: Optional[int] = None, fmt: Optional[str] = None) -> Optional[str]:
+        """
+        Chemin relatif de la déclinaison demandée, ou None si l'original convient.
+        La largeur retenue est la plus petite déclinaison au moins aussi large que `width` ;
+        au-delà de la plus grande, l'original (ou sa copie WebP) est servi.
+        """
+        digest = self.digest_of(relative_path)
+        if digest is None:
+            return None
+        bucket = next((w for w in self.widths if width and w >= width), None)
+        if bucket is None and fmt != "webp":
+            return None
+        return f"{DERIVED_DIR}/{digest[:2]}/{digest}_{bucket or 'full'}.{fmt or 'jpeg'}"
+
+    def exists(self, relative_path: str) -> bool:
+        return os.path.exists(os.path.join(self.root, relative_path))
+
+    def stats(self) -> dict:
+        with self._lock:
+            s = dict(self._stats)
+            s["pending"] = len(self._pending)
+            s["failed"] = len(self._failed)
+        s["avg_ms"] = round(s["seconds"] / s["generated"] * 1000, 1) if s["generated"] else None
+        s["seconds"] = round(s["seconds"], 2)
+        return s
+
+    @staticmethod
+    def digest_of(relative_path: str) -> Optional[str]:
+        """Empreinte d'un chemin blobs/ab/<empreinte>.<ext>, None pour les anciens chemins par scraping."""
+        parts = relative_path.split("/")
+        if len(parts) != 3 or parts[0] != BLOB_DIR:
+            return None
+        digest = parts[2].split(".")[0]
+        return digest if HASH_PATTERN.fullmatch(digest) else None
+
+    def _done(self, relative_path: str, executor, future, started: float):
+        error = future.exception()
+        with self._lock:
+            self._pending.discard(relative_path)
+            if error is None:
+                self._stats["generated"] += 1
+                self._stats["seconds"] += time.perf_counter() - started
+            else:
+                self._stats["errors"] += 1
+                if isinstance(error, BrokenProcessPool):
+                    # Processus du pool arrêté brutalement : nouveau pool à la prochaine demande, la photo sera resoumise
+                    if self._executor is executor:
+                        self._executor = None
+                else:
+                    self._failed.add(relative_path)
+        if error is not None:
+            print(f"Erreur lors de la création des déclinaisons de {relative_path} : {error}")
+
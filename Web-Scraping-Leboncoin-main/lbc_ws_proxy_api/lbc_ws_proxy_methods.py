@@ -1,9 +1,6 @@
-import urllib.request
-import ssl
-import urllib.error
 import psycopg2
-from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
+import psycopg2.extras
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
 from typing import Dict, List, Optional
 import asyncio
 import json
@@ -12,9 +9,29 @@ import datetime
 import os
 from contextlib import suppress
 from config import *
+from browser_pool import BrowserPool
+from image_fetcher import ImageFetcher
+from image_store import ImageStore
+from image_variants import ImageVariants
+from resource_blocking import PageTraffic, TrafficStats
+from html_fetcher import HtmlFetcher, TierStats
+from screenshots import ScreenshotStats, capture
+from stage_timings import StageStats, StageTimer
 import re
 
 
+# Connexions au navigateur Bright Data partagées par tous les scrapings du processus
+browser_pool = BrowserPool(
+    SBR_WS_CDP,
+    max_size=BROWSER_POOL_SIZE,
+    idle_timeout=BROWSER_POOL_IDLE_TIMEOUT,
+    max_uses=BROWSER_POOL_MAX_USES
+)
+
+# Trafic des pages scrapées, avec et sans blocage des ressources (voir resource_blocking.py)
+traffic_stats = TrafficStats()
+
+
 #Fonction pour la conversion des surfaces en entier
 def extract_number(value: str) -> Optional[int]:
     """Extrait un entier depuis une chaîne comme '45 m²' → 45"""
@@ -25,6 +42,82 @@ def extract_number(value: str) -> Optional[int]:
     return None
 
 
+# Requête de mise à jour d'une annonce (mêmes paramètres que property_row)
+UPDATE_PROPERTY_QUERY = """
+    UPDATE saved_properties SET
+        url = %s,
+        adresse = %s,
+        title = %s,
+        prix = %s,
+        type_habitat = %s,
+        surface_habitable = %s,
+        surface_terrain = %s,
+        nbr_pieces = %s,
+        dpe = %s,
+        ges = %s,
+        description = %s,
+        image_paths = %s,
+        screenshot_path = %s,
+        updated_at = NOW()
+    WHERE id = %s AND user_id = %s;
+"""
+
+
+# Fonction qui prépare les paramètres de UPDATE_PROPERTY_QUERY pour une annonce
+# Paramètres : voir save_to_db
+# Retourne :
+#   - le tuple de paramètres (l'identifiant de l'annonce et l'utilisateur en dernier)
+def property_row(annonce_id: int, user_id: int, data: Dict, url: str, image_paths: List[Optional[str]], screenshot_path: str) -> tuple:
+    return (
+        url,
+        data.get("adresse"),
+        data.get("title"),
+        data.get("prix"),
+        data.get("type_habitat"),
+        data.get("surface_habitable"),
+        data.get("surface_terrain"),
+        data.get("nbr_pieces"),
+        data.get("dpe"),
+        data.get("ges"),
+        data.get("description"),
+        image_paths,
+        screenshot_path,
+        annonce_id,
+        user_id
+    )
+
+
+# Fonction pour mettre à jour plusieurs annonces d'un utilisateur en une seule transaction
+# Paramètres :
+#   - user_id (int) : identifiant de l'utilisateur propriétaire
+#   - rows (List[tuple]) : paramètres préparés par property_row
+# Comportement :
+#   - Vérifie en une requête les annonces existantes pour cet user_id
+#   - Met à jour les annonces existantes par lots (execute_batch : peu d'allers-retours)
+# Retourne :
+#   - l'ensemble des identifiants d'annonces mises à jour
+def save_many_to_db(user_id: int, rows: List[tuple]) -> set:
+    if not rows:
+        return set()
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT id FROM saved_properties WHERE user_id = %s AND id = ANY(%s);",
+                (user_id, [row[-2] for row in rows])
+            )
+            existing = {r[0] for r in cursor.fetchall()}
+            rows = [row for row in rows if row[-2] in existing]
+            psycopg2.extras.execute_batch(cursor, UPDATE_PROPERTY_QUERY, rows, page_size=100)
+        conn.commit()
+        return {row[-2] for row in rows}
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
 # Fonction pour mettre à jour une annonce existante dans la base de données
 # Paramètres :
 #   - bien_id (int) : identifiant du bien immobilier à mettre à jour
@@ -39,124 +132,87 @@ def extract_number(value: str) -> Optional[int]:
 #   - Affiche un message d’erreur si la combinaison id/user_id n’existe pas
 def save_to_db(annonce_id: int, user_id: int, data: Dict, url: str, image_paths: List[Optional[str]], screenshot_path: str):
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
-        cursor = conn.cursor()
-
-        # Vérifier si le bien immobilier avec cet id et user_id existe
-        check_query = "SELECT 1 FROM saved_properties WHERE id = %s AND user_id = %s;"
-        cursor.execute(check_query, (annonce_id, user_id))
-        result = cursor.fetchone()
-
-        if not result:
+        row = property_row(annonce_id, user_id, data, url, image_paths, screenshot_path)
+        if save_many_to_db(user_id, [row]):
+            print("Bien immobilier mise à jour avec succès.")
+        else:
             print("Erreur : aucun bien immobilier trouvé avec cet ID et ce User ID.")
-            return
-
-        # Mettre à jour uniquement les champs demandés
-        update_query = """
-        UPDATE saved_properties SET
-            url = %s,
-            adresse = %s,
-            title = %s,
-            prix = %s,
-            type_habitat = %s,
-            surface_habitable = %s,
-            surface_terrain = %s,
-            nbr_pieces = %s,
-            dpe = %s,
-            ges = %s,
-            description = %s,
-            image_paths = %s,
-            screenshot_path = %s,
-            updated_at = NOW()
-        WHERE id = %s AND user_id = %s;
-        """
-
-        cursor.execute(update_query, (
-            url,
-            data.get("adresse"),
-            data.get("title"),
-            data.get("prix"),
-            data.get("type_habitat"),
-            data.get("surface_habitable"),
-            data.get("surface_terrain"),
-            data.get("nbr_pieces"),
-            data.get("dpe"),
-            data.get("ges"),
-            data.get("description"),
-            image_paths,
-            screenshot_path,
-            annonce_id,
-            user_id
-        ))
-
-        conn.commit()
-        print("Bien immobilier mise à jour avec succès.")
     except Exception as e:
         print(f"Erreur lors de la mise à jour du bien immobilier : {str(e)}")
-    finally:
-        cursor.close()
-        conn.close()
 
 
-# Fonction pour télécharger une image avec gestion automatique des erreurs et des délais
+# Session partagée pour les photos, à travers le proxy résidentiel (voir image_fetcher.py)
+image_fetcher = ImageFetcher(
+    proxy,
+    headers={
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/129.0.0.0 Safari/537.36',
+        'Accept': 'image/avif,image/webp,image/apng,image/*,*/*;q=0.8',
+        'Accept-Language': 'fr-FR,fr;q=0.9,en-US;q=0.8,en;q=0.7',
+        'Referer': 'https://www.leboncoin.fr/'
+    },
+    max_workers=IMAGE_WORKERS,
+    per_host=IMAGE_PER_HOST,
+    min_interval=IMAGE_MIN_INTERVAL
+)
+
+# Photos stockées par empreinte de contenu, partagées entre annonces et scrapings (voir image_store.py)
+image_store = ImageStore(IMAGE_STORE_DIR)
+# Miniatures et copies WebP créées en arrière-plan après chaque téléchargement
+image_variants = ImageVariants(IMAGE_STORE_DIR, IMAGE_VARIANT_WIDTHS, workers=IMAGE_VARIANT_WORKERS)
+
+# Session partagée pour la voie rapide (HTML sans navigateur, voir html_fetcher.py)
+html_fetcher = HtmlFetcher(
+    proxy,
+    headers={
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/129.0.0.0 Safari/537.36',
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+        'Accept-Language': 'fr-FR,fr;q=0.9,en-US;q=0.8,en;q=0.7'
+    },
+    pool_size=SCRAPE_WORKERS
+)
+# Voie (http ou browser) par laquelle chaque annonce a été obtenue
+tier_stats = TierStats()
+# Captures d'écran prises, évitées ou différées (voir screenshots.py)
+screenshot_stats = ScreenshotStats()
+# Durée de chaque étape des scrapings (voir stage_timings.py)
+stage_stats = StageStats()
+# Captures différées en cours : la référence évite que la tâche soit détruite avant sa fin
+_background_tasks = set()
+
+# BASE_URL à adapter à votre serveur
+BASE_URL = "http://localhost:5001/images"
+
+
+# Fonction pour télécharger une image (connexions réutilisées, nouvelles tentatives sur 429/5xx)
 # Paramètre :
 #   - url (str) : lien direct de l’image à télécharger
 # Retourne :
 #   - bytes de l’image si succès, sinon None
-@retry(
-    stop=stop_after_attempt(3),
-    wait=wait_exponential(multiplier=1, min=4, max=10),
-    retry=retry_if_exception_type((urllib.error.URLError, urllib.error.HTTPError))
-)
 def fetch_image(url: str) -> Optional[bytes]:
-    """Télécharge une image en utilisant urllib.request avec le proxy résidentiel."""
-    try:
-        opener = urllib.request.build_opener(
-            urllib.request.ProxyHandler({'https': proxy, 'http': proxy}),
-            urllib.request.HTTPSHandler(context=ssl._create_unverified_context())
-        )
-        opener.addheaders = [
-            ('User-Agent', 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/129.0.0.0 Safari/537.36'),
-            ('Accept', 'image/avif,image/webp,image/apng,image/*,*/*;q=0.8'),
-            ('Accept-Language', 'fr-FR,fr;q=0.9,en-US;q=0.8,en;q=0.7'),
-            ('Accept-Encoding', 'gzip, deflate, br'),
-            ('Connection', 'keep-alive'),
-            ('Referer', 'https://www.leboncoin.fr/')
-        ]
-        response = opener.open(url, timeout=10)
-        if response.getcode() == 200:
-            print(f"Image téléchargée avec succès depuis {url} (Statut: {response.getcode()})")
-            return response.read()
-        else:
-            print(f"Échec du téléchargement de l'image depuis {url} (Statut: {response.getcode()})")
-            return None
-    except (urllib.error.URLError, urllib.error.HTTPError) as e:
-        print(f"Erreur lors du téléchargement de l'image {url}: {str(e)}")
-        return None
-    except Exception as e:
-        print(f"Erreur inattendue lors du téléchargement de l'image {url}: {str(e)}")
-        return None
+    return image_fetcher.fetch(url)
 
 
 # Fonction de sauvegarde complète des données issues du scraping
 # Paramètres :
 #   - incoming_data (Dict) : données extraites du site (titre, adresse, prix, images, etc.)
 #   - analyzer (WebScrapingPerformanceAnalyzer) : instance pour le logging des performances
-#   - screenshot_success (bool) : indique si la capture d’écran de la page a réussi
+#   - screenshot_filename (Optional[str]) : nom du fichier de capture dans le dossier du scraping, None sans capture
 #   - url (str) : URL source de l’annonce
 #   - timestamp (str) : timestamp utilisé pour créer des noms de fichiers uniques
 #   - bien_id (int) : id du bien à mettre à jour
 #   - user_id (int) : id de l'utilisateur
+#   - save_to_database (bool) : False pour laisser l'appelant écrire en base (voir batch_scrape.py)
 # Retourne :
 #   - tuple contenant : nombre d’erreurs d’images, nombre total d’images, chemins enregistrés, chemin screenshot
 def save_data(
     incoming_data: Dict,
     analyzer: WebScrapingPerformanceAnalyzer,
-    screenshot_success: bool,
+    screenshot_filename: Optional[str],
     url: str,
     timestamp: str,
     annonce_id: int,
-    user_id: int
+    user_id: int,
+    save_to_database: bool = True
 ) -> tuple[int, int, List[Optional[str]], str]:
     output_dir = "scraped_data"
     request_dir = f"{output_dir}/{timestamp}"
@@ -166,18 +222,20 @@ def save_data(
     image_urls = incoming_data.get('images', {}).get('urls', [])
     error_count = 0
 
-    # BASE_URL à adapter à votre serveur
-    BASE_URL = "http://localhost:5001/images"
+    # Seules les URLs encore inconnues du stockage sont téléchargées (en parallèle)
+    stored = {image_url: image_store.lookup(image_url) for image_url in image_urls}
+    missing = [image_url for image_url, path in stored.items() if path is None]
+    downloaded = dict(zip(missing, image_fetcher.fetch_all(missing)))
+    print(f"{len(image_urls) - len(missing)} image(s) déjà stockée(s), {len(missing)} à télécharger")
 
     for i, image_url in enumerate(image_urls, start=1):
         try:
-            image_data = fetch_image(image_url)
-            if image_data:
-                local_filename = f"image_{timestamp}_{i}.jpeg"
-                image_filepath = os.path.join(request_dir, local_filename)
-                with open(image_filepath, "wb") as img_file:
-                    img_file.write(image_data)
-                image_url_served = f"{BASE_URL}/{timestamp}/{local_filename}"
+            relative_path = stored[image_url]
+            if relative_path is None and downloaded.get(image_url):
+                relative_path = image_store.put(image_url, downloaded[image_url])
+                image_variants.submit(relative_path)
+            if relative_path:
+                image_url_served = f"{BASE_URL}/{relative_path}"
                 image_paths.append(image_url_served)
                 print(f"Image {i} sauvegardée et accessible via {image_url_served}")
             else:
@@ -190,18 +248,20 @@ def save_data(
 
     incoming_data.pop('image_1', None)
     incoming_data['image_paths'] = image_paths
-    incoming_data['screenshot_success'] = screenshot_success
+    incoming_data['screenshot_success'] = screenshot_filename is not None
 
     json_filename = f"{request_dir}/data_{timestamp}.json"
     with open(json_filename, "w", encoding="utf-8") as json_file:
         json.dump(incoming_data, json_file, ensure_ascii=False, indent=4)
 
-    screenshot_filename = f"screenshot_{timestamp}.png"
-    screenshot_path_local = os.path.join(request_dir, screenshot_filename)
-    screenshot_url = f"{BASE_URL}/{timestamp}/{screenshot_filename}"
+    # Pas de capture (ou capture différée, enregistrée sur l'annonce une fois prise)
+    screenshot_url = f"{BASE_URL}/{timestamp}/{screenshot_filename}" if screenshot_filename else None
+
+    incoming_data['screenshot_path'] = screenshot_url
 
     # Appel à save_to_db avec l’URL visible
-    save_to_db(annonce_id, user_id, incoming_data, url, image_paths, screenshot_url)
+    if save_to_database:
+        save_to_db(annonce_id, user_id, incoming_data, url, image_paths, screenshot_url)
 
     print(f"Données sauvegardées dans {json_filename}")
     return error_count, len(image_urls), image_paths, screenshot_url
@@ -238,17 +298,100 @@ def parse_search(html_content: str) -> Optional[Dict]:
 
         next_data = html_content[start_idx:end_idx]
         ads_data = json.loads(next_data)
-
-        for _ in range(3):
-            if 'ad' in ads_data.get('props', {}).get('pageProps', {}):
-                return ads_data['props']['pageProps']['ad']
-            time.sleep(1)
-        return None
+        return ads_data.get('props', {}).get('pageProps', {}).get('ad')
     except (json.JSONDecodeError, AttributeError) as e:
         print(f"Erreur lors du parsing: {str(e)}")
         return None
 
 
+# Boutons d'acceptation des bandeaux de consentement connus
+COOKIE_SELECTORS = [
+    'button:has-text("Accepter")',
+    'button:has-text("Tout accepter")',
+    'button:has-text("Accept")',
+    'button.axeptio_btn_accept',
+    'button[class*="accept"]',
+    '#didomi-notice-agree-button',
+    '[data-testid="accept-cookies"]'
+]
+
+
+# Fonction qui accepte le bandeau de consentement s'il s'affiche
+# Tous les sélecteurs sont attendus en même temps, avec une seule échéance (timeout, en ms) :
+# sans bandeau, l'attente dure timeout et non plus 5 s par sélecteur
+# Retourne le sélecteur cliqué, ou None
+async def accept_cookies(page, timeout: float) -> Optional[str]:
+    async def visible(selector):
+        await page.wait_for_selector(selector, state="visible", timeout=timeout)
+        return selector
+
+    waits = [asyncio.ensure_future(visible(selector)) for selector in COOKIE_SELECTORS]
+    try:
+        for finished in asyncio.as_completed(waits):
+            try:
+                selector = await finished
+            except Exception:
+                continue
+            try:
+                await page.click(selector, timeout=timeout)
+            except Exception as e:
+                print(f"Erreur lors de l'acceptation des cookies: {str(e)}")
+                return None
+            print(f"Cookies acceptés avec le sélecteur: {selector}")
+            return selector
+        print("Aucun bouton de cookies trouvé, poursuite du scraping")
+        return None
+    finally:
+        for wait in waits:
+            wait.cancel()
+        await asyncio.gather(*waits, return_exceptions=True)
+
+
+# Fonction qui capture la page ouverte et mesure la capture
+# Paramètres : page (Playwright), path (str) : fichier de sortie, fmt (str) : jpeg, webp ou png
+# Retourne la description de la capture (format, durée, taille)
+async def take_screenshot(page, path: str, fmt: str) -> Dict:
+    started = time.perf_counter()
+    size = await capture(page, path, fmt, full_page=SCREENSHOT_FULL_PAGE, quality=SCREENSHOT_QUALITY)
+    seconds = time.perf_counter() - started
+    screenshot_stats.record(fmt, SCREENSHOT_FULL_PAGE, seconds, size)
+    print(f"Capture d'écran sauvegardée dans '{path}' ({size / 1024:.0f} Ko en {seconds:.2f} s)")
+    return {"format": fmt, "full_page": SCREENSHOT_FULL_PAGE, "ms": round(seconds * 1000, 1), "bytes": size}
+
+
+# Fonction qui ouvre l'annonce dans une page du navigateur pour la capturer
+# (annonce obtenue sans navigateur, ou capture différée) ; la page est chargée sans blocage des ressources
+async def screenshot_page(url: str, path: str, fmt: str) -> Dict:
+    async with browser_pool.page() as page:
+        await page.goto(url, timeout=90000, wait_until="domcontentloaded")
+        await accept_cookies(page, CONSENT_TIMEOUT)
+        return await take_screenshot(page, path, fmt)
+
+
+# Fonction pour enregistrer sur l'annonce une capture prise après coup
+def update_screenshot_path(annonce_id: int, user_id: int, screenshot_url: str):
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "UPDATE saved_properties SET screenshot_path = %s, updated_at = NOW() WHERE id = %s AND user_id = %s;",
+                (screenshot_url, annonce_id, user_id)
+            )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+# Capture différée : exécutée dans la boucle du pool une fois les données renvoyées
+async def deferred_screenshot(url: str, path: str, fmt: str, annonce_id: int, user_id: int, screenshot_url: str):
+    try:
+        await screenshot_page(url, path, fmt)
+        await asyncio.to_thread(update_screenshot_path, annonce_id, user_id, screenshot_url)
+    except Exception as e:
+        screenshot_stats.count("failed")
+        print(f"Erreur lors de la capture différée de {url}: {str(e)}")
+
+
 # -------------------------------------------------------------------
 # Fonction asynchrone de scraping d'une annonce à partir d'une URL.
 # Paramètres :
@@ -256,11 +399,19 @@ def parse_search(html_content: str) -> Optional[Dict]:
 #   - analyzer (WebScrapingPerformanceAnalyzer) : instance pour enregistrer les performances.
 #   - bien_id (int) : identifiant du bien immobilier à mettre à jour.
 #   - user_id (int) : identifiant de l'utilisateur.
+#   - save_to_database (bool) : False pour ne pas écrire l'annonce en base (écriture groupée par l'appelant).
+#   - block_resources (bool) : blocage des ressources inutiles (None = SCRAPE_BLOCK_RESOURCES).
+#   - screenshot (str) : none, inline ou deferred (None = SCREENSHOT_MODE).
+#   - screenshot_format (str) : jpeg, webp ou png (None = SCREENSHOT_FORMAT).
 # Résultat :
 #   - Un dictionnaire contenant les données extraites de l’annonce, ou None en cas d’échec.
 # -------------------------------------------------------------------
-async def scrape_search(url: str, analyzer: WebScrapingPerformanceAnalyzer, annonce_id: int, user_id: int) -> Optional[Dict]:
+async def scrape_search(url: str, analyzer: WebScrapingPerformanceAnalyzer, annonce_id: int, user_id: int,
+                        save_to_database: bool = True, block_resources: Optional[bool] = None,
+                        screenshot: Optional[str] = None, screenshot_format: Optional[str] = None) -> Optional[Dict]:
     print(f"Scraping de {url}")
+    # Images, polices, médias et scripts tiers abandonnés (SCRAPE_BLOCK_RESOURCES par défaut)
+    block = SCRAPE_BLOCK_RESOURCES if block_resources is None else block_resources
     start_time = time.time()
     request_count = 0
     error_count = 0
@@ -268,132 +419,199 @@ async def scrape_search(url: str, analyzer: WebScrapingPerformanceAnalyzer, anno
     response_size = 0
     screenshot_success = False
     node_count = 0
+    bytes_received = 0
+    load_time = 0.0
 
     output_dir = "scraped_data"
-    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    # Microsecondes : des scrapings simultanés n'écrivent pas dans le même dossier
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S_%f")
     request_dir = f"{output_dir}/{timestamp}"
     os.makedirs(request_dir, exist_ok=True)
 
-    async with async_playwright() as pw:
-        for attempt in range(3):
-            try:
-                print(f'Connexion à l\'API du navigateur (Tentative {attempt + 1}/3)...')
-                browser = await pw.chromium.connect_over_cdp(SBR_WS_CDP)
-                try:
-                    page = await browser.new_page()
-                    print('Connexion réussie ! Navigation vers la page')
+    # Capture d'écran : aucune, pendant le scraping ou différée (voir screenshots.py)
+    shot_mode = screenshot or SCREENSHOT_MODE
+    shot_format = screenshot_format or SCREENSHOT_FORMAT
+    if shot_mode == "deferred" and not save_to_database:
+        # L'appelant enregistre l'annonce plus tard : il écraserait la capture différée
+        shot_mode = "inline"
+    screenshot_filename = f"screenshot_{timestamp}.{shot_format}"
+    screenshot_file = os.path.join(request_dir, screenshot_filename)
+    screenshot_info = {"mode": shot_mode}
+
+    timer = StageTimer()
+
+    # Voie rapide : le HTML brut contient le plus souvent déjà __NEXT_DATA__
+    tier, search_data, html_content = None, None, None
+    tier_started = time.perf_counter()
+    if SCRAPE_HTTP_FAST_PATH:
+        with timer.stage("http"):
+            html_content = await asyncio.to_thread(html_fetcher.fetch, url)
+        request_count += 1
+        if html_content:
+            with timer.stage("parse"):
+                search_data = await asyncio.to_thread(parse_search, html_content)
+        if search_data:
+            tier = "http"
+        else:
+            print("Page HTTP refusée ou incomplète, passage au navigateur")
 
-                    def handle_request(request):
-                        nonlocal node_count
-                        node_count += 1
-                    page.on("request", handle_request)
+    # Sinon, le navigateur distant
+    for attempt in range(3 if tier is None else 0):
+        tier_started = time.perf_counter()
+        try:
+            print(f'Obtention d\'une page du navigateur (Tentative {attempt + 1}/3)...')
+            acquire_started = time.perf_counter()
+            async with browser_pool.page() as page:
+                timer.add("page", time.perf_counter() - acquire_started)
+                print('Connexion réussie ! Navigation vers la page')
+
+                traffic = PageTraffic(url, block=block)
+                await traffic.attach(page)
 
+                load_started = time.perf_counter()
+                with timer.stage("goto"):
                     await page.goto(url, timeout=90000, wait_until="domcontentloaded")
-                    request_count += 1
-
-                    try:
-                        cookie_selectors = [
-                            'button:contains("Accepter")',
-                            'button:contains("Tout accepter")',
-                            'button:contains("Accept")',
-                            'button.axeptio_btn_accept',
-                            'button[class*="accept"]',
-                            '#didomi-notice-agree-button',
-                            '[data-testid="accept-cookies"]'
-                        ]
-                        for selector in cookie_selectors:
-                            try:
-                                await page.wait_for_selector(selector, timeout=5000)
-                                await page.click(selector)
-                                print(f"Cookies acceptés avec le sélecteur: {selector}")
-                                break
-                            except PlaywrightTimeoutError:
-                                continue
-                        else:
-                            print("Aucun bouton de cookies trouvé, poursuite du scraping")
-                    except Exception as e:
-                        print(f"Erreur lors de l'acceptation des cookies: {str(e)}")
-                        error_count += 1
-
-                    try:
-                        await page.wait_for_selector('script#__NEXT_DATA__', timeout=10000)
-                        print("Script __NEXT_DATA__ détecté")
-                    except PlaywrightTimeoutError:
-                        print("Script __NEXT_DATA__ non détecté, tentative de poursuite")
-                        error_count += 1
-
-                    await page.wait_for_timeout(2000)
-
-                    screenshot_path = f"{request_dir}/screenshot_{timestamp}.png"
-                    await page.screenshot(path=screenshot_path, full_page=True)
-                    print(f"Capture d'écran sauvegardée dans '{screenshot_path}'")
-                    screenshot_success = True
+                load_time = time.perf_counter() - load_started
+                request_count += 1
 
-                    html_content = await page.content()
-                    search_data = parse_search(html_content)
-
-                    if not search_data:
-                        raise ValueError("Aucune donnée d'annonce trouvée")
-
-                    response_data = {
-                        'adresse': search_data.get("location", {}).get("city_label", None),
-                        'title': search_data.get("subject", None),
-                        'prix': search_data.get("price_cents", 0)/100 if search_data.get("price_cents") else None,
-                        'type_habitat': get_object_by_value(search_data.get("attributes", []), "key", "real_estate_type"),
-                        'surface_habitable': extract_number(get_object_by_value(search_data.get("attributes", []), "key", "square")),
-                        'surface_terrain': extract_number(get_object_by_value(search_data.get("attributes", []), "key", "land_plot_surface")),
-                        'nbr_pieces': get_object_by_value(search_data.get("attributes", []), "key", "rooms"),
-                        'dpe': get_object_by_value(search_data.get("attributes", []), "key", "energy_rate"),
-                        'ges': get_object_by_value(search_data.get("attributes", []), "key", "ges"),
-                        'description': search_data.get("body", None),
-                        'images': {"urls": search_data.get('images', {}).get('urls', [])},
-                        'image_1': fetch_image(search_data.get('images', {}).get('urls', [None])[0]) if search_data.get('images', {}).get('urls') else None,
-                        "html_content": html_content
-                    }
-
-                    response_size = len(html_content)
-                    img_error_count, img_count, image_paths, screenshot_path = save_data(
-                        response_data,
-                        analyzer,
-                        screenshot_success,
-                        url,
-                        timestamp,
-                        annonce_id,
-                        user_id
-                    )
-                    error_count += img_error_count
-                    data_points = sum(1 for v in response_data.values() if v is not None) + img_count
-                    success_rate = ((request_count - error_count) / request_count * 100) if request_count > 0 else 0
-
-                    execution_time = time.time() - start_time
-                    proxy_count = 1
-                    analyzer.log_performance(execution_time, request_count, error_count,
-                                             data_points, success_rate, response_size,
-                                             screenshot_success, proxy_count, node_count)
-
-                    return response_data
+                # Le bandeau de consentement ne gêne que la capture : il est guetté pendant l'attente des données
+                consent = asyncio.ensure_future(accept_cookies(page, CONSENT_TIMEOUT))
+                try:
+                    with timer.stage("next_data"):
+                        try:
+                            # Un <script> n'est jamais "visible" : seule sa présence dans le DOM est attendue
+                            await page.wait_for_selector('script#__NEXT_DATA__', state="attached", timeout=10000)
+                            print("Script __NEXT_DATA__ détecté")
+                        except PlaywrightTimeoutError:
+                            print("Script __NEXT_DATA__ non détecté, tentative de poursuite")
+                            error_count += 1
+
+                    if shot_mode == "inline":
+                        with timer.stage("consent"):
+                            await consent
+                        try:
+                            with timer.stage("screenshot"):
+                                screenshot_info.update(await take_screenshot(page, screenshot_file, shot_format))
+                            screenshot_success = True
+                        except Exception as e:
+                            screenshot_stats.count("failed")
+                            print(f"Erreur lors de la capture d'écran: {str(e)}")
                 finally:
-                    await browser.close()
-            except PlaywrightTimeoutError as e:
-                print(f"Timeout lors de la navigation (tentative {attempt + 1}/3): {str(e)}")
-                error_count += 1
-                if attempt == 2:
-                    execution_time = time.time() - start_time
-                    success_rate = ((request_count - error_count) / request_count * 100) if request_count > 0 else 0
-                    analyzer.log_performance(execution_time, request_count, error_count,
-                                             data_points, success_rate, response_size,
-                                             screenshot_success, proxy_count=1, node_count=0)
-                    print(f"Erreur lors du scraping: {str(e)}")
-                    return None
-            except Exception as e:
-                print(f"Erreur lors de la navigation (tentative {attempt + 1}/3): {str(e)}")
-                error_count += 1
-                if attempt == 2:
-                    execution_time = time.time() - start_time
-                    success_rate = ((request_count - error_count) / request_count * 100) if request_count > 0 else 0
-                    analyzer.log_performance(execution_time, request_count, error_count,
-                                             data_points, success_rate, response_size,
-                                             screenshot_success, proxy_count=1, node_count=0)
-                    print(f"Erreur lors du scraping: {str(e)}")
-                    return None
+                    consent.cancel()
+                    await asyncio.gather(consent, return_exceptions=True)
+
+                with timer.stage("content"):
+                    html_content = await page.content()
+                # Les étapes bloquantes passent dans un thread pour ne pas retenir la boucle du pool
+                with timer.stage("parse"):
+                    search_data = await asyncio.to_thread(parse_search, html_content)
+
+                # Page bloquée ou incomplète : la connexion est fermée plutôt que rendue au pool
+                if not search_data:
+                    raise ValueError("Aucune donnée d'annonce trouvée")
+
+                node_count = traffic.requests
+                bytes_received = await traffic.bytes_received()
+                traffic_stats.record(block, bytes_received, load_time, traffic.requests, traffic.blocked)
+                print(f"Page chargée en {load_time:.2f} s : {bytes_received / 1024:.0f} Ko reçus, "
+                      f"{traffic.requests} requêtes dont {traffic.blocked} bloquées")
+            tier = "browser"
+            break
+        except Exception as e:
+            kind = "Timeout" if isinstance(e, PlaywrightTimeoutError) else "Erreur"
+            print(f"{kind} lors de la navigation (tentative {attempt + 1}/3): {str(e)}")
+            error_count += 1
+            if attempt < 2 and not isinstance(e, PlaywrightTimeoutError):
                 await asyncio.sleep(5)
+
+    if tier is None:
+        execution_time = time.time() - start_time
+        success_rate = ((request_count - error_count) / request_count * 100) if request_count > 0 else 0
+        analyzer.log_performance(execution_time, request_count, error_count,
+                                 data_points, success_rate, response_size,
+                                 screenshot_success, proxy_count=1, node_count=0)
+        print("Erreur lors du scraping: page d'annonce introuvable")
+        return None
+
+    tier_latency = time.perf_counter() - tier_started
+    tier_stats.record(tier, tier_latency)
+    print(f"Annonce obtenue par la voie {tier} en {tier_latency:.2f} s")
+
+    if shot_mode == "inline" and tier == "http":
+        try:
+            with timer.stage("screenshot"):
+                screenshot_info.update(await screenshot_page(url, screenshot_file, shot_format))
+            screenshot_success = True
+        except Exception as e:
+            screenshot_stats.count("failed")
+            print(f"Erreur lors de la capture d'écran: {str(e)}")
+    elif shot_mode == "deferred":
+        screenshot_info["status"] = "pending"
+        screenshot_stats.count("deferred")
+    elif shot_mode == "none":
+        screenshot_stats.count("skipped")
+
+    # Le navigateur est rendu au pool : la suite n'utilise plus que les données extraites
+    try:
+        response_data = {
+            'adresse': search_data.get("location", {}).get("city_label", None),
+            'title': search_data.get("subject", None),
+            'prix': search_data.get("price_cents", 0)/100 if search_data.get("price_cents") else None,
+            'type_habitat': get_object_by_value(search_data.get("attributes", []), "key", "real_estate_type"),
+            'surface_habitable': extract_number(get_object_by_value(search_data.get("attributes", []), "key", "square")),
+            'surface_terrain': extract_number(get_object_by_value(search_data.get("attributes", []), "key", "land_plot_surface")),
+            'nbr_pieces': get_object_by_value(search_data.get("attributes", []), "key", "rooms"),
+            'dpe': get_object_by_value(search_data.get("attributes", []), "key", "energy_rate"),
+            'ges': get_object_by_value(search_data.get("attributes", []), "key", "ges"),
+            'description': search_data.get("body", None),
+            'images': {"urls": search_data.get('images', {}).get('urls', [])},
+            "html_content": html_content,
+            "fetch": {"tier": tier, "latency_s": round(tier_latency, 3)},
+            "screenshot": screenshot_info
+        }
+
+        response_size = len(html_content)
+        with timer.stage("save"):
+            img_error_count, img_count, image_paths, screenshot_path = await asyncio.to_thread(
+                save_data,
+                response_data,
+                analyzer,
+                screenshot_filename if screenshot_success else None,
+                url,
+                timestamp,
+                annonce_id,
+                user_id,
+                save_to_database
+            )
+    except Exception as e:
+        print(f"Erreur lors de l'enregistrement de l'annonce: {str(e)}")
+        error_count += 1
+        execution_time = time.time() - start_time
+        success_rate = ((request_count - error_count) / request_count * 100) if request_count > 0 else 0
+        analyzer.log_performance(execution_time, request_count, error_count,
+                                 data_points, success_rate, response_size,
+                                 screenshot_success, proxy_count=1, node_count=node_count)
+        return None
+
+    if shot_mode == "deferred":
+        task = asyncio.create_task(deferred_screenshot(url, screenshot_file, shot_format, annonce_id, user_id,
+                                                       f"{BASE_URL}/{timestamp}/{screenshot_filename}"))
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+
+    response_data["timings_ms"] = timer.as_ms()
+    stage_stats.record(timer)
+    print(f"Durée par étape (ms) : {response_data['timings_ms']}")
+
+    error_count += img_error_count
+    data_points = sum(1 for v in response_data.values() if v is not None) + img_count
+    success_rate = ((request_count - error_count) / request_count * 100) if request_count > 0 else 0
+
+    execution_time = time.time() - start_time
+    proxy_count = 1
+    analyzer.log_performance(execution_time, request_count, error_count,
+                             data_points, success_rate, response_size,
+                             screenshot_success, proxy_count, node_count,
+                             bytes_received=bytes_received, load_time=load_time, tier=tier)
+
+    return response_data
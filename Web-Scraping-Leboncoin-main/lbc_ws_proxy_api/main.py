@@ -1,4 +1,3 @@
-import asyncio
 import logging
 from flask import Flask, request, jsonify, send_from_directory
 from flasgger import Swagger
@@ -6,9 +5,13 @@ from flask_cors import CORS
 import os
 from dotenv import load_dotenv
 
-from config import WebScrapingPerformanceAnalyzer
-from lbc_ws_proxy_methods import scrape_search
+from config import WebScrapingPerformanceAnalyzer, SCRAPE_WORKERS, SCRAPE_QUEUE_SIZE
+from lbc_ws_proxy_methods import (browser_pool, html_fetcher, image_fetcher, image_variants, scrape_search,
+                                  screenshot_stats, stage_stats, tier_stats, traffic_stats)
+from screenshots import SCREENSHOT_FORMATS, SCREENSHOT_MODES
 from auth_utils import extract_user_id_from_bearer_token
+from scrape_jobs import JobQueue, QueueFull
+from batch_scrape import scrape_batch, validate_items
 
 # Charger les variables d'environnement
 load_dotenv()
@@ -39,20 +42,85 @@ swagger = Swagger(app)
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Attente maximale (secondes) d'un client qui suit un travail avec ?wait=
+MAX_JOB_WAIT = 60
+# Durée de cache des photos : un blob (ou sa déclinaison) ne change jamais de contenu
+IMAGE_CACHE_SECONDS = 365 * 24 * 3600
+
+
+# Fonction exécutée par la file de travaux pour une annonce
+# Paramètres : url (str), annonce_id (int), user_id (int), block_resources (bool, None = SCRAPE_BLOCK_RESOURCES),
+# screenshot (str, None = SCREENSHOT_MODE), screenshot_format (str, None = SCREENSHOT_FORMAT)
+# Retourne le résultat du scraping et ses métriques
+def run_scrape(url: str, annonce_id: int, user_id: int, block_resources: bool = None,
+               screenshot: str = None, screenshot_format: str = None) -> dict:
+    analyzer = WebScrapingPerformanceAnalyzer()
+    # Exécuté dans la boucle du pool de navigateurs, qui garde les connexions CDP ouvertes
+    response = browser_pool.run(scrape_search(url=url, analyzer=analyzer, annonce_id=annonce_id, user_id=user_id,
+                                              block_resources=block_resources, screenshot=screenshot,
+                                              screenshot_format=screenshot_format))
+
+    scraping_success = response is not None
+    return {
+        "scraping_success": scraping_success,
+        "message": "Scraping réussi" if scraping_success else "Échec du scraping",
+        # Mesures brutes du travail : pyplot n'est pas utilisable depuis les threads de la file
+        "metrics": analyzer.performance_data,
+        "data": response
+    }
+
+
+# Fonction exécutée par la file de travaux pour un lot d'annonces
+# Paramètres : items (liste de {url, id}), user_id (int)
+# Retourne l'état de chaque annonce du lot
+def run_scrape_batch(items: list, user_id: int) -> dict:
+    return browser_pool.run(scrape_batch(items, user_id, WebScrapingPerformanceAnalyzer()))
+
+
+scrape_jobs = JobQueue(run_scrape, workers=SCRAPE_WORKERS, max_queue=SCRAPE_QUEUE_SIZE)
+# Un lot occupe déjà plusieurs connexions du pool : les lots passent un par un
+batch_jobs = JobQueue(run_scrape_batch, workers=1, max_queue=SCRAPE_QUEUE_SIZE)
+
+
 # Ajout d’un endpoint pour servir les images statiques
 @app.route('/images/<path:filename>')
 def serve_image(filename):
+    """
+    Sert une photo, une capture ou une déclinaison.
+    Pour les photos stockées par empreinte (blobs/...), ?w=<largeur> sert la miniature la plus proche
+    et ?format=webp|jpeg le format ; sans ?format, le WebP est servi aux navigateurs qui l'acceptent.
+    """
     image_dir = os.path.join(os.getcwd(), 'scraped_data')
-    return send_from_directory(image_dir, filename)
+    if image_variants.digest_of(filename) is None:
+        return send_from_directory(image_dir, filename)
+
+    fmt = request.args.get('format')
+    if fmt not in ('webp', 'jpeg'):
+        fmt = 'webp' if 'image/webp' in request.headers.get('Accept', '') else None
+    variant = image_variants.select(filename, request.args.get('w', type=int), fmt)
+    if variant is not None and image_variants.failed(filename):
+        # Déclinaisons impossibles (photo que Pillow ne sait pas lire) : l'original, sans nouvelle tentative
+        variant = None
+
+    if variant is not None and not image_variants.exists(variant):
+        # Déclinaison pas encore créée (ou photo antérieure aux déclinaisons) : l'original, brièvement en cache
+        image_variants.submit(filename)
+        response = send_from_directory(image_dir, filename, max_age=60)
+    else:
+        response = send_from_directory(image_dir, variant or filename, max_age=IMAGE_CACHE_SECONDS)
+        response.headers['Cache-Control'] = f"public, max-age={IMAGE_CACHE_SECONDS}, immutable"
+    response.vary.add('Accept')
+    return response
 
 
 @app.route("/api/v1/scrape", methods=["PUT"])
 def scrape_endpoint():
     """
-    Scrape une URL et met à jour l'annonce associée en utilisant le user_id extrait du token JWT.
+    Planifie le scraping d'une URL et la mise à jour de l'annonce associée (user_id extrait du token JWT).
+    Le travail est exécuté en arrière-plan ; son état est donné par GET /api/v1/scrape/jobs/<job_id>.
     ---
     put:
-      summary: Scraping + update d'annonce (user_id depuis JWT)
+      summary: Scraping + update d'annonce (user_id depuis JWT), en arrière-plan
       requestBody:
         required: true
         content:
@@ -66,6 +134,16 @@ def scrape_endpoint():
                 id:
                   type: integer
                   example: 123
+                block_resources:
+                  type: boolean
+                  description: "Bloque images, polices, médias et scripts tiers (par défaut SCRAPE_BLOCK_RESOURCES)"
+                screenshot:
+                  type: string
+                  enum: [none, inline, deferred]
+                  description: "Capture d'écran : aucune, avant la réponse ou après (par défaut SCREENSHOT_MODE)"
+                screenshot_format:
+                  type: string
+                  enum: [jpeg, webp, png]
               required:
                 - url
                 - id
@@ -78,12 +156,12 @@ def scrape_endpoint():
             type: string
             example: "Bearer eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9..."
       responses:
-        200:
-          description: Résultat du scraping et métriques
+        202:
+          description: Travail enregistré (job_id, status_url)
         400:
           description: Requête mal formée (manque url, id ou token)
-        500:
-          description: Erreur serveur
+        503:
+          description: File de travaux pleine
     """
     logging.info(f"Headers reçus: {dict(request.headers)}")
     try:
@@ -103,28 +181,213 @@ def scrape_endpoint():
     if not url or annonce_id is None:
         return jsonify({"error": "Champs 'url' et 'id' requis.", "received": {"url": url, "id": annonce_id}}), 400
 
+    block_resources = payload.get("block_resources")
+    if block_resources is not None and not isinstance(block_resources, bool):
+        return jsonify({"error": "Le champ 'block_resources' doit être un booléen."}), 400
+
+    screenshot = payload.get("screenshot")
+    screenshot_format = payload.get("screenshot_format")
+    if screenshot is not None and screenshot not in SCREENSHOT_MODES:
+        return jsonify({"error": f"Le champ 'screenshot' doit valoir {', '.join(SCREENSHOT_MODES)}."}), 400
+    if screenshot_format is not None and screenshot_format not in SCREENSHOT_FORMATS:
+        return jsonify({"error": f"Le champ 'screenshot_format' doit valoir {', '.join(SCREENSHOT_FORMATS)}."}), 400
+
     user_id, err = extract_user_id_from_bearer_token()
     if user_id is None:
         return jsonify({"error": "Impossible d'extraire user_id depuis token.", "details": err}), 400
 
-    analyzer = WebScrapingPerformanceAnalyzer()
+    try:
+        job = scrape_jobs.submit(user_id, url=url, annonce_id=annonce_id, user_id=user_id,
+                                 block_resources=block_resources, screenshot=screenshot,
+                                 screenshot_format=screenshot_format)
+    except QueueFull as e:
+        return jsonify({"error": "Trop de scrapings en attente, réessayer plus tard.", "details": str(e)}), 503
+
+    status_url = f"/api/v1/scrape/jobs/{job['job_id']}"
+    return jsonify({**job, "status_url": status_url}), 202, {"Location": status_url}
+
 
+@app.route("/api/v1/scrape/batch", methods=["PUT"])
+def scrape_batch_endpoint():
+    """
+    Planifie le scraping d'un lot d'annonces de l'utilisateur (user_id extrait du token JWT).
+    Les annonces sont scrapées simultanément puis enregistrées ensemble ; l'état de chaque
+    annonce est donné par GET /api/v1/scrape/batch/<job_id>.
+    ---
+    put:
+      summary: Scraping groupé + update des annonces, en arrière-plan
+      requestBody:
+        required: true
+        content:
+          application/json:
+            schema:
+              type: object
+              properties:
+                items:
+                  type: array
+                  description: "Annonces à rafraîchir (200 au plus)"
+                  items:
+                    type: object
+                    properties:
+                      url:
+                        type: string
+                      id:
+                        type: integer
+              required:
+                - items
+      parameters:
+        - name: Authorization
+          in: header
+          description: "Bearer token contenant user_id"
+          required: true
+          schema:
+            type: string
+      responses:
+        202:
+          description: Lot enregistré (job_id, status_url)
+        400:
+          description: Lot mal formé ou token invalide
+        503:
+          description: File de travaux pleine
+    """
+    payload = request.get_json(silent=True) or {}
     try:
-        response = asyncio.run(scrape_search(url=url, analyzer=analyzer, annonce_id=annonce_id, user_id=user_id))
-
-        scraping_success = response is not None
-        message = "Scraping réussi" if scraping_success else "Échec du scraping"
-        metrics = analyzer.plot_performance_metrics() if hasattr(analyzer, "plot_performance_metrics") else None
-
-        return jsonify({
-            "scraping_success": scraping_success,
-            "message": message,
-            "metrics": metrics,
-            "data": response
-        }), 200
-    except Exception as e:
-        logger.exception("Erreur inattendue lors du scraping")
-        return jsonify({"error": f"Erreur inattendue: {str(e)}"}), 500
+        items = validate_items(payload.get("items"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    user_id, err = extract_user_id_from_bearer_token()
+    if user_id is None:
+        return jsonify({"error": "Impossible d'extraire user_id depuis token.", "details": err}), 400
+
+    try:
+        job = batch_jobs.submit(user_id, items=items, user_id=user_id)
+    except QueueFull as e:
+        return jsonify({"error": "Trop de lots en attente, réessayer plus tard.", "details": str(e)}), 503
+
+    status_url = f"/api/v1/scrape/batch/{job['job_id']}"
+    return jsonify({**job, "status_url": status_url}), 202, {"Location": status_url}
+
+
+@app.route("/api/v1/scrape/batch/<job_id>", methods=["GET"])
+def scrape_batch_job_endpoint(job_id):
+    """
+    État d'un lot de scraping et, une fois terminé, l'état de chaque annonce
+    (saved, not_found, failed, unsupported).
+    ---
+    get:
+      summary: Suivi d'un lot de scraping
+      parameters:
+        - name: job_id
+          in: path
+          required: true
+          schema:
+            type: string
+        - name: wait
+          in: query
+          description: "Attendre au plus N secondes (60 max) la fin du lot avant de répondre"
+          required: false
+          schema:
+            type: integer
+      responses:
+        200:
+          description: État du lot
+        404:
+          description: Lot inconnu ou expiré
+    """
+    return _job_status(batch_jobs, job_id)
+
+
+@app.route("/api/v1/scrape/jobs/<job_id>", methods=["GET"])
+def scrape_job_endpoint(job_id):
+    """
+    État d'un travail de scraping (queued, running, succeeded, failed) et son résultat.
+    ---
+    get:
+      summary: Suivi d'un travail de scraping
+      parameters:
+        - name: job_id
+          in: path
+          required: true
+          schema:
+            type: string
+        - name: wait
+          in: query
+          description: "Attendre au plus N secondes (60 max) la fin du travail avant de répondre"
+          required: false
+          schema:
+            type: integer
+        - name: Authorization
+          in: header
+          description: "Bearer token du propriétaire du travail"
+          required: true
+          schema:
+            type: string
+      responses:
+        200:
+          description: État du travail (résultat du scraping une fois terminé)
+        400:
+          description: Token ou paramètre wait invalide
+        404:
+          description: Travail inconnu ou expiré
+    """
+    return _job_status(scrape_jobs, job_id)
+
+
+# Réponse commune aux routes de suivi des travaux : état du travail de l'utilisateur du token
+def _job_status(jobs: JobQueue, job_id: str):
+    user_id, err = extract_user_id_from_bearer_token()
+    if user_id is None:
+        return jsonify({"error": "Impossible d'extraire user_id depuis token.", "details": err}), 400
+
+    try:
+        wait = min(float(request.args.get("wait", 0)), MAX_JOB_WAIT)
+    except ValueError:
+        return jsonify({"error": "Le paramètre 'wait' doit être un nombre de secondes."}), 400
+
+    job = jobs.wait(job_id, owner=user_id, timeout=wait)
+    if job is None:
+        return jsonify({"error": f"Travail {job_id} inconnu ou expiré."}), 404
+    return jsonify(job), 200
+
+
+@app.route("/api/v1/scrape/stats", methods=["GET"])
+def scrape_stats_endpoint():
+    """
+    Statistiques de la file de travaux et du pool de navigateurs.
+    ---
+    get:
+      summary: Profondeur de la file, temps d'attente et d'exécution des scrapings
+      responses:
+        200:
+          description: "jobs : file de travaux ; batches : lots ; pool : connexions au navigateur ; images : téléchargements ; variants : miniatures ; traffic : octets et temps de chargement des pages par mode ; tiers : voie (http ou browser) des annonces obtenues ; http : requêtes de la voie rapide ; screenshots : captures par format ; stages : durée par étape"
+    """
+    return jsonify({
+        "jobs": scrape_jobs.stats(),
+        "batches": batch_jobs.stats(),
+        "pool": browser_pool.stats(),
+        "images": image_fetcher.stats(),
+        "variants": image_variants.stats(),
+        "traffic": traffic_stats.stats(),
+        "tiers": tier_stats.stats(),
+        "http": html_fetcher.stats(),
+        "screenshots": screenshot_stats.stats(),
+        "stages": stage_stats.stats()
+    }), 200
+
+
+@app.route("/api/v1/scrape/pool", methods=["GET"])
+def pool_stats_endpoint():
+    """
+    Statistiques du pool de connexions au navigateur.
+    ---
+    get:
+      summary: Latence d'obtention d'une page et taux de réutilisation des connexions
+      responses:
+        200:
+          description: Compteurs du pool (acquires, reused, reuse_ratio, acquire_avg_ms, ...)
+    """
+    return jsonify(browser_pool.stats()), 200
 
 
 if __name__ == "__main__":
@@ -0,0 +1,119 @@
+"""
+Blocage des ressources inutiles au scraping et mesure du trafic de chaque page.
+
+Le scraping ne lit que le JSON __NEXT_DATA__ de la page, mais le navigateur
+distant (facturé au volume) chargeait toutes les photos, polices, vidéos,
+traceurs et publicités. En mode blocage, les requêtes de type image, media et
+font sont abandonnées, ainsi que les scripts tiers : seuls les scripts des hôtes
+de SITE_ALLOW_LISTS (le site lui-même et sa protection anti-robots) sont chargés.
+
+Chaque page mesure ses octets reçus et son temps de chargement ; TrafficStats
+les cumule par mode pour comparer la bande passante avec et sans blocage.
+"""
+import asyncio
+import threading
+from contextlib import suppress
+from urllib.parse import urlparse
+
+# Types de ressources jamais nécessaires au scraping
+BLOCKED_RESOURCE_TYPES = {"image", "media", "font"}
+
+# Hôtes dont les scripts restent autorisés, par site (le domaine du site et ses sous-domaines sont compris)
+SITE_ALLOW_LISTS = {
+    # DataDome : bloquer son script déclenche la page de vérification anti-robots
+    "leboncoin.fr": ("leboncoin.fr", "datadome.co", "captcha-delivery.com"),
+}
+
+
+def host_matches(host: str, domains) -> bool:
+    return any(host == domain or host.endswith("." + domain) for domain in domains)
+
+
+def allowed_script_hosts(url: str) -> tuple:
+    """Hôtes dont les scripts sont chargés pour une page de `url` (par défaut, son seul hôte)."""
+    host = (urlparse(url).hostname or "").lower()
+    for site, domains in SITE_ALLOW_LISTS.items():
+        if host_matches(host, (site,)):
+            return domains
+    return (host,)
+
+
+class PageTraffic:
+    """Blocage éventuel des ressources d'une page et compteurs de son trafic."""
+
+    def __init__(self, url: str, block: bool = True):
+        self.block = block
+        self.allowed_hosts = allowed_script_hosts(url)
+        self.requests = 0
+        self.blocked = 0
+        self._sizes = []
+
+    async def attach(self, page):
+        """À appeler avant page.goto."""
+        if self.block:
+            await page.route("**/*", self._route)
+        page.on("request", self._on_request)
+        page.on("requestfinished", self._on_finished)
+
+    def should_block(self, request) -> bool:
+        if request.resource_type in BLOCKED_RESOURCE_TYPES:
+            return True
+        if request.resource_type == "script":
+            host = (urlparse(request.url).hostname or "").lower()
+            return not host_matches(host, self.allowed_hosts)
+        return False
+
+    async def bytes_received(self) -> int:
+        """Octets reçus (en-têtes et corps) pour les requêtes terminées de la page."""
+        sizes = await asyncio.gather(*self._sizes, return_exceptions=True)
+        return sum(s.get("responseHeadersSize", 0) + s.get("responseBodySize", 0)
+                   for s in sizes if isinstance(s, dict))
+
+    async def _route(self, route):
+        with suppress(Exception):
+            if self.should_block(route.request):
+                self.blocked += 1
+                await route.abort("blockedbyclient")
+            else:
+                await route.continue_()
+
+    def _on_request(self, request):
+        self.requests += 1
+
+    def _on_finished(self, request):
+        self._sizes.append(asyncio.ensure_future(request.sizes()))
+
+
+class TrafficStats:
+    """Trafic cumulé des pages scrapées, par mode ("blocking" ou "full")."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._modes = {}
+
+    def record(self, block: bool, bytes_received: int, load_time: float, requests: int, blocked: int):
+        mode = "blocking" if block else "full"
+        with self._lock:
+            m = self._modes.setdefault(mode, {"pages": 0, "bytes": 0, "load_s": 0.0, "requests": 0, "blocked": 0})
+            m["pages"] += 1
+            m["bytes"] += bytes_received
+            m["load_s"] += load_time
+            m["requests"] += requests
+            m["blocked"] += blocked
+
+    def stats(self) -> dict:
+        """Par mode : pages, octets et temps de chargement moyens par page, requêtes bloquées."""
+        with self._lock:
+            modes = {mode: dict(m) for mode, m in self._modes.items()}
+        report = {}
+        for mode, m in modes.items():
+            report[mode] = {
+                "pages": m["pages"],
+                "avg_bytes": round(m["bytes"] / m["pages"]),
+                "avg_load_ms": round(m["load_s"] / m["pages"] * 1000, 1),
+                "avg_requests": round(m["requests"] / m["pages"], 1),
+                "avg_blocked": round(m["blocked"] / m["pages"], 1),
+            }
+        if "blocking" in report and "full" in report and report["full"]["avg_bytes"]:
+            report["bytes_saved_ratio"] = round(1 - report["blocking"]["avg_bytes"] / report["full"]["avg_bytes"], 3)
+        return report
@@ -0,0 +1,164 @@
+"""
+File de travaux de scraping exécutés en arrière-plan.
+
+Un scraping peut durer plus d'une minute (chargement de la page par le navigateur
+distant) : la route HTTP enregistre un travail et répond aussitôt avec son
+identifiant, un nombre borné de threads exécute les travaux dans l'ordre
+d'arrivée, et le client consulte l'état du travail (éventuellement en attendant
+sa fin, voir JobQueue.wait).
+
+Un travail échoue si le handler lève une exception, ne retourne rien, ou retourne
+un résultat dont "scraping_success" est faux (le résultat est alors conservé).
+Les travaux terminés sont oubliés après ttl secondes.
+"""
+import queue
+import threading
+import time
+import uuid
+
+
+class QueueFull(Exception):
+    """La file a atteint sa taille maximale."""
+
+
+class JobQueue:
+    """Travaux exécutés par `workers` threads, au plus `max_queue` en attente."""
+
+    def __init__(self, handler, workers: int = 4, max_queue: int = 100, ttl: float = 3600):
+        self.handler = handler
+        self.workers = workers
+        self.ttl = ttl
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._jobs = {}
+        self._done = {}      # job_id -> threading.Event
+        self._lock = threading.Lock()
+        self._running = 0
+        self._totals = {"submitted": 0, "succeeded": 0, "failed": 0, "rejected": 0,
+                        "wait_total_s": 0.0, "wait_max_s": 0.0, "run_total_s": 0.0, "run_max_s": 0.0}
+        for i in range(workers):
+            threading.Thread(target=self._work, name=f"scrape-job-{i}", daemon=True).start()
+
+    def submit(self, owner, **params) -> dict:
+        """Enregistre un travail pour `owner` et retourne son état. Lève QueueFull si la file est pleine."""
+        job = {
+            "id": uuid.uuid4().hex,
+            "owner": owner,
+            "status": "queued",
+            "params": params,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "result": None,
+            "error": None,
+        }
+        with self._lock:
+            self._purge()
+            self._jobs[job["id"]] = job
+            self._done[job["id"]] = threading.Event()
+        try:
+            self._queue.put_nowait(job["id"])
+        except queue.Full:
+            with self._lock:
+                del self._jobs[job["id"]], self._done[job["id"]]
+                self._totals["rejected"] += 1
+            raise QueueFull(f"{self._queue.maxsize} travaux déjà en attente")
+        with self._lock:
+            self._totals["submitted"] += 1
+            return self._public(job)
+
+    def get(self, job_id: str, owner=None):
+        """État du travail, ou None s'il est inconnu (ou appartient à un autre utilisateur)."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or (owner is not None and job["owner"] != owner):
+                return None
+            return self._public(job)
+
+    def wait(self, job_id: str, owner=None, timeout: float = 0):
+        """Comme get, après avoir attendu au plus `timeout` secondes la fin du travail."""
+        if self.get(job_id, owner) is None:
+            return None
+        done = self._done.get(job_id)
+        if done is not None and timeout > 0:
+            done.wait(timeout)
+        return self.get(job_id, owner)
+
+    def stats(self) -> dict:
+        """Profondeur de la file, travaux en cours, temps d'attente et d'exécution."""
+        with self._lock:
+            t = dict(self._totals)
+            running = self._running
+        started = t["succeeded"] + t["failed"] + running
+        finished = t["succeeded"] + t["failed"]
+        return {
+            "queue_depth": self._queue.qsize(),
+            "max_queue": self._queue.maxsize,
+            "running": running,
+            "workers": self.workers,
+            "submitted": t["submitted"],
+            "succeeded": t["succeeded"],
+            "failed": t["failed"],
+            "rejected": t["rejected"],
+            "wait_avg_s": round(t["wait_total_s"] / started, 2) if started else None,
+            "wait_max_s": round(t["wait_max_s"], 2),
+            "run_avg_s": round(t["run_total_s"] / finished, 2) if finished else None,
+            "run_max_s": round(t["run_max_s"], 2),
+        }
+
+    def _work(self):
+        while True:
+            job_id = self._queue.get()
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is None:
+                    continue
+                job["status"] = "running"
+                job["started_at"] = time.time()
+                waited = job["started_at"] - job["created_at"]
+                self._totals["wait_total_s"] += waited
+                self._totals["wait_max_s"] = max(self._totals["wait_max_s"], waited)
+                self._running += 1
+
+            status, result, error = "succeeded", None, None
+            try:
+                result = self.handler(**job["params"])
+            except Exception as e:
+                print(f"Erreur lors du travail de scraping {job_id}: {str(e)}")
+                status, error = "failed", str(e)
+            else:
+                if result is None:
+                    status, error = "failed", "Aucun résultat"
+                elif isinstance(result, dict) and result.get("scraping_success") is False:
+                    status, error = "failed", result.get("message") or "Échec du scraping"
+
+            with self._lock:
+                job.update(status=status, result=result, error=error, finished_at=time.time())
+                elapsed = job["finished_at"] - job["started_at"]
+                self._totals[status] += 1
+                self._totals["run_total_s"] += elapsed
+                self._totals["run_max_s"] = max(self._totals["run_max_s"], elapsed)
+                self._running -= 1
+                done = self._done.get(job_id)
+            if done is not None:
+                done.set()
+
+    def _purge(self):
+        limit = time.time() - self.ttl
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job["finished_at"] is not None and job["finished_at"] < limit]
+        for job_id in expired:
+            del self._jobs[job_id], self._done[job_id]
+
+    @staticmethod
+    def _public(job: dict) -> dict:
+        """Vue du travail renvoyée au client (sans ses paramètres ni son propriétaire)."""
+        started, finished = job["started_at"], job["finished_at"]
+        return {
+            "job_id": job["id"],
+            "status": job["status"],
+            "created_at": job["created_at"],
+            "wait_s": round((started or time.time()) - job["created_at"], 2),
+            "run_s": round((finished or time.time()) - started, 2) if started else None,
+            "result": job["result"],
+            "error": job["error"],
+        }
@@ -0,0 +1,93 @@
+"""
+Captures d'écran des annonces : facultatives, différées et compressées.
+
+Chaque scraping prenait une capture PNG de la page entière avant l'analyse, soit
+plusieurs secondes et mégaoctets par annonce, alors que la plupart des appelants
+ne la regardent pas. Le mode de capture se choisit par requête :
+  - "none"     : pas de capture ;
+  - "inline"   : capture prise pendant le scraping, avant la réponse ;
+  - "deferred" : capture prise en arrière-plan une fois les données renvoyées.
+Par défaut seule la partie visible de la page est capturée, en JPEG (ou WebP,
+converti avec Pillow) plutôt qu'en PNG. ScreenshotStats compare la durée et la
+taille des captures par format, pour mesurer le gain sur la capture PNG pleine page.
+"""
+import asyncio
+import io
+import threading
+
+from PIL import Image
+
+SCREENSHOT_MODES = ("none", "inline", "deferred")
+SCREENSHOT_FORMATS = ("jpeg", "webp", "png")
+
+
+def _to_webp(content: bytes, quality: int) -> bytes:
+    with Image.open(io.BytesIO(content)) as image:
+        output = io.BytesIO()
+        image.save(output, "WEBP", quality=quality, method=4)
+        return output.getvalue()
+
+
+async def capture(page, path: str, fmt: str = "jpeg", full_page: bool = False, quality: int = 70) -> int:
+    """Enregistre la capture de `page` dans `path` ; retourne sa taille en octets."""
+    if fmt == "png":
+        content = await page.screenshot(full_page=full_page, type="png")
+    else:
+        # Playwright ne produit pas de WebP : capture JPEG peu compressée, puis conversion hors de la boucle
+        content = await page.screenshot(full_page=full_page, type="jpeg",
+                                        quality=quality if fmt == "jpeg" else 90)
+        if fmt == "webp":
+            content = await asyncio.to_thread(_to_webp, content, quality)
+    await asyncio.to_thread(_write, path, content)
+    return len(content)
+
+
+def _write(path: str, content: bytes):
+    with open(path, "wb") as f:
+        f.write(content)
+
+
+class ScreenshotStats:
+    """Captures prises par variante (format et étendue), scrapings sans capture et captures différées."""
+
+    # Référence de comparaison : l'ancienne capture systématique
+    BASELINE = "png-full"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._variants = {}
+        self._counts = {"skipped": 0, "deferred": 0, "failed": 0}
+
+    @staticmethod
+    def variant(fmt: str, full_page: bool) -> str:
+        return f"{fmt}-{'full' if full_page else 'viewport'}"
+
+    def record(self, fmt: str, full_page: bool, seconds: float, size: int):
+        with self._lock:
+            v = self._variants.setdefault(self.variant(fmt, full_page), {"count": 0, "seconds": 0.0, "bytes": 0})
+            v["count"] += 1
+            v["seconds"] += seconds
+            v["bytes"] += size
+
+    def count(self, event: str):
+        """event : "skipped", "deferred" ou "failed"."""
+        with self._lock:
+            self._counts[event] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            variants = {name: dict(v) for name, v in self._variants.items()}
+            report = dict(self._counts)
+        report["variants"] = {
+            name: {"count": v["count"], "avg_ms": round(v["seconds"] / v["count"] * 1000, 1),
+                   "avg_bytes": round(v["bytes"] / v["count"])}
+            for name, v in variants.items()
+        }
+        baseline = report["variants"].get(self.BASELINE)
+        if baseline:
+            for name, v in report["variants"].items():
+                if name != self.BASELINE:
+                    v["ms_saved"] = round(baseline["avg_ms"] - v["avg_ms"], 1)
+                    v["bytes_saved"] = baseline["avg_bytes"] - v["avg_bytes"]
+        return report
+
@@ -0,0 +1,57 @@
+"""
+Durée de chaque étape d'un scraping (requête HTTP, chargement de la page, attente
+de __NEXT_DATA__, bandeau de consentement, capture, analyse, enregistrement).
+
+StageTimer mesure les étapes d'un scraping (les durées d'une même étape répétée,
+par exemple sur plusieurs tentatives, s'additionnent) ; StageStats les cumule
+pour montrer où passe le temps et ce que gagne chaque changement d'attente.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+
+class StageTimer:
+    """Durées des étapes d'un scraping, dans leur ordre d'exécution."""
+
+    def __init__(self):
+        self.stages = {}
+
+    def add(self, name: str, seconds: float):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def as_ms(self) -> dict:
+        return {name: round(seconds * 1000, 1) for name, seconds in self.stages.items()}
+
+
+class StageStats:
+    """Durées cumulées par étape sur tous les scrapings."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}
+
+    def record(self, timer: StageTimer):
+        with self._lock:
+            for name, seconds in timer.stages.items():
+                s = self._stages.setdefault(name, {"count": 0, "total_s": 0.0, "max_s": 0.0})
+                s["count"] += 1
+                s["total_s"] += seconds
+                s["max_s"] = max(s["max_s"], seconds)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stages = {name: dict(s) for name, s in self._stages.items()}
+        return {
+            name: {"count": s["count"], "avg_ms": round(s["total_s"] / s["count"] * 1000, 1),
+                   "max_ms": round(s["max_s"] * 1000, 1)}
+            for name, s in stages.items()
+        }
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Les modules du service s'importent par leur nom (python main.py depuis lbc_ws_proxy_api/)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
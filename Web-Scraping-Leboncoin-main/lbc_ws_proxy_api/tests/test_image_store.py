@@ -0,0 +1,79 @@
+import hashlib
+import os
+import time
+
+from image_store import ImageStore, guess_extension
+
+JPEG = b"\xff\xd8\xff\xe0" + b"photo" * 10
+PNG = b"\x89PNG\r\n\x1a\n" + b"data"
+
+
+def blob_path(store, relative):
+    return os.path.join(store.root, relative)
+
+
+def age(path, seconds):
+    old = time.time() - seconds
+    os.utime(path, (old, old))
+
+
+def test_guess_extension():
+    assert guess_extension(PNG) == "png"
+    assert guess_extension(b"RIFF\x00\x00\x00\x00WEBPVP8 ") == "webp"
+    assert guess_extension(b"\x00\x00\x00\x1cftypavif") == "avif"
+    assert guess_extension(JPEG) == "jpeg"
+
+
+def test_same_content_is_stored_once(tmp_path):
+    store = ImageStore(str(tmp_path))
+    first = store.put("https://img/a.jpg", JPEG)
+    second = store.put("https://img/b.jpg", JPEG)
+    digest = hashlib.sha256(JPEG).hexdigest()
+    assert first == second == f"blobs/{digest[:2]}/{digest}.jpeg"
+    with open(blob_path(store, first), "rb") as f:
+        assert f.read() == JPEG
+    assert store.lookup("https://img/b.jpg") == first
+    assert store.lookup("https://img/c.jpg") is None
+
+
+def test_lookup_refreshes_blob_date(tmp_path):
+    store = ImageStore(str(tmp_path))
+    path = store.put("https://img/a.jpg", JPEG)
+    age(blob_path(store, path), 3 * 86400)
+    assert store.lookup("https://img/a.jpg") == path
+    assert os.path.getmtime(blob_path(store, path)) > time.time() - 60
+    # Réutilisé par une annonce en cours d'enregistrement : pas supprimé
+    assert store.collect_garbage(set(), min_age=86400)["removed"] == 0
+
+
+def test_lookup_of_removed_blob(tmp_path):
+    store = ImageStore(str(tmp_path))
+    path = store.put("https://img/a.jpg", JPEG)
+    os.remove(blob_path(store, path))
+    assert store.lookup("https://img/a.jpg") is None
+
+
+def test_collect_garbage(tmp_path):
+    store = ImageStore(str(tmp_path))
+    kept = store.put("https://img/a.jpg", JPEG)
+    removed = store.put("https://img/b.png", PNG)
+    recent = store.put("https://img/c.jpg", JPEG + b"2")
+    for path in (kept, removed):
+        age(blob_path(store, path), 3 * 86400)
+    digest = os.path.basename(removed).split(".")[0]
+    derived = os.path.join(store.root, "derived", digest[:2], f"{digest}_320.webp")
+    os.makedirs(os.path.dirname(derived))
+    with open(derived, "wb") as f:
+        f.write(b"x")
+
+    referenced = {os.path.basename(kept).split(".")[0]}
+    assert store.collect_garbage(referenced, dry_run=True)["removed"] == 1
+    assert os.path.exists(blob_path(store, removed))
+
+    report = store.collect_garbage(referenced)
+    assert (report["blobs"], report["removed"]) == (3, 1)
+    assert report["freed_bytes"] == len(PNG) + 1
+    assert not os.path.exists(blob_path(store, removed)) and not os.path.exists(derived)
+    assert store.lookup("https://img/b.png") is None
+    assert store.lookup("https://img/a.jpg") == kept
+    assert store.lookup("https://img/c.jpg") == recent
@@ -0,0 +1,79 @@
+import io
+import os
+import time
+
+import pytest
+from PIL import Image
+
+from image_store import ImageStore
+from image_variants import ImageVariants, make_variants
+
+DIGEST = "ab" + "0" * 62
+BLOB = f"blobs/ab/{DIGEST}.jpeg"
+
+
+def jpeg(width, height):
+    output = io.BytesIO()
+    Image.new("RGB", (width, height), (200, 80, 40)).save(output, "JPEG")
+    return output.getvalue()
+
+
+def wait_idle(variants, timeout=30):
+    deadline = time.time() + timeout
+    while variants.stats()["pending"] and time.time() < deadline:
+        time.sleep(0.05)
+    assert variants.stats()["pending"] == 0
+
+
+@pytest.fixture
+def variants(tmp_path):
+    return ImageVariants(str(tmp_path), [800, 320], workers=1)
+
+
+def test_digest_of(variants):
+    assert variants.digest_of(BLOB) == DIGEST
+    assert variants.digest_of("20240101_120000/image_1.jpeg") is None
+    assert variants.digest_of("blobs/ab/pas-une-empreinte.jpeg") is None
+
+
+def test_select_smallest_width_at_least_requested(variants):
+    assert variants.select(BLOB, 100) == f"derived/ab/{DIGEST}_320.jpeg"
+    assert variants.select(BLOB, 320, "webp") == f"derived/ab/{DIGEST}_320.webp"
+    assert variants.select(BLOB, 500) == f"derived/ab/{DIGEST}_800.jpeg"
+
+
+def test_select_original_beyond_largest_width(variants):
+    assert variants.select(BLOB) is None
+    assert variants.select(BLOB, 2000) is None
+    assert variants.select(BLOB, 2000, "webp") == f"derived/ab/{DIGEST}_full.webp"
+    assert variants.select("20240101_120000/image_1.jpeg", 320) is None
+
+
+def test_make_variants_never_upscales(tmp_path):
+    store = ImageStore(str(tmp_path))
+    path = store.put("https://img/a.jpg", jpeg(600, 300))
+    created = make_variants(os.path.join(str(tmp_path), path), str(tmp_path), [320, 800])
+    assert len(created) == 5
+    sizes = {os.path.basename(p).split("_")[1]: Image.open(p).size for p in created}
+    assert sizes["320.jpeg"] == (320, 160)
+    assert sizes["800.webp"] == (600, 300)
+    assert sizes["full.webp"] == (600, 300)
+
+
+def test_submit_creates_variants_in_pool(tmp_path, variants):
+    path = ImageStore(str(tmp_path)).put("https://img/a.jpg", jpeg(1000, 500))
+    variants.submit(path)
+    wait_idle(variants)
+    assert variants.stats()["generated"] == 1
+    assert variants.exists(variants.select(path, 320, "webp"))
+    assert not variants.failed(path)
+
+
+def test_unreadable_photo_is_not_resubmitted(tmp_path, variants):
+    path = ImageStore(str(tmp_path)).put("https://img/a.jpg", b"\xff\xd8 pas une image")
+    variants.submit(path)
+    wait_idle(variants)
+    assert variants.failed(path)
+    variants.submit(path)
+    stats = variants.stats()
+    assert (stats["submitted"], stats["errors"], stats["failed"]) == (1, 1, 1)
@@ -0,0 +1,79 @@
+import threading
+
+import pytest
+
+from scrape_jobs import JobQueue, QueueFull
+
+
+def test_job_runs_and_reports_result():
+    jobs = JobQueue(lambda url: {"url": url}, workers=2)
+    job = jobs.submit("alice", url="https://example.org/1")
+    assert job["status"] in ("queued", "running", "succeeded")
+    done = jobs.wait(job["job_id"], "alice", timeout=5)
+    assert done["status"] == "succeeded"
+    assert done["result"] == {"url": "https://example.org/1"}
+    assert "params" not in done and "owner" not in done
+
+
+def test_failed_job_keeps_error():
+    def fail(url):
+        raise RuntimeError("page indisponible")
+
+    jobs = JobQueue(fail, workers=1)
+    job_id = jobs.submit("alice", url="x")["job_id"]
+    done = jobs.wait(job_id, "alice", timeout=5)
+    assert done["status"] == "failed"
+    assert done["error"] == "page indisponible"
+    assert jobs.stats()["failed"] == 1
+
+
+def test_unsuccessful_scrape_is_failed():
+    results = {"vide": None, "echec": {"scraping_success": False, "message": "Échec du scraping", "data": None}}
+    jobs = JobQueue(lambda url: results[url], workers=1)
+
+    done = jobs.wait(jobs.submit("alice", url="vide")["job_id"], "alice", timeout=5)
+    assert done["status"] == "failed"
+    assert done["error"] == "Aucun résultat"
+
+    done = jobs.wait(jobs.submit("alice", url="echec")["job_id"], "alice", timeout=5)
+    assert done["status"] == "failed"
+    assert done["error"] == "Échec du scraping"
+    assert done["result"] == results["echec"]
+    assert jobs.stats()["failed"] == 2
+    assert jobs.stats()["succeeded"] == 0
+
+
+def test_jobs_are_visible_to_their_owner_only():
+    jobs = JobQueue(lambda: None, workers=1)
+    job_id = jobs.submit("alice")["job_id"]
+    assert jobs.get(job_id, "bob") is None
+    assert jobs.wait(job_id, "bob", timeout=1) is None
+    assert jobs.get(job_id, "alice") is not None
+    assert jobs.get("inconnu") is None
+
+
+def test_queue_full_is_rejected():
+    release = threading.Event()
+    started = threading.Event()
+
+    def blocking():
+        started.set()
+        release.wait(5)
+
+    jobs = JobQueue(blocking, workers=1, max_queue=1)
+    jobs.submit("alice")
+    started.wait(5)
+    jobs.submit("alice")  # en attente
+    with pytest.raises(QueueFull):
+        jobs.submit("alice")
+    stats = jobs.stats()
+    assert (stats["running"], stats["queue_depth"], stats["rejected"]) == (1, 1, 1)
+    release.set()
+
+
+def test_finished_jobs_expire_after_ttl():
+    jobs = JobQueue(lambda: "ok", workers=1, ttl=0)
+    job_id = jobs.submit("alice")["job_id"]
+    assert jobs.wait(job_id, timeout=5)["status"] == "succeeded"
+    jobs.submit("alice")  # la soumission purge les travaux expirés
+    assert jobs.get(job_id) is None
@@ -1,6 +1,8 @@
 import datetime
 import os
 import pandas as pd
+import matplotlib
+matplotlib.use("Agg")  # pas d'affichage : les graphiques sont seulement enregistrés
 import matplotlib.pyplot as plt
 from dotenv import load_dotenv
 
@@ -23,6 +25,16 @@ if not BROWSER_AUTH:
 # URL du WebSocket pour le navigateur Bright Data
 SBR_WS_CDP = f'wss://{BROWSER_AUTH}@brd.superproxy.io:9222'
 
+# Téléchargement des photos (voir image_fetcher.py) : threads, requêtes simultanées
+# par hôte et intervalle minimal (secondes) entre deux requêtes vers un même hôte
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", 8))
+IMAGE_PER_HOST = int(os.getenv("IMAGE_PER_HOST", 4))
+IMAGE_MIN_INTERVAL = float(os.getenv("IMAGE_MIN_INTERVAL", 0.1))
+
+# File de travaux de scraping (voir scrape_jobs.py)
+SCRAPE_WORKERS = int(os.getenv("SCRAPE_WORKERS", 4))
+SCRAPE_QUEUE_SIZE = int(os.getenv("SCRAPE_QUEUE_SIZE", 100))
+
 class WebScrapingPerformanceAnalyzer:
     """Classe pour analyser et visualiser les performances du scraping."""
     def __init__(self):
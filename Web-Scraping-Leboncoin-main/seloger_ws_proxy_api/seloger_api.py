@@ -8,9 +8,10 @@ from flask_cors import CORS
 from flasgger import Swagger
 from dotenv import load_dotenv
 
-from config import WebScrapingPerformanceAnalyzer
+from config import WebScrapingPerformanceAnalyzer, SCRAPE_WORKERS, SCRAPE_QUEUE_SIZE
 from seloger_ws_proxy import scrape_search   # <-- nom du module ci-dessus
 from auth_utils import extract_user_id_from_bearer_token
+from scrape_jobs import JobQueue, QueueFull
 
 load_dotenv()
 
@@ -40,6 +41,26 @@ swagger = Swagger(app)
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Attente maximale (secondes) d'un client qui suit un travail avec ?wait=
+MAX_JOB_WAIT = 60
+
+
+def run_scrape(url: str, annonce_id, user_id: int) -> dict:
+    """Scraping d'une annonce, exécuté par la file de travaux. Retourne le résultat et ses métriques."""
+    analyzer = WebScrapingPerformanceAnalyzer()
+    response = asyncio.run(scrape_search(url=url, annonce_id=annonce_id, user_id=user_id, analyzer=analyzer))
+    scraping_success = response is not None
+    return {
+        "scraping_success": scraping_success,
+        "message": "Scraping réussi" if scraping_success else "Échec du scraping",
+        # Mesures brutes du travail : pyplot n'est pas utilisable depuis les threads de la file
+        "metrics": analyzer.performance_data,
+        "data": response
+    }
+
+
+scrape_jobs = JobQueue(run_scrape, workers=SCRAPE_WORKERS, max_queue=SCRAPE_QUEUE_SIZE)
+
 # Sert les images écrites par le scraper
 @app.route('/images/<path:filename>')
 def serve_image(filename):
@@ -49,10 +70,11 @@ def serve_image(filename):
 @app.route("/api/v1/scrape-seloger", methods=["PUT"])
 def scrape_seloger_endpoint():
     """
-    Scrape une URL SeLoger et met à jour l'annonce en DB (user_id depuis JWT).
+    Planifie le scraping d'une URL SeLoger et la mise à jour de l'annonce en DB (user_id depuis JWT).
+    Le travail est exécuté en arrière-plan ; son état est donné par GET /api/v1/scrape-seloger/jobs/<job_id>.
     ---
     put:
-      summary: Scraping + update d'annonce (SeLoger)
+      summary: Scraping + update d'annonce (SeLoger), en arrière-plan
       requestBody:
         required: true
         content:
@@ -80,12 +102,12 @@ def scrape_seloger_endpoint():
             type: string
             example: "Bearer eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9..."
       responses:
-        200:
-          description: Résultat du scraping et métriques
+        202:
+          description: Travail enregistré (job_id, status_url)
         400:
           description: Requête mal formée
-        500:
-          description: Erreur interne
+        503:
+          description: File de travaux pleine
     """
     logger.info(f"Headers reçus: {dict(request.headers)}")
     try:
@@ -111,23 +133,75 @@ def scrape_seloger_endpoint():
     if user_id is None:
         return jsonify({"error": "Impossible d'extraire user_id depuis token.", "details": err}), 400
 
-    analyzer = WebScrapingPerformanceAnalyzer()
+    try:
+        job = scrape_jobs.submit(user_id, url=url, annonce_id=annonce_id, user_id=user_id)
+    except QueueFull as e:
+        return jsonify({"error": "Trop de scrapings en attente, réessayer plus tard.", "details": str(e)}), 503
+
+    status_url = f"/api/v1/scrape-seloger/jobs/{job['job_id']}"
+    return jsonify({**job, "status_url": status_url}), 202, {"Location": status_url}
+
+
+@app.route("/api/v1/scrape-seloger/jobs/<job_id>", methods=["GET"])
+def scrape_seloger_job_endpoint(job_id):
+    """
+    État d'un travail de scraping SeLoger (queued, running, succeeded, failed) et son résultat.
+    ---
+    get:
+      summary: Suivi d'un travail de scraping
+      parameters:
+        - name: job_id
+          in: path
+          required: true
+          schema:
+            type: string
+        - name: wait
+          in: query
+          description: "Attendre au plus N secondes (60 max) la fin du travail avant de répondre"
+          required: false
+          schema:
+            type: integer
+        - name: Authorization
+          in: header
+          description: "Bearer <JWT> du propriétaire du travail"
+          required: true
+          schema:
+            type: string
+      responses:
+        200:
+          description: État du travail (résultat du scraping une fois terminé)
+        400:
+          description: Token ou paramètre wait invalide
+        404:
+          description: Travail inconnu ou expiré
+    """
+    user_id, err = extract_user_id_from_bearer_token()
+    if user_id is None:
+        return jsonify({"error": "Impossible d'extraire user_id depuis token.", "details": err}), 400
 
     try:
-        response = asyncio.run(scrape_search(url=url, annonce_id=annonce_id, user_id=user_id, analyzer=analyzer))
-        scraping_success = response is not None
-        message = "Scraping réussi" if scraping_success else "Échec du scraping"
-        metrics = analyzer.plot_performance_metrics() if hasattr(analyzer, "plot_performance_metrics") else None
-
-        return jsonify({
-            "scraping_success": scraping_success,
-            "message": message,
-            "metrics": metrics,
-            "data": response
-        }), 200
-    except Exception as e:
-        logger.exception("Erreur inattendue lors du scraping")
-        return jsonify({"error": f"Erreur inattendue: {str(e)}"}), 500
+        wait = min(float(request.args.get("wait", 0)), MAX_JOB_WAIT)
+    except ValueError:
+        return jsonify({"error": "Le paramètre 'wait' doit être un nombre de secondes."}), 400
+
+    job = scrape_jobs.wait(job_id, owner=user_id, timeout=wait)
+    if job is None:
+        return jsonify({"error": f"Travail {job_id} inconnu ou expiré."}), 404
+    return jsonify(job), 200
+
+
+@app.route("/api/v1/scrape-seloger/stats", methods=["GET"])
+def scrape_seloger_stats_endpoint():
+    """
+    Statistiques de la file de travaux de scraping.
+    ---
+    get:
+      summary: Profondeur de la file, temps d'attente et d'exécution des scrapings
+      responses:
+        200:
+          description: Compteurs de la file (queue_depth, running, wait_avg_s, run_avg_s, ...)
+    """
+    return jsonify(scrape_jobs.stats()), 200
 
 
 if __name__ == "__main__":
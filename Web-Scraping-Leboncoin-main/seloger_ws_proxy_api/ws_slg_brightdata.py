@@ -8,13 +8,13 @@ import logging
 from typing import Dict, Optional, Tuple, List
 import re
 
-import requests
 from bs4 import BeautifulSoup
 from tenacity import retry, stop_after_attempt, wait_exponential
 from playwright.async_api import async_playwright
 
-from config import proxy, SBR_WS_CDP, WebScrapingPerformanceAnalyzer
+from config import proxy, SBR_WS_CDP, WebScrapingPerformanceAnalyzer, IMAGE_WORKERS, IMAGE_PER_HOST, IMAGE_MIN_INTERVAL
 from database import DatabaseManager
+from image_fetcher import ImageFetcher
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
@@ -37,24 +37,21 @@ def extract_number(value: str) -> Optional[int]:
     return None
 
 
+# Session partagée pour les photos, à travers le proxy (voir image_fetcher.py)
+image_fetcher = ImageFetcher(
+    proxy,
+    max_workers=IMAGE_WORKERS,
+    per_host=IMAGE_PER_HOST,
+    min_interval=IMAGE_MIN_INTERVAL,
+    verify=False  # <--- ignore l'erreur SSL (certificat du proxy)
+)
+
+
 def fetch_image(url: str) -> Optional[bytes]:
     """
-    Télécharge une image via requests.
-    - Respecte le proxy (si défini dans config.proxy)
-    - Vérification SSL configurable via env REQUESTS_VERIFY_SSL
+    Télécharge une image avec la session partagée (connexions réutilisées à travers le proxy).
     """
-    try:
-        response = requests.get(
-            url,
-            proxies={"http": proxy, "https": proxy},
-            timeout=10,
-            verify=False  # <--- ignore l'erreur SSL
-        )
-        response.raise_for_status()
-        return response.content
-    except requests.RequestException as e:
-        print(f"Erreur lors du téléchargement de l'image {url} : {e}")
-        return None
+    return image_fetcher.fetch(url)
 
 
 def save_data(incoming_data: Dict, url: str, annonce_id: str, user_id: int,
@@ -66,7 +63,8 @@ def save_data(incoming_data: Dict, url: str, annonce_id: str, user_id: int,
     - Mise à jour en base via DatabaseManager
     Retourne (nb_erreurs_image, nb_images)
     """
-    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    # Microsecondes : des scrapings simultanés (JobQueue) n'écrivent pas dans le même dossier
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S_%f")
     request_dir = os.path.join(OUTPUT_DIR, timestamp)
     os.makedirs(request_dir, exist_ok=True)
 
@@ -74,8 +72,8 @@ def save_data(incoming_data: Dict, url: str, annonce_id: str, user_id: int,
     image_urls: List[str] = incoming_data.get('images', {}).get('urls', []) or []
     error_count = 0
 
-    for i, img_url in enumerate(image_urls, start=1):
-        img_data = fetch_image(img_url)
+    # Téléchargement en parallèle, dans l'ordre des URLs
+    for i, img_data in enumerate(image_fetcher.fetch_all(image_urls), start=1):
         if img_data:
             filename = f"image_{timestamp}_{i}.jpeg"
             filepath = os.path.join(request_dir, filename)
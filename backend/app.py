@@ -1,6 +1,20 @@
-from flask import Flask, request, jsonify
+import contextlib
+import hmac
+import os
+
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flasgger import Swagger
-from db_config import get_connection
+from ventes_query import ORDERINGS, SORTS, DEFAULT_SORT, parse_bbox, expand_bbox, parse_price, parse_dates, build_ventes_query
+from shard_router import ShardRouter
+from search_index import SearchIndex, normalize
+from snapshot import SnapshotStore
+from export import EXPORT_FORMATS, build_export_query, export_filename, iter_batches, stream_csv, stream_parquet
+from cost_guard import CostGuard, MODE_HEADER, ESTIMATE_HEADER
+from zones import CRS, CommuneZones, Lambert93Zone, parse_polygon
+from single_flight import SingleFlight
+from data_reload import DataReloader
+from compact import RESPONSE_FORMATS, compact_payload
+from parcelles import MAX_BATCH, ParcelHistory
 from flask_cors import CORS
 
 app = Flask(__name__)
@@ -19,7 +33,7 @@ CORS(app, resources={
         "methods": ["GET", "POST", "OPTIONS"],
         "allow_headers": ["Content-Type", "Authorization"],
         "supports_credentials": True,
-        "expose_headers": ["Content-Type", "Authorization"],
+        "expose_headers": ["Content-Type", "Authorization", MODE_HEADER, ESTIMATE_HEADER],
         "max_age": 3600
     }
 })
@@ -30,6 +44,136 @@ app.config['SWAGGER'] = {
 }
 swagger = Swagger(app)
 
+# Une seule base par défaut, plusieurs shards par département si DVF_SHARDS_FILE est défini
+shard_router = ShardRouter.from_env()
+# Index des communes et voies, reconstruit après chaque import (par data_reloader)
+search_index = SearchIndex(shard_router, check_interval=None)
+# Instantané mmap partagé entre les workers (DVF_SNAPSHOT_DIR), sinon lecture en base
+snapshot_store = SnapshotStore.from_env()
+# Estimation du coût des requêtes ventes : détail, agrégation par cellules ou refus
+cost_guard = CostGuard(shard_router)
+# Emprise des communes (paramètre code_commune), calculée une fois par commune
+commune_zones = CommuneZones(shard_router)
+# Requêtes ventes identiques simultanées : une seule exécution, résultat partagé
+ventes_flight = SingleFlight()
+# Historique des ventes par parcelle, avec cache
+parcel_history = ParcelHistory(shard_router)
+# Rechargement à chaud de l'instantané et des caches quand un import a eu lieu
+data_reloader = DataReloader(shard_router, snapshot_store, search_index,
+                             [shard_router, commune_zones, parcel_history])
+# Jeton des routes d'administration (désactivées sans DVF_ADMIN_TOKEN)
+ADMIN_TOKEN = os.getenv("DVF_ADMIN_TOKEN")
+
+
+@app.before_request
+def check_data_version():
+    data_reloader.check()
+
+
+@contextlib.contextmanager
+def _snapshot_lease():
+    """Instantané en service, gardé ouvert jusqu'à la fin de la requête (None sans DVF_SNAPSHOT_DIR)."""
+    if snapshot_store is None:
+        yield None
+    else:
+        with snapshot_store.acquire() as snapshot:
+            yield snapshot
+
+
+def _json_body(payload):
+    return jsonify(payload).get_data()
+
+
+VENTE_FIELDS = [
+    "id_mutation", "valeur_fonciere", "date_mutation", "latitude", "longitude", "adresse_numero",
+    "adresse_nom_voie", "code_postal", "nom_commune", "id_parcelle", "surface_terrain",
+]
+
+
+def _vente_values(r):
+    """Valeurs d'une ligne ventes, dans l'ordre de VENTE_FIELDS."""
+    return [
+        r[0],
+        float(r[1]) if r[1] is not None else 0,
+        str(r[2]) if r[2] is not None else "",
+        float(r[3]) if r[3] is not None else 0,
+        float(r[4]) if r[4] is not None else 0,
+        r[5] if r[5] is not None else "",
+        r[6] if r[6] is not None else "",
+        r[7] if r[7] is not None else "",
+        r[8] if r[8] is not None else "",
+        r[9] or "",
+        float(r[10]) if r[10] is not None else None,
+    ]
+
+
+def _execute_ventes(snapshot, bbox, price_param, date_param, limit, offset, mode, zone, sort, response_format):
+    """Exécute la requête ventes ; retourne (corps JSON sérialisé, statut, en-têtes)."""
+
+    # Le mode sample est déjà borné par sa grille ; seul le mode top lit toute la zone
+    query_mode, estimated_rows = "detail", None
+    if mode == "top":
+        estimated_rows = cost_guard.estimate(bbox, price_param, date_param, snapshot, zone)
+        query_mode = cost_guard.decide(estimated_rows)
+        print(f"Estimation: {estimated_rows} ventes -> {query_mode}")
+    headers = {MODE_HEADER: query_mode}
+    if estimated_rows is not None:
+        headers[ESTIMATE_HEADER] = str(estimated_rows)
+
+    if query_mode == "reject":
+        return _json_body({
+            "error": "Zone trop étendue pour ces filtres, veuillez zoomer ou restreindre les filtres.",
+            "estimated_rows": estimated_rows,
+        }), 413, headers
+    if query_mode == "cluster":
+        clusters = cost_guard.clusters(bbox, price_param, date_param, snapshot, zone)
+        print(f"Retour de {len(clusters)} cellules agrégées.")
+        return _json_body({"mode": "cluster", "clusters": clusters}), 200, headers
+
+    if snapshot is not None:
+        print(f"Lecture depuis l'instantané {snapshot.version}")
+        rows = snapshot.query_ventes(bbox, price_param, date_param, limit, offset, mode, zone, sort)
+    else:
+        if shard_router.is_sharded:
+            print(f"Shards interrogés: {shard_router.shards_for_bbox(bbox)}")
+        rows = shard_router.fetch_ventes(bbox, price_param, date_param, limit, offset, mode, zone, sort)
+    print(f"Nombre de résultats trouvés: {len(rows)} (limit={limit}, offset={offset})")
+
+    # If we have results, print a sample for debugging
+    if rows:
+        print(f"Premier résultat: {rows[0]}")
+
+    if response_format == "compact":
+        if not rows:
+            print("Aucun bien trouvé avec ces filtres.")
+            return _json_body({"message": "Aucun bien trouvé avec ces filtres."}), 200, headers
+        print(f"Retour de {len(rows)} propriétés (format compact).")
+        return _json_body(compact_payload(VENTE_FIELDS, [_vente_values(r) for r in rows])), 200, headers
+
+    result = []
+    for r in rows:
+        # Check if we have enough columns in the result
+        if len(r) >= 9:
+            property_data = dict(zip(VENTE_FIELDS, _vente_values(r)))
+        else:
+            # Fallback for older query format
+            property_data = {
+                "id_mutation": r[0],
+                "valeur_fonciere": float(r[1]) if r[1] is not None else 0,
+                "date_mutation": str(r[2]) if r[2] is not None else "",
+                "latitude": float(r[3]) if r[3] is not None else 0,
+                "longitude": float(r[4]) if r[4] is not None else 0
+            }
+        result.append(property_data)
+
+    if not result:
+        print("Aucun bien trouvé avec ces filtres.")
+        return _json_body({"message": "Aucun bien trouvé avec ces filtres."}), 200, headers
+
+    print(f"Retour de {len(result)} propriétés.")
+    return _json_body(result), 200, headers
+
+
 @app.route('/api/v1/dvf/ventes', methods=['GET'])
 def get_dvf_ventes():
     """
@@ -39,13 +183,29 @@ def get_dvf_ventes():
       - name: topLeft
         in: query
         type: string
-        required: true
-        description: Coin haut-gauche (lat,long)
+        required: false
+        description: Coin haut-gauche (lat,long ou y,x en Lambert-93), requis sans polygon ni code_commune
       - name: bottomRight
         in: query
         type: string
-        required: true
-        description: Coin bas-droit (lat,long)
+        required: false
+        description: Coin bas-droit (lat,long ou y,x en Lambert-93), requis sans polygon ni code_commune
+      - name: crs
+        in: query
+        type: string
+        required: false
+        enum: [wgs84, lambert93]
+        description: Système de coordonnées de topLeft / bottomRight (wgs84 par défaut)
+      - name: polygon
+        in: query
+        type: string
+        required: false
+        description: Polygone GeoJSON (Polygon, MultiPolygon ou Feature), coordonnées [long, lat]
+      - name: code_commune
+        in: query
+        type: string
+        required: false
+        description: Code INSEE de la commune
       - name: price
         in: query
         type: string
@@ -56,54 +216,83 @@ def get_dvf_ventes():
         type: string
         required: false
         description: Dates de mutation min,max (YYYY-MM-DD)
+      - name: mode
+        in: query
+        type: string
+        required: false
+        enum: [top, sample]
+        description: "top : premières ventes selon sort (défaut) ; sample : échantillon réparti sur la zone,
+          de densité constante quelle que soit la plage de dates (échantillon calculé par année, grille
+          d'autant plus large que la sélection couvre d'années)"
+      - name: sort
+        in: query
+        type: string
+        required: false
+        enum: [price_desc, price_asc, date_desc, date_asc, surface_desc, surface_asc]
+        description: "Tri du mode top (price_desc par défaut) ; les tris par surface écartent les ventes sans surface"
+      - name: format
+        in: query
+        type: string
+        required: false
+        enum: [objects, compact]
+        description: "objects : une liste d'objets (défaut) ; compact : colonnes, lignes en tableaux et dictionnaires des communes, codes postaux et voies"
     responses:
       200:
-        description: Liste des biens vendus filtrés
+        description: "Liste des biens vendus filtrés, ou {mode: cluster, clusters: [...]} si la zone contient
+          trop de ventes (en-têtes X-DVF-Query-Mode et X-DVF-Estimated-Rows)"
+      413:
+        description: Zone trop étendue pour ces filtres
     """
     try:
         top_left_raw = request.args.get('topLeft')
         bottom_right_raw = request.args.get('bottomRight')
-        if not top_left_raw or not bottom_right_raw:
-            return jsonify({"error": "Les paramètres 'topLeft' et 'bottomRight' sont requis."}), 400
-
-        top_left = top_left_raw.replace(" ", "").split(',')
-        bottom_right = bottom_right_raw.replace(" ", "").split(',')
-
-        # Debug: Print the raw coordinates
-        print(f"Raw coordinates: topLeft={top_left}, bottomRight={bottom_right}")
-
-        # Coordinates are in Lambert93 format (y,x) where y is latitude and x is longitude
-        # The frontend sends them as (y,x) but we need to extract them correctly
-        try:
-            # Extract coordinates - assuming format is [y, x] for both points
-            y_max, x_min = float(top_left[0]), float(top_left[1])
-            y_min, x_max = float(bottom_right[0]), float(bottom_right[1])
+        polygon_raw = request.args.get('polygon')
+        code_commune = request.args.get('code_commune')
+        has_rectangle = bool(top_left_raw and bottom_right_raw)
+        if not has_rectangle and not polygon_raw and not code_commune:
+            return jsonify({"error": "Les paramètres 'topLeft' et 'bottomRight' (ou 'polygon', ou 'code_commune') sont requis."}), 400
+        if polygon_raw and code_commune:
+            return jsonify({"error": "Les paramètres 'polygon' et 'code_commune' sont exclusifs."}), 400
+        crs = request.args.get('crs', 'wgs84').lower()
+        if crs not in CRS:
+            return jsonify({"error": f"Système de coordonnées invalide: {crs} (valeurs possibles: {', '.join(CRS)})"}), 400
+        if crs == 'lambert93' and (not has_rectangle or polygon_raw or code_commune):
+            return jsonify({"error": "crs=lambert93 s'applique à 'topLeft' et 'bottomRight' seuls."}), 400
+
+        # Zone exacte (polygone ou commune) ; son emprise sert de préfiltre
+        zone = None
+        if polygon_raw:
+            try:
+                zone = parse_polygon(polygon_raw)
+            except ValueError as e:
+                return jsonify({"error": f"Polygone invalide: {str(e)}"}), 400
+        elif code_commune:
+            zone = commune_zones.get(code_commune.strip())
+            if zone is None:
+                return jsonify({"message": "Aucun bien trouvé avec ces filtres."}), 200
 
-            # For database query, we need latitude (y) and longitude (x)
-            lat_min, lat_max = y_min, y_max
-            lon_min, lon_max = x_min, x_max
+        if has_rectangle:
+            # Debug: Print the raw coordinates
+            print(f"Raw coordinates: topLeft={top_left_raw}, bottomRight={bottom_right_raw}")
 
-            print(f"Parsed coordinates: lat_min={lat_min}, lat_max={lat_max}, lon_min={lon_min}, lon_max={lon_max}")
-        except (ValueError, IndexError) as e:
-            return jsonify({"error": f"Format de coordonnées invalide: {str(e)}"}), 400
+            # Coordinates are sent as (y,x) where y is latitude and x is longitude
+            try:
+                lat_min, lat_max, lon_min, lon_max = parse_bbox(top_left_raw, bottom_right_raw)
+                print(f"Parsed coordinates: lat_min={lat_min}, lat_max={lat_max}, lon_min={lon_min}, lon_max={lon_max}")
+            except (ValueError, IndexError) as e:
+                return jsonify({"error": f"Format de coordonnées invalide: {str(e)}"}), 400
 
         price_param = request.args.get('price')
         date_param = request.args.get('date')
-
-        conn = get_connection()
-        cursor = conn.cursor()
-
-        # First, check if we have any houses in the database with coordinates
-        check_query = "SELECT COUNT(*) FROM dvf WHERE type_local = 'Maison' AND latitude IS NOT NULL AND longitude IS NOT NULL"
-        cursor.execute(check_query)
-        total_houses = cursor.fetchone()[0]
-        print(f"Total houses with coordinates in database: {total_houses}")
-
-        # Check the range of coordinates in the database
-        range_query = "SELECT MIN(latitude), MAX(latitude), MIN(longitude), MAX(longitude) FROM dvf WHERE type_local = 'Maison' AND latitude IS NOT NULL AND longitude IS NOT NULL"
-        cursor.execute(range_query)
-        coord_range = cursor.fetchone()
-        print(f"Coordinate range in database: lat_min={coord_range[0]}, lat_max={coord_range[1]}, lon_min={coord_range[2]}, lon_max={coord_range[3]}")
+        mode = request.args.get('mode', 'top')
+        if mode not in ORDERINGS:
+            return jsonify({"error": f"Mode invalide: {mode} (valeurs possibles: {', '.join(ORDERINGS)})"}), 400
+        sort = request.args.get('sort', DEFAULT_SORT)
+        if sort not in SORTS:
+            return jsonify({"error": f"Tri invalide: {sort} (valeurs possibles: {', '.join(SORTS)})"}), 400
+        response_format = request.args.get('format', 'objects')
+        if response_format not in RESPONSE_FORMATS:
+            return jsonify({"error": f"Format invalide: {response_format} (valeurs possibles: {', '.join(RESPONSE_FORMATS)})"}), 400
 
         # Get pagination parameters
         limit = request.args.get('limit', '200')  # Default to 100 results
@@ -119,137 +308,275 @@ def get_dvf_ventes():
             limit = 100
             offset = 0
 
-        # Try a simplified query first to see if we have any properties in the database
-        test_query = "SELECT COUNT(*) FROM dvf WHERE type_local = 'Maison'"
-        cursor.execute(test_query)
-        total_houses = cursor.fetchone()[0]
-        print(f"Total houses in database: {total_houses}")
-
-        # Modify query to be more flexible with coordinates
-        query = """
-            SELECT id_mutation, valeur_fonciere, date_mutation, latitude, longitude,
-                   adresse_numero, adresse_nom_voie, code_postal, nom_commune,id_parcelle,surface_terrain
-            FROM dvf
-            WHERE type_local = 'Maison'
-              AND latitude IS NOT NULL
-              AND longitude IS NOT NULL
-              AND valeur_fonciere IS NOT NULL
-              AND date_mutation IS NOT NULL
-        """
-        params = []
-
         # For testing purposes, let's be very flexible with coordinates
         # We'll expand the bounding box by 20% to ensure we find some properties
-        if lat_min > -90 and lat_max < 90 and lon_min > -180 and lon_max < 180:
-            # Calculate the center of the bounding box
-            lat_center = (lat_min + lat_max) / 2
-            lon_center = (lon_min + lon_max) / 2
-
-            # Calculate the dimensions of the bounding box
-            lat_range = abs(lat_max - lat_min)
-            lon_range = abs(lon_max - lon_min)
-
-            # Expand the bounding box by 20%
-            expanded_lat_min = lat_center - (lat_range * 0.6)
-            expanded_lat_max = lat_center + (lat_range * 0.6)
-            expanded_lon_min = lon_center - (lon_range * 0.6)
-            expanded_lon_max = lon_center + (lon_range * 0.6)
-
-            print(f"Original bounding box: lat_min={lat_min}, lat_max={lat_max}, lon_min={lon_min}, lon_max={lon_max}")
-            print(f"Expanded bounding box: lat_min={expanded_lat_min}, lat_max={expanded_lat_max}, lon_min={expanded_lon_min}, lon_max={expanded_lon_max}")
-
-            query += """
-              AND latitude BETWEEN %s AND %s
-              AND longitude BETWEEN %s AND %s
-            """
-            params.extend([expanded_lat_min, expanded_lat_max, expanded_lon_min, expanded_lon_max])
+        bbox = None
+        if not has_rectangle:
+            bbox = zone.bbox
+        elif crs == 'lambert93':
+            # (y, x) en mètres : comparés aux colonnes Lambert-93, l'emprise WGS84 sert au préfiltre
+            zone = Lambert93Zone(*expand_bbox(lat_min, lat_max, lon_min, lon_max))
+            bbox = zone.bbox
+            print(f"Zone Lambert-93: {zone.bounds}, emprise WGS84: {bbox}")
+        elif lat_min > -90 and lat_max < 90 and lon_min > -180 and lon_max < 180:
+            bbox = expand_bbox(lat_min, lat_max, lon_min, lon_max)
+            print(f"Expanded bounding box: lat_min={bbox[0]}, lat_max={bbox[1]}, lon_min={bbox[2]}, lon_max={bbox[3]}")
 
         # Don't apply a default price filter to ensure we get some results
         if not price_param:
             print("No price filter applied - showing all prices")
 
-        if price_param and ',' in price_param:
-            price_min, price_max = map(float, price_param.replace(" ", "").split(','))
-            if price_min == price_max:
-                query += " AND valeur_fonciere = %s"
-                params.append(price_min)
-            else:
-                query += " AND valeur_fonciere BETWEEN %s AND %s"
-                params.extend([price_min, price_max])
-
-        if date_param and ',' in date_param:
-            date_min, date_max = date_param.replace(" ", "").split(',')
-            if date_min == date_max:
-                query += " AND date_mutation = %s"
-                params.append(date_min)
-            else:
-                query += " AND date_mutation BETWEEN %s AND %s"
-                params.extend([date_min, date_max])
-
-        # Add ORDER BY, LIMIT and OFFSET to the query
-        query += """
-            ORDER BY valeur_fonciere DESC
-            LIMIT %s OFFSET %s
-        """
-        params.extend([limit, offset])
-
-        print("REQUÊTE:", cursor.mogrify(query, params))  # log SQL pour debug
+        # Les filtres de date portent sur la clé de partition de dvf_maison :
+        # seules les partitions (années) concernées sont lues.
+        query, params = build_ventes_query(bbox, price_param, date_param, limit, offset, mode, zone, sort)
+        print("REQUÊTE:", query, params)  # log SQL pour debug
 
+        # Les requêtes identiques simultanées partagent une seule exécution
+        key = (bbox, parse_price(price_param), parse_dates(date_param), limit, offset, mode, sort, response_format,
+               zone.key if zone is not None else None)
         try:
-            cursor.execute(query, params)
-            rows = cursor.fetchall()
-            print(f"Nombre de résultats trouvés: {len(rows)} (limit={limit}, offset={offset})")
-
-            # If we have results, print a sample for debugging
-            if rows:
-                print(f"Premier résultat: {rows[0]}")
-
-            result = []
-            for r in rows:
-                # Check if we have enough columns in the result
-                if len(r) >= 9:
-                    property_data = {
-                        "id_mutation": r[0],
-                        "valeur_fonciere": float(r[1]) if r[1] is not None else 0,
-                        "date_mutation": str(r[2]) if r[2] is not None else "",
-                        "latitude": float(r[3]) if r[3] is not None else 0,
-                        "longitude": float(r[4]) if r[4] is not None else 0,
-                        "adresse_numero": r[5] if r[5] is not None else "",
-                        "adresse_nom_voie": r[6] if r[6] is not None else "",
-                        "code_postal": r[7] if r[7] is not None else "",
-                        "nom_commune": r[8] if r[8] is not None else "",
-                        "id_parcelle": r[9] or "",
-                        "surface_terrain": float(r[10]) if r[10] is not None else None
-                    }
-                else:
-                    # Fallback for older query format
-                    property_data = {
-                        "id_mutation": r[0],
-                        "valeur_fonciere": float(r[1]) if r[1] is not None else 0,
-                        "date_mutation": str(r[2]) if r[2] is not None else "",
-                        "latitude": float(r[3]) if r[3] is not None else 0,
-                        "longitude": float(r[4]) if r[4] is not None else 0
-                    }
-                result.append(property_data)
-
-            if not result:
-                print("Aucun bien trouvé avec ces filtres.")
-                return jsonify({"message": "Aucun bien trouvé avec ces filtres."}), 200
-
-            print(f"Retour de {len(result)} propriétés.")
-            return jsonify(result)
-
+            with _snapshot_lease() as snapshot:
+                (body, status, headers), shared = ventes_flight.do(
+                    key, lambda: _execute_ventes(snapshot, bbox, price_param, date_param, limit, offset, mode, zone,
+                                                 sort, response_format))
+            if shared:
+                print("Résultat partagé avec une requête identique en cours")
+            return Response(body, status=status, headers=headers, mimetype="application/json")
         except Exception as e:
             print(f"Erreur lors de l'exécution de la requête: {str(e)}")
             return jsonify({"error": "Erreur lors de l'exécution de la requête", "details": str(e)}), 500
-        finally:
-            cursor.close()
-            conn.close()
 
     except Exception as e:
         return jsonify({"error": "Erreur serveur", "debug": str(e)}), 500
 
 
+def _parcel_histories(ids):
+    with _snapshot_lease() as snapshot:
+        histories = parcel_history.get_many(ids, snapshot)
+    return {id_parcelle: [dict(zip(VENTE_FIELDS, _vente_values(r))) for r in rows]
+            for id_parcelle, rows in histories.items()}
+
+
+@app.route('/api/v1/dvf/parcelles/<id_parcelle>/history', methods=['GET'])
+def get_parcelle_history(id_parcelle):
+    """
+    Historique des ventes d'une parcelle
+    ---
+    parameters:
+      - name: id_parcelle
+        in: path
+        type: string
+        required: true
+        description: "Identifiant cadastral de la parcelle (ex: 01001000ZD0025)"
+    responses:
+      200:
+        description: Ventes de la parcelle, par date croissante
+      404:
+        description: Aucune vente connue pour cette parcelle
+    """
+    id_parcelle = id_parcelle.strip().upper()
+    try:
+        ventes = _parcel_histories([id_parcelle])[id_parcelle]
+    except Exception as e:
+        print(f"Erreur lors de la lecture de l'historique: {str(e)}")
+        return jsonify({"error": "Erreur lors de la lecture de l'historique", "details": str(e)}), 500
+
+    if not ventes:
+        return jsonify({"error": f"Aucune vente connue pour la parcelle {id_parcelle}."}), 404
+    response = jsonify({"id_parcelle": id_parcelle, "ventes": ventes})
+    response.headers["Cache-Control"] = "public, max-age=300"
+    return response
+
+
+@app.route('/api/v1/dvf/parcelles/history', methods=['POST'])
+def get_parcelles_history():
+    """
+    Historique des ventes de plusieurs parcelles
+    ---
+    parameters:
+      - name: body
+        in: body
+        required: true
+        schema:
+          type: object
+          properties:
+            ids:
+              type: array
+              items:
+                type: string
+              description: Identifiants des parcelles (500 au plus)
+    responses:
+      200:
+        description: "Ventes de chaque parcelle, par date croissante : {id_parcelle: [ventes]}"
+      400:
+        description: Liste d'identifiants absente ou trop longue
+    """
+    body = request.get_json(silent=True) or {}
+    ids = body.get('ids')
+    if not isinstance(ids, list) or not ids or not all(isinstance(i, str) for i in ids):
+        return jsonify({"error": "Le corps doit contenir 'ids', une liste d'identifiants de parcelles."}), 400
+    if len(ids) > MAX_BATCH:
+        return jsonify({"error": f"Au plus {MAX_BATCH} parcelles par requête."}), 400
+
+    ids = list(dict.fromkeys(i.strip().upper() for i in ids))
+    try:
+        return jsonify(_parcel_histories(ids))
+    except Exception as e:
+        print(f"Erreur lors de la lecture de l'historique: {str(e)}")
+        return jsonify({"error": "Erreur lors de la lecture de l'historique", "details": str(e)}), 500
+
+
+@app.route('/api/v1/dvf/stats', methods=['GET'])
+def get_dvf_stats():
+    """
+    Compteurs de fonctionnement de l'API (ce processus)
+    ---
+    responses:
+      200:
+        description: "Requêtes ventes exécutées et regroupées (coalesced : requêtes servies par une exécution identique en cours), dernier rechargement des données"
+    """
+    return jsonify({"ventes": ventes_flight.stats(), "reload": data_reloader.status()})
+
+
+@app.route('/api/v1/dvf/admin/reload', methods=['GET', 'POST'])
+def admin_reload():
+    """
+    Rechargement à chaud des données (instantané, index de recherche, caches)
+    ---
+    parameters:
+      - name: Authorization
+        in: header
+        type: string
+        required: true
+        description: "Bearer <DVF_ADMIN_TOKEN>"
+    responses:
+      200:
+        description: État du dernier rechargement (GET)
+      202:
+        description: Rechargement lancé en arrière-plan (POST)
+      403:
+        description: Jeton absent ou invalide
+      409:
+        description: Un rechargement est déjà en cours
+    """
+    token = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+    if not ADMIN_TOKEN or not hmac.compare_digest(token, ADMIN_TOKEN):
+        return jsonify({"error": "Accès refusé."}), 403
+
+    if request.method == 'GET':
+        return jsonify(data_reloader.status())
+    if not data_reloader.reload():
+        return jsonify({"error": "Un rechargement est déjà en cours.", **data_reloader.status()}), 409
+    return jsonify({"message": "Rechargement lancé.", **data_reloader.status()}), 202
+
+
+@app.route('/api/v1/dvf/ventes/export', methods=['GET'])
+def export_dvf_ventes():
+    """
+    Export de toutes les ventes DVF (maisons) d'une zone, en CSV ou Parquet
+    ---
+    parameters:
+      - name: topLeft
+        in: query
+        type: string
+        required: true
+        description: Coin haut-gauche (lat,long)
+      - name: bottomRight
+        in: query
+        type: string
+        required: true
+        description: Coin bas-droit (lat,long)
+      - name: price
+        in: query
+        type: string
+        required: false
+        description: Valeur foncière min,max
+      - name: date
+        in: query
+        type: string
+        required: false
+        description: Dates de mutation min,max (YYYY-MM-DD)
+      - name: format
+        in: query
+        type: string
+        required: false
+        enum: [csv, parquet]
+        description: Format du fichier (csv par défaut)
+    responses:
+      200:
+        description: Fichier envoyé en flux, sans limite de lignes
+      400:
+        description: Paramètres invalides
+    """
+    top_left_raw = request.args.get('topLeft')
+    bottom_right_raw = request.args.get('bottomRight')
+    if not top_left_raw or not bottom_right_raw:
+        return jsonify({"error": "Les paramètres 'topLeft' et 'bottomRight' sont requis."}), 400
+
+    try:
+        bbox = parse_bbox(top_left_raw, bottom_right_raw)
+    except (ValueError, IndexError) as e:
+        return jsonify({"error": f"Format de coordonnées invalide: {str(e)}"}), 400
+
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"error": f"Format invalide: {export_format} (valeurs possibles: {', '.join(EXPORT_FORMATS)})"}), 400
+
+    try:
+        query, params = build_export_query(bbox, request.args.get('price'), request.args.get('date'))
+    except ValueError as e:
+        return jsonify({"error": f"Filtre invalide: {str(e)}"}), 400
+
+    batches = iter_batches(shard_router, shard_router.shards_for_bbox(bbox), query, params)
+    stream = stream_parquet(batches) if export_format == 'parquet' else stream_csv(batches)
+    mimetype, extension = EXPORT_FORMATS[export_format]
+
+    print(f"Export {export_format} demandé: {query} {params}")
+    return Response(
+        stream_with_context(stream),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename={export_filename(extension)}"}
+    )
+
+
+@app.route('/api/v1/dvf/search', methods=['GET'])
+def search_dvf():
+    """
+    Recherche de communes, codes postaux et adresses par préfixe
+    ---
+    parameters:
+      - name: q
+        in: query
+        type: string
+        required: true
+        description: "Début d'un nom de commune, d'un code postal ou d'une adresse (ex: Saint-Genis, 184 ALL DES HETRES)"
+      - name: limit
+        in: query
+        type: integer
+        required: false
+        description: Nombre maximal de résultats (10 par défaut, 50 au plus)
+    responses:
+      200:
+        description: Communes et voies correspondantes, avec leurs coordonnées
+      400:
+        description: Requête trop courte
+    """
+    q = request.args.get('q', '')
+    if len(normalize(q)) < 2:
+        return jsonify({"error": "Le paramètre 'q' doit contenir au moins 2 caractères."}), 400
+
+    try:
+        limit = min(int(request.args.get('limit', '10')), 50)
+    except ValueError:
+        limit = 10
+
+    try:
+        return jsonify(search_index.search(q, limit))
+    except Exception as e:
+        print(f"Erreur lors de la recherche: {str(e)}")
+        return jsonify({"error": "Erreur lors de la recherche", "details": str(e)}), 500
+
+
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5000, debug=True)
 
@@ -0,0 +1,38 @@
+"""
+Format compact des réponses ventes (paramètre format=compact de /api/v1/dvf/ventes).
+
+Dans une zone dense, les mêmes communes, codes postaux et voies se répètent sur
+des centaines de lignes. Le format compact envoie les noms de colonnes une fois,
+chaque ligne sous forme de tableau, et remplace ces colonnes par un code entier
+renvoyant au dictionnaire de la réponse :
+
+    {
+        "format": "compact",
+        "columns": ["id_mutation", "valeur_fonciere", ...],
+        "dictionaries": {"nom_commune": ["BOURG EN BRESSE", ...], ...},
+        "rows": [["2024-123", 250000.0, ..., 0, ...], ...]
+    }
+"""
+
+DICTIONARY_COLUMNS = ["adresse_nom_voie", "code_postal", "nom_commune"]
+
+RESPONSE_FORMATS = ("objects", "compact")
+
+
+def compact_payload(columns, rows):
+    """Lignes (valeurs dans l'ordre de columns) -> réponse compacte avec ses dictionnaires."""
+    positions = [columns.index(column) for column in DICTIONARY_COLUMNS]
+    dictionaries = {column: {} for column in DICTIONARY_COLUMNS}
+    encoded = []
+    for values in rows:
+        values = list(values)
+        for column, position in zip(DICTIONARY_COLUMNS, positions):
+            codes = dictionaries[column]
+            values[position] = codes.setdefault(values[position], len(codes))
+        encoded.append(values)
+    return {
+        "format": "compact",
+        "columns": columns,
+        "dictionaries": {column: list(codes) for column, codes in dictionaries.items()},
+        "rows": encoded,
+    }
@@ -0,0 +1,107 @@
+"""
+Garde-fou sur le coût des requêtes ventes.
+
+Avant d'exécuter une requête "top", on estime le nombre de ventes concernées :
+- exactement, par l'instantané mmap s'il est en service (filtrage vectorisé) ;
+- sinon par l'estimation du planificateur PostgreSQL (EXPLAIN, sans exécution),
+  sommée sur les shards concernés.
+
+Selon les seuils (variables d'environnement) la requête est :
+- "detail" : exécutée normalement ;
+- "cluster" : remplacée par une agrégation sur une grille de CLUSTER_GRID cellules
+  de côté (nombre de ventes, position et prix moyens par cellule) ;
+- "reject" : refusée.
+Le choix et l'estimation sont renvoyés dans les en-têtes X-DVF-Query-Mode et
+X-DVF-Estimated-Rows.
+"""
+import os
+
+import numpy as np
+
+from ventes_query import VENTES_TABLE, build_filters
+
+DETAIL_MAX_ROWS = int(os.getenv("DVF_DETAIL_MAX_ROWS", 50_000))
+CLUSTER_MAX_ROWS = int(os.getenv("DVF_CLUSTER_MAX_ROWS", 2_000_000))
+CLUSTER_GRID = 32
+# Emprise de la France métropolitaine (lat_min, lat_max, lon_min, lon_max)
+DEFAULT_EXTENT = (41.0, 51.5, -5.5, 10.0)
+
+MODE_HEADER = "X-DVF-Query-Mode"
+ESTIMATE_HEADER = "X-DVF-Estimated-Rows"
+
+
+def cluster_cell_size(bbox):
+    """Côté d'une cellule ; sans zone (rectangle hors des bornes WGS84), grille sur DEFAULT_EXTENT."""
+    lat_min, lat_max, lon_min, lon_max = bbox if bbox is not None else DEFAULT_EXTENT
+    return max(lat_max - lat_min, lon_max - lon_min, 1e-6) / CLUSTER_GRID
+
+
+class CostGuard:
+    """Estime le coût d'une requête ventes et choisit la forme de la réponse."""
+
+    def __init__(self, router, detail_max_rows=DETAIL_MAX_ROWS, cluster_max_rows=CLUSTER_MAX_ROWS):
+        self.router = router
+        self.detail_max_rows = detail_max_rows
+        self.cluster_max_rows = cluster_max_rows
+
+    def estimate(self, bbox, price_param, date_param, snapshot=None, zone=None):
+        if snapshot is not None:
+            return len(snapshot.select(bbox, price_param, date_param, zone))
+
+        where, params = build_filters(bbox, price_param, date_param, zone)
+        query = f"EXPLAIN (FORMAT JSON) SELECT 1 FROM {VENTES_TABLE} WHERE {where}"
+        rows = self.router.fetch_all(query, params, self.router.shards_for_bbox(bbox))
+        return sum(int(r[0][0]["Plan"]["Plan Rows"]) for r in rows)
+
+    def decide(self, estimated_rows):
+        if estimated_rows <= self.detail_max_rows:
+            return "detail"
+        if estimated_rows <= self.cluster_max_rows:
+            return "cluster"
+        return "reject"
+
+    def clusters(self, bbox, price_param, date_param, snapshot=None, zone=None):
+        """Agrégation des ventes de la zone par cellule de grille."""
+        cell = cluster_cell_size(bbox)
+        if snapshot is not None:
+            return self._snapshot_clusters(snapshot, bbox, price_param, date_param, zone, cell)
+
+        where, params = build_filters(bbox, price_param, date_param, zone)
+        query = f"""
+            SELECT floor(latitude / %s) AS cy, floor(longitude / %s) AS cx,
+                   COUNT(*), SUM(latitude), SUM(longitude), SUM(valeur_fonciere)
+            FROM {VENTES_TABLE}
+            WHERE {where}
+            GROUP BY cy, cx
+        """
+        cells = {}
+        for cy, cx, count, sum_lat, sum_lon, sum_valeur in self.router.fetch_all(
+                query, [cell, cell] + params, self.router.shards_for_bbox(bbox)):
+            # Une cellule peut venir de plusieurs shards : on cumule avant de moyenner
+            totals = cells.setdefault((cy, cx), [0, 0.0, 0.0, 0.0])
+            totals[0] += count
+            totals[1] += float(sum_lat)
+            totals[2] += float(sum_lon)
+            totals[3] += float(sum_valeur)
+        return [self._cluster(*totals) for totals in cells.values()]
+
+    def _snapshot_clusters(self, snapshot, bbox, price_param, date_param, zone, cell):
+        selected = snapshot.select(bbox, price_param, date_param, zone)
+        latitude = snapshot.arrays["latitude"][selected]
+        longitude = snapshot.arrays["longitude"][selected]
+        valeur = snapshot.arrays["valeur_fonciere"][selected]
+
+        keys = np.stack([np.floor(latitude / cell), np.floor(longitude / cell)], axis=1)
+        _, inverse, counts = np.unique(keys, axis=0, return_inverse=True, return_counts=True)
+        inverse = inverse.ravel()
+        sums = [np.bincount(inverse, weights=values) for values in (latitude, longitude, valeur)]
+        return [self._cluster(int(c), lat, lon, val) for c, lat, lon, val in zip(counts, *sums)]
+
+    @staticmethod
+    def _cluster(count, sum_lat, sum_lon, sum_valeur):
+        return {
+            "latitude": float(sum_lat / count),
+            "longitude": float(sum_lon / count),
+            "nb_ventes": int(count),
+            "valeur_fonciere_moyenne": float(sum_valeur / count),
+        }
@@ -0,0 +1,163 @@
+"""
+Rechargement à chaud des données servies par l'API après un import.
+
+La version des données est le dernier identifiant de la table dvf_import de chaque
+shard (ShardRouter.import_version). Elle est vérifiée au plus toutes les
+check_interval secondes ; quand elle change (ou sur demande, via
+POST /api/v1/dvf/admin/reload), une nouvelle génération est construite dans un
+thread, pendant que les requêtes continuent d'être servies par l'ancienne :
+
+- l'instantané mmap (si DVF_SNAPSHOT_DIR est défini) est reconstruit une seule fois
+  pour tous les workers, puis mis en service ; l'ancien est fermé quand les
+  requêtes qui l'utilisent sont terminées (voir snapshot.py) ;
+- l'index de recherche est reconstruit puis remplacé d'un bloc ;
+- les caches (emprises des départements et des communes, historiques des parcelles)
+  sont vidés.
+
+La durée du rechargement et la mémoire résidente du processus (avant, pic pendant
+le rechargement, après) sont conservées dans status(), exposé par
+/api/v1/dvf/admin/reload et /api/v1/dvf/stats. ru_maxrss ne convient pas : c'est
+le pic de toute la vie du processus, que les rechargements suivants ne font plus
+bouger.
+"""
+import datetime
+import os
+import threading
+import time
+
+from snapshot import build_snapshot_if_stale
+
+# Intervalle (secondes) d'échantillonnage de la mémoire pendant un rechargement
+RSS_SAMPLE_INTERVAL = 0.1
+
+
+def _rss_mb():
+    """Mémoire résidente actuelle du processus (Mo), None hors Linux."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+class _RssSampler:
+    """Relève le maximum de la mémoire résidente dans un thread, jusqu'à stop()."""
+
+    def __init__(self, interval=None):
+        self.interval = interval or RSS_SAMPLE_INTERVAL
+        self.peak = _rss_mb()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self._sample()
+
+    def _sample(self):
+        rss = _rss_mb()
+        if rss is not None and (self.peak is None or rss > self.peak):
+            self.peak = rss
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+        self._sample()
+        return self.peak
+
+
+def _round(mb):
+    return round(mb, 1) if mb is not None else None
+
+
+class DataReloader:
+    """Détecte les nouveaux imports et remplace les données en mémoire sans interruption."""
+
+    def __init__(self, router, snapshot_store, search_index, caches=(), check_interval=60):
+        self.router = router
+        self.snapshot_store = snapshot_store
+        self.search_index = search_index
+        # Objets dont la méthode clear() oublie les données de la version précédente
+        self.caches = caches
+        self.check_interval = check_interval
+        self._version = None
+        self._last_check = 0.0
+        self._running = False
+        self._lock = threading.Lock()
+        self._status = {"state": "idle", "reloads": 0}
+
+    def check(self):
+        """Lance un rechargement en arrière-plan si la version des données a changé."""
+        now = time.time()
+        with self._lock:
+            if self._running or now - self._last_check < self.check_interval:
+                return
+            self._last_check = now
+            self._running = True
+        threading.Thread(target=self._run, args=(False,), daemon=True).start()
+
+    def reload(self):
+        """Lance un rechargement complet. Retourne False si un rechargement est déjà en cours."""
+        with self._lock:
+            if self._running:
+                return False
+            self._last_check = time.time()
+            self._running = True
+        threading.Thread(target=self._run, args=(True,), daemon=True).start()
+        return True
+
+    def status(self):
+        with self._lock:
+            return dict(self._status, version=self._version)
+
+    def _run(self, forced):
+        try:
+            version = self.router.import_version()
+            if forced or version != self._version:
+                self._reload(version, forced)
+        except Exception as e:
+            print(f"Erreur lors du rechargement des données: {str(e)}")
+            with self._lock:
+                self._status.update(state="failed", error=str(e))
+        finally:
+            with self._lock:
+                self._running = False
+
+    def _reload(self, version, forced):
+        started = time.perf_counter()
+        rss_before = _rss_mb()
+        sampler = _RssSampler()
+        with self._lock:
+            self._status.update(state="running", started_at=datetime.datetime.now().isoformat(), error=None)
+        print(f"Rechargement des données (version {version})")
+
+        snapshot = None
+        try:
+            if self.snapshot_store is not None:
+                # Construit par un seul worker ; les autres trouvent l'instantané à jour
+                build_snapshot_if_stale(self.router, self.snapshot_store.directory)
+                snapshot = self.snapshot_store.refresh()
+            self.search_index.build()
+            for cache in self.caches:
+                cache.clear()
+        finally:
+            rss_peak = sampler.stop()
+
+        duration = time.perf_counter() - started
+        rss_after = _rss_mb()
+        with self._lock:
+            self._version = version
+            self._status.update(
+                state="idle",
+                reloads=self._status["reloads"] + 1,
+                forced=forced,
+                finished_at=datetime.datetime.now().isoformat(),
+                duration_s=round(duration, 2),
+                rss_before_mb=_round(rss_before),
+                rss_peak_mb=_round(rss_peak),
+                rss_after_mb=_round(rss_after),
+                snapshot=snapshot.version if snapshot is not None else None,
+            )
+        print(f"Données rechargées en {duration:.1f}s (mémoire résidente {_round(rss_before)} Mo, "
+              f"pic {_round(rss_peak)} Mo, après {_round(rss_after)} Mo)")
@@ -1,7 +1,10 @@
 import psycopg2
 import os
 
-def get_connection():
+def get_connection(config=None):
+    """Connexion à la base principale, ou à celle décrite par `config` (ex: un shard)."""
+    if config:
+        return psycopg2.connect(**config)
     return psycopg2.connect(
         host=os.getenv('DB_HOST', 'localhost'),
         port=int(os.getenv('DB_PORT', 5432)),
@@ -0,0 +1,137 @@
+"""
+Export en flux (CSV ou Parquet) d'une sélection de ventes, sans limite de lignes.
+
+Les lignes sont lues par un curseur nommé (côté serveur) par lots de EXPORT_BATCH_SIZE :
+seul le lot courant est en mémoire, et chaque lot est encodé et envoyé au client
+avant de lire le suivant. Le premier octet part dès le premier lot lu.
+"""
+import csv
+import datetime
+import io
+
+from ventes_query import VENTES_TABLE, build_filters
+
+EXPORT_BATCH_SIZE = 50_000
+
+EXPORT_COLUMNS = [
+    "id_mutation", "date_mutation", "valeur_fonciere", "adresse_numero", "adresse_nom_voie",
+    "code_postal", "code_commune", "nom_commune", "code_departement", "id_parcelle",
+    "surface_reelle_bati", "surface_terrain", "latitude", "longitude",
+]
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+
+def build_export_query(bbox, price_param, date_param):
+    where, params = build_filters(bbox, price_param, date_param)
+    query = f"""
+        SELECT {', '.join(EXPORT_COLUMNS)}
+        FROM {VENTES_TABLE}
+        WHERE {where}
+    """
+    return query, params
+
+
+def iter_batches(router, shard_names, query, params):
+    """Lots de lignes de chaque shard, lus par un curseur nommé."""
+    for shard_name in shard_names:
+        conn = router.connect(shard_name)
+        try:
+            with conn.cursor(name="dvf_export") as cursor:
+                cursor.itersize = EXPORT_BATCH_SIZE
+                cursor.execute(query, params)
+                while True:
+                    rows = cursor.fetchmany(EXPORT_BATCH_SIZE)
+                    if not rows:
+                        break
+                    yield rows
+        finally:
+            conn.close()
+
+
+def stream_csv(batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    yield buffer.getvalue().encode("utf-8")
+
+    for rows in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue().encode("utf-8")
+
+
+class _ChunkSink:
+    """Fichier en écriture seule dont on récupère les octets écrits au fur et à mesure."""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def stream_parquet(batches):
+    """Un row group Parquet par lot, envoyé dès qu'il est écrit."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("id_mutation", pa.string()),
+        ("date_mutation", pa.date32()),
+        ("valeur_fonciere", pa.float64()),
+        ("adresse_numero", pa.string()),
+        ("adresse_nom_voie", pa.string()),
+        ("code_postal", pa.string()),
+        ("code_commune", pa.string()),
+        ("nom_commune", pa.string()),
+        ("code_departement", pa.string()),
+        ("id_parcelle", pa.string()),
+        ("surface_reelle_bati", pa.float64()),
+        ("surface_terrain", pa.float64()),
+        ("latitude", pa.float64()),
+        ("longitude", pa.float64()),
+    ])
+    float_columns = {name for name in schema.names if schema.field(name).type == pa.float64()}
+
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        for rows in batches:
+            columns = list(zip(*rows))
+            arrays = [
+                pa.array([float(v) if v is not None else None for v in values], pa.float64())
+                if name in float_columns else pa.array(values, schema.field(name).type)
+                for name, values in zip(schema.names, columns)
+            ]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def export_filename(extension):
+    return f"dvf_ventes_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.{extension}"
@@ -0,0 +1,34 @@
+"""
+Clé de Hilbert vectorisée des coordonnées WGS84.
+
+Le globe est découpé en une grille de 2^ORDER x 2^ORDER cellules (longitude x
+latitude) parcourue par la courbe de Hilbert : deux ventes proches ont en général
+des clés proches. import_dvf.py écrit les partitions dans l'ordre de cette clé,
+de sorte qu'une emprise ne lit que quelques pages contiguës de la table.
+"""
+import numpy as np
+
+# 24 bits par axe : cellules d'environ 2 m, clé sur 48 bits (BIGINT)
+ORDER = 24
+
+
+def hilbert_key(latitude, longitude, order=ORDER):
+    """(latitude, longitude) en degrés -> position sur la courbe de Hilbert (int64)."""
+    side = 1 << order
+    x = np.clip(((np.asarray(longitude, dtype=float) + 180) / 360 * side).astype(np.int64), 0, side - 1)
+    y = np.clip(((np.asarray(latitude, dtype=float) + 90) / 180 * side).astype(np.int64), 0, side - 1)
+
+    key = np.zeros(x.shape, dtype=np.int64)
+    s = side >> 1
+    while s > 0:
+        rx = (x & s) > 0
+        ry = (y & s) > 0
+        key += s * s * ((3 * rx.astype(np.int64)) ^ ry)
+        # Rotation du quadrant pour que la courbe reste continue
+        flip = ~ry & rx
+        x = np.where(flip, side - 1 - x, x)
+        y = np.where(flip, side - 1 - y, y)
+        swap = ~ry
+        x, y = np.where(swap, y, x), np.where(swap, x, y)
+        s >>= 1
+    return key
@@ -0,0 +1,253 @@
+"""
+Import d'une année DVF (fichier geo-dvf CSV) dans la table partitionnée dvf_maison.
+
+Les maisons géolocalisées du fichier sont chargées par COPY dans une table autonome,
+hors de la table interrogée par l'API. Une contrainte CHECK sur date_mutation y est
+posée avant le rattachement : ATTACH PARTITION n'a alors pas besoin de parcourir la
+table pour valider les bornes, et les index locaux sont créés sur la nouvelle
+partition uniquement.
+
+Avec plusieurs bases (DVF_SHARDS_FILE, voir shard_router.py), --shard charge dans
+le shard indiqué les seules lignes de ses départements, y compris ceux absents de
+la configuration s'il en est le shard "default". Sans shard "default", un
+département absent de la configuration fait échouer l'import plutôt que d'être
+ignoré.
+
+Les coordonnées Lambert-93 (x_lambert93, y_lambert93) et la clé de Hilbert
+(cle_hilbert, voir hilbert.py) sont calculées par bloc lors de la lecture du CSV.
+Les lignes sont ensuite copiées dans une table brute, puis réinsérées dans la table
+à rattacher avec les colonnes calculées sur l'ensemble de l'année (échantillonnage
+par grille, voir rebuild_query), triées par clé de Hilbert : les ventes proches
+sont stockées dans les mêmes pages. --refresh recharge ainsi une année existante.
+
+Usage :
+    python import_dvf.py 2024 chemin/vers/full.csv.gz [--replace] [--shard nom]
+    python import_dvf.py 2024 --refresh [--shard nom]
+"""
+import argparse
+import datetime
+import io
+import os
+import tempfile
+
+import pandas as pd
+
+from db_config import get_connection
+from hilbert import hilbert_key
+from lambert93 import to_lambert93
+from shard_router import ShardRouter
+from ventes_query import SAMPLE_BASE_CELL, SAMPLE_LEVELS, SAMPLE_PER_CELL
+
+PARENT_TABLE = "dvf_maison"
+CHUNK_SIZE = 200_000
+
+MAISON_COLUMNS = [
+    "id_mutation", "date_mutation", "valeur_fonciere", "adresse_numero", "adresse_nom_voie",
+    "code_postal", "code_commune", "nom_commune", "code_departement", "id_parcelle",
+    "surface_reelle_bati", "surface_terrain", "latitude", "longitude",
+]
+REQUIRED_COLUMNS = ["id_mutation", "date_mutation", "valeur_fonciere", "latitude", "longitude"]
+NUMERIC_COLUMNS = ["valeur_fonciere", "surface_reelle_bati", "surface_terrain", "latitude", "longitude"]
+# Colonnes calculées à la lecture, ligne par ligne
+COMPUTED_COLUMNS = ["x_lambert93", "y_lambert93", "cle_hilbert"]
+LOAD_COLUMNS = MAISON_COLUMNS + COMPUTED_COLUMNS
+
+
+def partition_name(annee: int) -> str:
+    return f"{PARENT_TABLE}_{annee}"
+
+
+def partition_bounds(annee: int) -> tuple[str, str]:
+    return datetime.date(annee, 1, 1).isoformat(), datetime.date(annee + 1, 1, 1).isoformat()
+
+
+def read_maisons(csv_path: str, annee: int, shard_filter=None):
+    """
+    Lit le CSV par blocs et ne garde que les maisons géolocalisées de l'année
+    (et celles que shard_filter attribue au shard chargé).
+    """
+    date_min, date_max = partition_bounds(annee)
+    for chunk in pd.read_csv(csv_path, usecols=MAISON_COLUMNS + ["type_local"], dtype=str, chunksize=CHUNK_SIZE):
+        chunk = chunk[chunk["type_local"] == "Maison"].copy()
+        for column in NUMERIC_COLUMNS:
+            chunk[column] = pd.to_numeric(chunk[column], errors="coerce")
+        chunk = chunk.dropna(subset=REQUIRED_COLUMNS)
+        chunk = chunk[(chunk["date_mutation"] >= date_min) & (chunk["date_mutation"] < date_max)]
+        if shard_filter is not None:
+            chunk = chunk[shard_filter(chunk["code_departement"])]
+        latitude, longitude = chunk["latitude"].to_numpy(), chunk["longitude"].to_numpy()
+        chunk["x_lambert93"], chunk["y_lambert93"] = to_lambert93(latitude, longitude)
+        chunk["cle_hilbert"] = hilbert_key(latitude, longitude)
+        yield chunk[LOAD_COLUMNS]
+
+
+def copy_chunk(cursor, table: str, chunk: pd.DataFrame):
+    """Envoie un bloc à PostgreSQL via COPY (les valeurs vides deviennent NULL)."""
+    buffer = io.StringIO()
+    chunk.to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+    cursor.copy_expert(
+        f"COPY {table} ({', '.join(LOAD_COLUMNS)}) FROM STDIN WITH (FORMAT csv, NULL '')",
+        buffer
+    )
+
+
+def shard_mask(router: ShardRouter, shard: str, codes: pd.Series) -> pd.Series:
+    """Lignes dont le département revient au shard ; lève RuntimeError pour un département sans shard."""
+    owners = codes.map(router.shard_for_departement)
+    unmapped = sorted(codes[owners.isna()].fillna("(vide)").unique())
+    if unmapped:
+        raise RuntimeError(f"Départements sans shard dans la configuration : {', '.join(unmapped)} "
+                           f"(les attribuer à un shard ou définir \"default\").")
+    return owners == shard
+
+
+def connect(shard: str = None):
+    """Connexion à la base principale ou au shard indiqué, avec le filtre de ses lignes (None : toutes)."""
+    if shard is None:
+        return get_connection(), None
+    router = ShardRouter.from_env()
+    if shard not in router.shards:
+        raise RuntimeError(f"Shard inconnu : {shard}")
+    return router.connect(shard), lambda codes: shard_mask(router, shard, codes)
+
+
+def rebuild_query(source_table: str, load_table: str) -> str:
+    """
+    Copie source_table dans load_table en calculant les colonnes d'échantillonnage :
+    - rang_aleatoire : rang aléatoire fixé à l'import
+    - niveau_echantillon : premier niveau de grille où la vente fait partie des
+      SAMPLE_PER_CELL premières de sa cellule (par rang_aleatoire). Une cellule du
+      niveau z+1 étant incluse dans une cellule du niveau z, les ventes de niveau <= z
+      sont exactement l'échantillon de la grille z.
+    Les lignes sont insérées par cle_hilbert croissante : load_table étant neuve,
+    son ordre physique suit la courbe de Hilbert (l'équivalent d'un CLUSTER, qui
+    n'est pas possible sur la table partitionnée).
+    """
+    columns = ", ".join(LOAD_COLUMNS)
+    return f"""
+        INSERT INTO {load_table} ({columns}, rang_aleatoire, niveau_echantillon)
+        WITH base AS (
+            SELECT {columns}, random() AS rang_aleatoire, row_number() OVER () AS rid
+            FROM {source_table}
+        ), niveaux AS (
+            SELECT rid, MIN(z) AS niveau
+            FROM (
+                SELECT b.rid, g.z, row_number() OVER (
+                    PARTITION BY g.z,
+                                 floor(b.latitude * 2 ^ g.z / {SAMPLE_BASE_CELL}),
+                                 floor(b.longitude * 2 ^ g.z / {SAMPLE_BASE_CELL})
+                    ORDER BY b.rang_aleatoire
+                ) AS rn
+                FROM base b CROSS JOIN generate_series(0, {SAMPLE_LEVELS}) AS g(z)
+            ) cellules
+            WHERE rn <= {SAMPLE_PER_CELL}
+            GROUP BY rid
+        )
+        SELECT {columns}, b.rang_aleatoire, COALESCE(n.niveau, {SAMPLE_LEVELS + 1})
+        FROM base b LEFT JOIN niveaux n USING (rid)
+        ORDER BY b.cle_hilbert
+    """
+
+
+def import_annee(annee: int, csv_path: str, replace: bool = False, shard: str = None) -> int:
+    """Charge une année puis la rattache à dvf_maison. Retourne le nombre de lignes importées."""
+    partition = partition_name(annee)
+    raw_table = f"{partition}_raw"
+    load_table = f"{partition}_load"
+    date_min, date_max = partition_bounds(annee)
+
+    conn, shard_filter = connect(shard)
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT to_regclass(%s)", (partition,))
+        if cursor.fetchone()[0] is not None and not replace:
+            raise RuntimeError(f"La partition {partition} existe déjà (utiliser --replace pour la remplacer).")
+
+        cursor.execute(f"DROP TABLE IF EXISTS {raw_table}, {load_table}")
+        cursor.execute(f"CREATE UNLOGGED TABLE {raw_table} (LIKE {PARENT_TABLE})")
+        cursor.execute(f"CREATE TABLE {load_table} (LIKE {PARENT_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+
+        row_count = 0
+        for chunk in read_maisons(csv_path, annee, shard_filter):
+            copy_chunk(cursor, raw_table, chunk)
+            row_count += len(chunk)
+            print(f"{row_count} maisons chargées dans {raw_table}")
+
+        cursor.execute(rebuild_query(raw_table, load_table))
+        cursor.execute(f"DROP TABLE {raw_table}")
+
+        cursor.execute(
+            f"ALTER TABLE {load_table} ADD CONSTRAINT {load_table}_bounds "
+            f"CHECK (date_mutation >= %s::date AND date_mutation < %s::date)",
+            (date_min, date_max)
+        )
+        cursor.execute(f"ANALYZE {load_table}")
+
+        if replace:
+            cursor.execute(f"ALTER TABLE IF EXISTS {partition} RENAME TO {partition}_old")
+            cursor.execute("SELECT to_regclass(%s)", (f"{partition}_old",))
+            if cursor.fetchone()[0] is not None:
+                cursor.execute(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {partition}_old")
+                cursor.execute(f"DROP TABLE {partition}_old")
+
+        cursor.execute(f"ALTER TABLE {load_table} RENAME TO {partition}")
+        cursor.execute(
+            f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {partition} FOR VALUES FROM (%s) TO (%s)",
+            (date_min, date_max)
+        )
+        # La contrainte n'est plus utile une fois la partition rattachée
+        cursor.execute(f"ALTER TABLE {partition} DROP CONSTRAINT {load_table}_bounds")
+        # Signale le nouvel import à l'API (reconstruction de ses données en mémoire)
+        cursor.execute("INSERT INTO dvf_import (annee, nb_lignes) VALUES (%s, %s)", (annee, row_count))
+        conn.commit()
+
+        print(f"Partition {partition} rattachée ({row_count} maisons).")
+        return row_count
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def refresh_annee(annee: int, shard: str = None) -> int:
+    """
+    Recharge une partition existante à partir de son propre contenu, pour calculer
+    les colonnes dérivées ajoutées par une migration.
+    """
+    partition = partition_name(annee)
+    conn, _ = connect(shard)
+    try:
+        with tempfile.NamedTemporaryFile("w+", suffix=".csv", encoding="utf-8", delete=False) as dump:
+            with conn.cursor() as cursor:
+                cursor.copy_expert(
+                    f"COPY (SELECT 'Maison' AS type_local, {', '.join(MAISON_COLUMNS)} FROM {partition}) "
+                    f"TO STDOUT WITH (FORMAT csv, HEADER)",
+                    dump
+                )
+    finally:
+        conn.close()
+
+    try:
+        return import_annee(annee, dump.name, replace=True, shard=shard)
+    finally:
+        os.remove(dump.name)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import d'une année DVF dans dvf_maison")
+    parser.add_argument("annee", type=int, help="Année des mutations (ex: 2024)")
+    parser.add_argument("csv_path", nargs="?", help="Fichier geo-dvf (CSV, éventuellement compressé)")
+    parser.add_argument("--replace", action="store_true", help="Remplace la partition si elle existe déjà")
+    parser.add_argument("--refresh", action="store_true", help="Recalcule les colonnes dérivées d'une partition existante")
+    parser.add_argument("--shard", help="Shard cible (DVF_SHARDS_FILE), limité à ses départements")
+    args = parser.parse_args()
+
+    if args.refresh:
+        refresh_annee(args.annee, shard=args.shard)
+    elif args.csv_path:
+        import_annee(args.annee, args.csv_path, replace=args.replace, shard=args.shard)
+    else:
+        parser.error("csv_path est requis (sauf avec --refresh)")
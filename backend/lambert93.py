@@ -0,0 +1,53 @@
+"""
+Projection Lambert-93 (EPSG:2154) vectorisée.
+
+Conique conforme de Lambert à deux parallèles automécoïques (44° et 49° N) sur
+l'ellipsoïde GRS80, méridien central 3° E, origine 46°30' N, faux est 700 000 m,
+faux nord 6 600 000 m. Formules de Snyder (Map Projections, USGS 1987, §15) ;
+précision sub-millimétrique pour la métropole, sans dépendance à pyproj.
+"""
+import numpy as np
+
+A = 6378137.0                      # demi-grand axe GRS80
+E = 0.0818191910428158             # première excentricité GRS80
+LON_0 = np.radians(3.0)
+LAT_0 = np.radians(46.5)
+LAT_1 = np.radians(49.0)
+LAT_2 = np.radians(44.0)
+X_0 = 700000.0
+Y_0 = 6600000.0
+
+
+def _m(lat):
+    return np.cos(lat) / np.sqrt(1 - (E * np.sin(lat)) ** 2)
+
+
+def _t(lat):
+    e_sin = E * np.sin(lat)
+    return np.tan(np.pi / 4 - lat / 2) / ((1 - e_sin) / (1 + e_sin)) ** (E / 2)
+
+
+N = (np.log(_m(LAT_1)) - np.log(_m(LAT_2))) / (np.log(_t(LAT_1)) - np.log(_t(LAT_2)))
+F = _m(LAT_1) / (N * _t(LAT_1) ** N)
+RHO_0 = A * F * _t(LAT_0) ** N
+
+
+def to_lambert93(latitude, longitude):
+    """(latitude, longitude) en degrés WGS84 -> (x, y) en mètres Lambert-93."""
+    lat = np.radians(np.asarray(latitude, dtype=float))
+    theta = N * (np.radians(np.asarray(longitude, dtype=float)) - LON_0)
+    rho = A * F * _t(lat) ** N
+    return X_0 + rho * np.sin(theta), Y_0 + RHO_0 - rho * np.cos(theta)
+
+
+def from_lambert93(x, y, iterations=8):
+    """(x, y) en mètres Lambert-93 -> (latitude, longitude) en degrés WGS84."""
+    dx = np.asarray(x, dtype=float) - X_0
+    dy = RHO_0 - (np.asarray(y, dtype=float) - Y_0)
+    rho = np.hypot(dx, dy)
+    t = (rho / (A * F)) ** (1 / N)
+    lat = np.pi / 2 - 2 * np.arctan(t)
+    for _ in range(iterations):
+        e_sin = E * np.sin(lat)
+        lat = np.pi / 2 - 2 * np.arctan(t * ((1 - e_sin) / (1 + e_sin)) ** (E / 2))
+    return np.degrees(lat), np.degrees(np.arctan2(dx, dy) / N + LON_0)
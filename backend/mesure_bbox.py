@@ -0,0 +1,63 @@
+"""
+Pages lues par les requêtes de ventes sur quelques emprises types.
+
+Chaque requête est exécutée avec EXPLAIN (ANALYZE, BUFFERS) sur les shards de
+l'emprise : on relève les pages trouvées dans le cache de PostgreSQL (hit), les
+pages lues sur disque ou dans le cache du système (read) et la durée. À lancer
+avant et après le rangement des partitions par clé de Hilbert
+(python import_dvf.py <année> --refresh, voir sql/008_dvf_maison_hilbert.sql).
+
+Usage :
+    python mesure_bbox.py [--limit 1000] [--repeat 3]
+"""
+import argparse
+
+from shard_router import ShardRouter
+from ventes_query import VENTES_TABLE, build_filters, build_ventes_query
+
+# (lat_min, lat_max, lon_min, lon_max)
+BBOXES = {
+    "Paris": (48.815, 48.902, 2.224, 2.469),
+    "Lyon": (45.707, 45.808, 4.771, 4.898),
+    "Bordeaux": (44.810, 44.916, -0.638, -0.528),
+    "Creuse (rural)": (45.900, 46.300, 1.700, 2.300),
+    "Bretagne": (47.300, 48.900, -4.800, -1.000),
+}
+
+
+def count_query(bbox):
+    where, params = build_filters(bbox)
+    return f"SELECT count(*) FROM {VENTES_TABLE} WHERE {where}", params
+
+
+def explain(router, shard_name, query, params):
+    """(pages hit, pages read, durée en ms) de la requête sur un shard."""
+    plan = router.fetch(shard_name, "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + query, params)[0][0][0]
+    root = plan["Plan"]
+    return root.get("Shared Hit Blocks", 0), root.get("Shared Read Blocks", 0), plan["Execution Time"]
+
+
+def measure(router, limit, repeat):
+    print(f"{'emprise':<16} {'requête':<9} {'hit':>9} {'read':>9} {'ms':>9}")
+    for name, bbox in BBOXES.items():
+        queries = {
+            "liste": build_ventes_query(bbox, None, None, limit, 0),
+            "comptage": count_query(bbox),
+        }
+        for label, (query, params) in queries.items():
+            # La première exécution lit le disque, les suivantes montrent le cache
+            for _ in range(repeat):
+                hit = read = elapsed = 0
+                for shard_name in router.shards_for_bbox(bbox):
+                    h, r, ms = explain(router, shard_name, query, params)
+                    hit, read, elapsed = hit + h, read + r, elapsed + ms
+                print(f"{name:<16} {label:<9} {hit:>9} {read:>9} {elapsed:>9.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pages lues par les requêtes de ventes par emprise")
+    parser.add_argument("--limit", type=int, default=1000, help="Taille de la page de ventes")
+    parser.add_argument("--repeat", type=int, default=3, help="Exécutions par requête")
+    args = parser.parse_args()
+
+    measure(ShardRouter.from_env(), args.limit, args.repeat)
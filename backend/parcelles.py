@@ -0,0 +1,98 @@
+"""
+Historique des ventes d'une parcelle (id_parcelle), pour une ou plusieurs parcelles.
+
+En base, la recherche passe par l'index sur id_parcelle (sql/007_dvf_maison_parcelle.sql),
+et seuls les shards des départements des parcelles sont interrogés (le code
+département est le début de l'identifiant). Avec l'instantané, le dictionnaire
+trié et la permutation id_parcelle.order donnent les lignes par dichotomie.
+
+Les historiques sont gardés dans un cache LRU, vidé à chaque rechargement des
+données (voir data_reload.py).
+"""
+import collections
+import threading
+
+import numpy as np
+
+from ventes_query import VENTES_COLUMNS, VENTES_TABLE
+
+HISTORY_QUERY = f"""
+    SELECT {VENTES_COLUMNS}
+    FROM {VENTES_TABLE}
+    WHERE id_parcelle = ANY(%s)
+    ORDER BY date_mutation
+"""
+
+# Nombre maximal de parcelles par requête groupée
+MAX_BATCH = 500
+# Position de id_parcelle dans une ligne ventes
+ID_PARCELLE_INDEX = 9
+
+
+def departement_of(id_parcelle):
+    """'01001000ZD0025' -> '01' ; '97411000AB0012' -> '974'"""
+    return id_parcelle[:3] if id_parcelle.startswith("97") else id_parcelle[:2]
+
+
+class ParcelHistory:
+    """Ventes de chaque parcelle, par date croissante."""
+
+    def __init__(self, router, max_entries=10_000):
+        self.router = router
+        self.max_entries = max_entries
+        self._cache = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, ids, snapshot=None):
+        """{id_parcelle: [lignes ventes]} pour chacun des identifiants (liste vide si aucune vente)."""
+        result = {}
+        missing = []
+        with self._lock:
+            for id_parcelle in ids:
+                rows = self._cache.get(id_parcelle)
+                if rows is None:
+                    missing.append(id_parcelle)
+                else:
+                    self._cache.move_to_end(id_parcelle)
+                    result[id_parcelle] = rows
+
+        if missing:
+            fetched = self._from_snapshot(snapshot, missing) if snapshot is not None else self._from_database(missing)
+            with self._lock:
+                for id_parcelle, rows in fetched.items():
+                    self._cache[id_parcelle] = rows
+                while len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+            result.update(fetched)
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def _from_snapshot(self, snapshot, ids):
+        dates = snapshot.arrays["date_mutation"]
+        fetched = {}
+        for id_parcelle in ids:
+            found = snapshot.find("id_parcelle", id_parcelle)
+            fetched[id_parcelle] = [snapshot.row(i) for i in found[np.argsort(dates[found], kind="stable")]]
+        return fetched
+
+    def _from_database(self, ids):
+        fetched = {id_parcelle: [] for id_parcelle in ids}
+        for r in self.router.fetch_all(HISTORY_QUERY, [list(ids)], self._shards_for(ids)):
+            fetched[r[ID_PARCELLE_INDEX]].append(r)
+        return fetched
+
+    def _shards_for(self, ids):
+        if not self.router.is_sharded:
+            return list(self.router.shards)
+        # Complète la correspondance département -> shard à partir des données
+        self.router.departement_extents()
+        names = set()
+        for id_parcelle in ids:
+            name = self.router.shard_for_departement(departement_of(id_parcelle))
+            if name is None:
+                return list(self.router.shards)
+            names.add(name)
+        return [name for name in self.router.shards if name in names]
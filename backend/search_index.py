@@ -0,0 +1,186 @@
+"""
+Index de recherche en mémoire des communes, codes postaux et voies de dvf_maison.
+
+Les libellés sont normalisés (majuscules, sans accents ni tirets) et rangés dans un
+tableau trié : une recherche par préfixe est une dichotomie (bisect) suivie d'un
+parcours borné des clés qui commencent par ce préfixe. Chaque commune et chaque
+voie sont indexées à partir de chacun de leurs mots significatifs
+("POUILLY" trouve "SAINT GENIS POUILLY", "HETRES" trouve "ALL DES HETRES").
+
+L'index est reconstruit en arrière-plan dès qu'un nouvel import apparaît dans la
+table dvf_import (voir import_dvf.py), puis remplacé d'un bloc. Avec
+check_interval=None, la reconstruction est laissée à l'appelant (voir data_reload.py).
+"""
+import bisect
+import re
+import threading
+import time
+import unicodedata
+
+from ventes_query import VENTES_TABLE
+
+COMMUNES_QUERY = f"""
+    SELECT nom_commune, code_postal, AVG(latitude), AVG(longitude), COUNT(*)
+    FROM {VENTES_TABLE}
+    WHERE nom_commune IS NOT NULL
+    GROUP BY nom_commune, code_postal
+"""
+
+VOIES_QUERY = f"""
+    SELECT adresse_nom_voie, nom_commune, code_postal, AVG(latitude), AVG(longitude), COUNT(*)
+    FROM {VENTES_TABLE}
+    WHERE adresse_nom_voie IS NOT NULL
+    GROUP BY adresse_nom_voie, nom_commune, code_postal
+"""
+
+# Nombre maximal de clés examinées pour un préfixe avant classement
+SCAN_LIMIT = 5000
+
+# Mots qui ne servent pas de point d'entrée dans un libellé
+STOPWORDS = {"DE", "DU", "DES", "LA", "LE", "LES", "L", "D", "ET", "SUR", "SOUS", "EN"}
+
+_NUMERO_RE = re.compile(r"^(\d+)\s*(?:BIS|TER|[A-Z])?\s+(.+)$")
+
+
+def normalize(text):
+    """'Saint-Genis-Pouilly' -> 'SAINT GENIS POUILLY'"""
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = re.sub(r"[-'’,.]", " ", text.upper())
+    return " ".join(text.split())
+
+
+def _word_keys(label, entry_id):
+    """Clés (suffixe du libellé, entrée, début du libellé) pour chaque mot significatif."""
+    words = normalize(label).split(" ")
+    return [
+        (" ".join(words[i:]), entry_id, i == 0)
+        for i in range(len(words))
+        if i == 0 or words[i] not in STOPWORDS
+    ]
+
+
+class _Index:
+    """Génération immuable de l'index : clés triées et entrées associées."""
+
+    def __init__(self, entries, keyed):
+        keyed.sort()
+        self.entries = entries
+        self.keys = [key for key, _, _ in keyed]
+        # (indice de l'entrée, la clé est-elle le début du libellé)
+        self.targets = [(entry_id, is_start) for _, entry_id, is_start in keyed]
+
+
+class SearchIndex:
+    """Recherche par préfixe, insensible aux accents, sur les communes et les voies."""
+
+    def __init__(self, router, check_interval=60):
+        self.router = router
+        self.check_interval = check_interval
+        self._index = None
+        self._version = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._building = False
+
+    def current_version(self):
+        return self.router.import_version()
+
+    def build(self):
+        """Construit une nouvelle génération de l'index et la met en service."""
+        started = time.time()
+        version = self.current_version()
+        entries = []
+        keyed = []
+
+        for nom_commune, code_postal, lat, lon, count in self.router.fetch_all(COMMUNES_QUERY):
+            entry_id = len(entries)
+            label = f"{nom_commune} ({code_postal})" if code_postal else nom_commune
+            entries.append({
+                "type": "commune", "label": label, "nom_commune": nom_commune,
+                "code_postal": code_postal or "", "latitude": float(lat), "longitude": float(lon),
+                "nb_ventes": count,
+            })
+            keyed.extend(_word_keys(nom_commune, entry_id))
+            if code_postal:
+                keyed.append((code_postal, entry_id, True))
+
+        for nom_voie, nom_commune, code_postal, lat, lon, count in self.router.fetch_all(VOIES_QUERY):
+            entry_id = len(entries)
+            entries.append({
+                "type": "voie", "label": f"{nom_voie}, {code_postal or ''} {nom_commune or ''}".strip(),
+                "adresse_nom_voie": nom_voie, "nom_commune": nom_commune or "", "code_postal": code_postal or "",
+                "latitude": float(lat), "longitude": float(lon), "nb_ventes": count,
+            })
+            keyed.extend(_word_keys(nom_voie, entry_id))
+
+        index = _Index(entries, keyed)
+        with self._lock:
+            self._index = index
+            self._version = version
+        print(f"Index de recherche construit: {len(index.keys)} clés, {len(entries)} entrées "
+              f"en {time.time() - started:.1f}s (version {version})")
+
+    def refresh_if_needed(self):
+        """Vérifie au plus toutes les check_interval secondes si un import a eu lieu."""
+        if self.check_interval is None:
+            return
+        now = time.time()
+        with self._lock:
+            if self._building or now - self._last_check < self.check_interval:
+                return
+            self._last_check = now
+            self._building = True
+        threading.Thread(target=self._refresh, daemon=True).start()
+
+    def _refresh(self):
+        try:
+            if self.current_version() != self._version:
+                self.build()
+        except Exception as e:
+            print(f"Erreur lors de la reconstruction de l'index de recherche: {str(e)}")
+        finally:
+            with self._lock:
+                self._building = False
+
+    def search(self, q, limit=10):
+        if self._index is None:
+            with self._build_lock:
+                if self._index is None:
+                    self._last_check = time.time()
+                    self.build()
+        else:
+            self.refresh_if_needed()
+        index = self._index
+
+        query = normalize(q)
+        numero = None
+        match = _NUMERO_RE.match(query)
+        if match:
+            numero, query = match.group(1), match.group(2)
+
+        start = bisect.bisect_left(index.keys, query)
+        candidates = {}
+        for i in range(start, min(start + SCAN_LIMIT, len(index.keys))):
+            key = index.keys[i]
+            if not key.startswith(query):
+                break
+            entry_id, is_start = index.targets[i]
+            entry = index.entries[entry_id]
+            if numero is not None and entry["type"] != "voie":
+                continue
+            # Correspondance exacte, puis début du libellé, puis nombre de ventes
+            score = (key == query, is_start, entry["nb_ventes"])
+            if entry_id not in candidates or score > candidates[entry_id]:
+                candidates[entry_id] = score
+
+        ranked = sorted(candidates.items(), key=lambda item: item[1], reverse=True)[:limit]
+        results = []
+        for entry_id, _ in ranked:
+            result = dict(index.entries[entry_id])
+            if numero is not None:
+                result["adresse_numero"] = numero
+                result["label"] = f"{numero} {result['label']}"
+            results.append(result)
+        return results
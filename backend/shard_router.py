@@ -0,0 +1,165 @@
+"""
+Routage des requêtes ventes vers plusieurs instances PostgreSQL, réparties par département.
+
+Chaque shard contient la table dvf_maison des départements qui lui sont attribués.
+La configuration est lue depuis le fichier JSON désigné par DVF_SHARDS_FILE
+(voir shards.example.json) :
+
+    {
+        "shards": {"nord": {"host": "...", "port": 5433, "database": "...", "user": "...", "password": "..."}},
+        "departements": {"nord": ["59", "62"]},
+        "default": "nord"
+    }
+
+Les départements absents de "departements" sont attribués au shard "default" ;
+sans lui, import_dvf.py --shard refuse un fichier qui en contient. Sans fichier de
+configuration, toutes les requêtes partent vers la base principale (get_connection()).
+
+Pour une zone donnée, seuls les shards dont au moins un département intersecte la
+zone sont interrogés, en parallèle ; chacun renvoie ses limit + offset premières
+lignes triées et la fusion applique l'ordre, l'offset et la limite globaux.
+"""
+import heapq
+import itertools
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from db_config import get_connection
+from ventes_query import VENTES_TABLE, DEFAULT_SORT, build_ventes_query, ordering, sample_years
+
+# Version des données : dernier import de chaque shard (voir sql/003_dvf_import.sql)
+IMPORT_VERSION_QUERY = "SELECT COALESCE(MAX(id), 0) FROM dvf_import"
+
+# Années chargées : une partition par année (voir sql/001_dvf_maison_partitions.sql)
+YEARS_QUERY = f"SELECT count(*) FROM pg_inherits WHERE inhparent = '{VENTES_TABLE}'::regclass"
+
+EXTENTS_QUERY = f"""
+    SELECT code_departement, MIN(latitude), MAX(latitude), MIN(longitude), MAX(longitude)
+    FROM {VENTES_TABLE}
+    GROUP BY code_departement
+"""
+
+
+class ShardRouter:
+    """Associe les départements aux bases et répartit les requêtes ventes."""
+
+    def __init__(self, shards=None, departements=None, default=None):
+        # nom du shard -> paramètres psycopg2 (None : base principale)
+        self.shards = shards or {"default": None}
+        # code_departement -> nom du shard (configuration, complétée par departement_extents)
+        self._configured = {
+            code: name
+            for name, codes in (departements or {}).items()
+            for code in codes
+        }
+        self.shard_by_departement = dict(self._configured)
+        # Shard des départements absents de la configuration (None : aucun)
+        self.default_shard = default
+        self._extents = None
+        self._years = None
+        self._extents_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=len(self.shards), thread_name_prefix="shard")
+
+    @classmethod
+    def from_env(cls):
+        path = os.getenv("DVF_SHARDS_FILE")
+        if not path:
+            return cls()
+        with open(path, encoding="utf-8") as f:
+            config = json.load(f)
+        return cls(config["shards"], config.get("departements"), config.get("default"))
+
+    @property
+    def is_sharded(self):
+        return len(self.shards) > 1
+
+    def connect(self, shard_name):
+        return get_connection(self.shards[shard_name])
+
+    def import_version(self):
+        """Version des données chargées : change à chaque import, sur n'importe quel shard."""
+        return tuple(r[0] for r in self.fetch_all(IMPORT_VERSION_QUERY))
+
+    def shard_for_departement(self, code_departement):
+        return self.shard_by_departement.get(code_departement, self.default_shard)
+
+    def departement_extents(self):
+        """Emprise (lat_min, lat_max, lon_min, lon_max) de chaque département, calculée une fois par shard."""
+        if self._extents is None:
+            with self._extents_lock:
+                if self._extents is None:
+                    extents = {}
+                    for name, rows in zip(self.shards, self._executor.map(self._fetch_extents, self.shards)):
+                        for r in rows:
+                            if r[0]:
+                                extents[r[0]] = tuple(float(v) for v in r[1:])
+                                # Un département absent de la configuration est servi par le shard qui le contient
+                                self.shard_by_departement.setdefault(r[0], name)
+                    self._extents = extents
+        return self._extents
+
+    def data_years(self):
+        """Nombre d'années chargées (le plus grand sur les shards), lu une fois."""
+        if self._years is None:
+            self._years = max((int(r[0]) for r in self.fetch_all(YEARS_QUERY)), default=1)
+        return self._years
+
+    def clear(self):
+        """Oublie les emprises et le nombre d'années, relus au prochain appel (après un import)."""
+        with self._extents_lock:
+            self._extents = None
+            self._years = None
+            # Les départements découverts par departement_extents sont rattachés à nouveau
+            self.shard_by_departement = dict(self._configured)
+
+    def _fetch_extents(self, shard_name):
+        return self.fetch(shard_name, EXTENTS_QUERY, [])
+
+    def departements_for_bbox(self, bbox):
+        """Départements dont l'emprise intersecte la zone (lat_min, lat_max, lon_min, lon_max)."""
+        lat_min, lat_max, lon_min, lon_max = bbox
+        return sorted(
+            code for code, (d_lat_min, d_lat_max, d_lon_min, d_lon_max) in self.departement_extents().items()
+            if d_lat_min <= lat_max and d_lat_max >= lat_min and d_lon_min <= lon_max and d_lon_max >= lon_min
+        )
+
+    def shards_for_bbox(self, bbox):
+        if not self.is_sharded or bbox is None:
+            return list(self.shards)
+        names = {self.shard_for_departement(code) for code in self.departements_for_bbox(bbox)}
+        return [name for name in self.shards if name in names]
+
+    def fetch_ventes(self, bbox, price_param, date_param, limit, offset, mode="top", zone=None, sort=DEFAULT_SORT):
+        """Exécute la requête ventes sur les shards concernés et fusionne les résultats."""
+        shard_names = self.shards_for_bbox(bbox)
+        if not shard_names:
+            return []
+        years = sample_years(date_param, self.data_years()) if mode == "sample" else 1
+        if len(shard_names) == 1:
+            query, params = build_ventes_query(bbox, price_param, date_param, limit, offset, mode, zone, sort, years)
+            return self.fetch(shard_names[0], query, params)
+
+        # Chaque shard renvoie ses limit + offset premières lignes, la pagination se fait à la fusion
+        query, params = build_ventes_query(bbox, price_param, date_param, limit + offset, 0, mode, zone, sort, years)
+        results = self._executor.map(lambda name: self.fetch(name, query, params), shard_names)
+        _, key_index, descending = ordering(mode, sort)
+        merged = heapq.merge(*results, key=lambda r: r[key_index], reverse=descending)
+        return list(itertools.islice(merged, offset, offset + limit))
+
+    def fetch_all(self, query, params=(), shard_names=None):
+        """Exécute la requête sur les shards (tous par défaut) en parallèle et concatène les lignes."""
+        if shard_names is None:
+            shard_names = list(self.shards)
+        results = self._executor.map(lambda name: self.fetch(name, query, params), shard_names)
+        return [row for rows in results for row in rows]
+
+    def fetch(self, shard_name, query, params):
+        conn = self.connect(shard_name)
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(query, params)
+                return cursor.fetchall()
+        finally:
+            conn.close()
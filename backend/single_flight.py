@@ -0,0 +1,67 @@
+"""
+Regroupement des requêtes identiques simultanées (single-flight).
+
+Quand plusieurs requêtes de même clé arrivent pendant qu'une exécution est en
+cours (typiquement la vue par défaut de la carte ouverte par de nombreux
+utilisateurs), seule la première interroge la base ; les suivantes attendent son
+résultat et le partagent. Rien n'est conservé une fois l'exécution terminée : ce
+n'est pas un cache, une requête arrivée après coup relance l'exécution.
+
+Le regroupement vaut pour un processus : avec plusieurs workers, chacun a le sien.
+"""
+import threading
+
+
+class _Call:
+    """Exécution en cours, attendue par les requêtes de même clé."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Exécute fn une seule fois par clé parmi les appels simultanés."""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.executed = 0
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        """Retourne (résultat, partagé) ; partagé vaut True si le résultat vient d'un autre appel."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def stats(self):
+        with self._lock:
+            return {
+                "executed": self.executed,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._calls),
+            }
@@ -0,0 +1,533 @@
+"""
+Instantané binaire des ventes (maisons), ouvert par mmap et partagé entre les workers.
+
+Format d'un fichier dvf_snapshot_<version>.bin (petit-boutiste) :
+
+    MAGIC (8 octets) | longueur de l'en-tête (uint32) | 4 octets de bourrage
+    en-tête JSON (aligné sur 8 octets)
+    blocs de données, chacun aligné sur 8 octets
+
+L'en-tête décrit chaque bloc (type NumPy, position relative au début des données,
+nombre d'éléments). Les colonnes numériques sont de largeur fixe ; les colonnes
+texte sont encodées par dictionnaire : un tableau de codes int32 (-1 pour NULL),
+et pour le dictionnaire (trié) un tableau d'offsets int64 et un blob UTF-8. Une
+valeur se retrouve par dichotomie dans le dictionnaire ; pour id_parcelle, le bloc
+id_parcelle.order (lignes triées par code) donne ensuite ses ventes par dichotomie.
+
+Les lignes sont triées par latitude : une zone se réduit à une tranche contiguë
+(np.searchsorted) avant le filtrage vectorisé. Les tableaux sont des vues NumPy sur
+le mmap en lecture seule : aucune copie, et le système partage une seule copie
+physique du fichier entre tous les processus qui l'ouvrent.
+
+Pour chaque colonne triable (paramètre sort, voir ventes_query.SORTS), un bloc
+<colonne>.order contient la permutation des lignes triées par cette colonne (les
+valeurs NULL en sont exclues), lue à l'envers pour le tri décroissant. Quand la
+sélection est assez dense, les premières lignes sont lues dans cet ordre et la
+lecture s'arrête dès que limit + offset lignes de la sélection sont trouvées.
+
+Un nouvel instantané est écrit dans un fichier temporaire puis renommé, et le
+fichier CURRENT (nom de l'instantané en service) est remplacé par os.replace :
+les lecteurs voient l'ancienne ou la nouvelle version, jamais un fichier partiel.
+Chaque processus garde l'instantané précédent ouvert tant que des requêtes en
+cours l'utilisent (SnapshotStore.acquire), puis le ferme ; les anciens fichiers
+peuvent être supprimés dès la bascule, le mmap restant valide jusqu'à fermeture.
+
+L'en-tête porte la version des données (ShardRouter.import_version) : après un
+import, build_snapshot_if_stale reconstruit l'instantané une seule fois, quel que
+soit le nombre de workers qui le demandent (verrou sur le répertoire).
+
+Usage :
+    python snapshot.py build [--dir snapshots]
+"""
+import argparse
+import contextlib
+import datetime
+import fcntl
+import functools
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from shard_router import ShardRouter
+from ventes_query import (VENTES_TABLE, SAMPLE_LEVELS, SORTS, DEFAULT_SORT, parse_dates, parse_price,
+                          sample_level, sample_years)
+
+MAGIC = b"DVFSNAP1"
+FORMAT_VERSION = 5
+ALIGN = 8
+PREAMBLE = struct.Struct("<8sI4x")
+CURRENT_FILE = "CURRENT"
+LOCK_FILE = ".build.lock"
+# Instantanés conservés sur disque (celui en service compris)
+KEEP_SNAPSHOTS = 2
+# Taille des blocs de permutation lus à la suite lors d'un tri
+ORDER_BLOCK = 65536
+EPOCH = datetime.date(1970, 1, 1)
+
+NUMERIC_COLUMNS = {
+    "latitude": "<f8",
+    "longitude": "<f8",
+    "valeur_fonciere": "<f8",
+    "date_mutation": "<i4",        # jours depuis le 1970-01-01
+    "surface_terrain": "<f8",      # NaN pour NULL
+    "rang_aleatoire": "<f8",
+    "niveau_echantillon": "<i1",
+    "x_lambert93": "<f8",
+    "y_lambert93": "<f8",
+}
+STRING_COLUMNS = ["id_mutation", "adresse_numero", "adresse_nom_voie", "code_postal", "code_commune", "nom_commune",
+                  "id_parcelle"]
+# Colonnes texte dont les lignes sont retrouvées par valeur (Snapshot.find)
+INDEXED_STRING_COLUMNS = ["id_parcelle"]
+# Colonnes texte peu variées dont les valeurs décodées sont gardées (LRU par colonne et par
+# processus) ; les autres (identifiants, numéros) sont décodées à chaque lecture
+CACHED_STRING_COLUMNS = ["adresse_nom_voie", "code_postal", "nom_commune"]
+STRING_CACHE_SIZE = 4096
+
+SNAPSHOT_QUERY = f"""
+    COPY (
+        SELECT {', '.join(list(NUMERIC_COLUMNS) + STRING_COLUMNS)}
+        FROM {VENTES_TABLE}
+    ) TO STDOUT WITH (FORMAT csv, HEADER)
+"""
+
+
+def _align(position):
+    return (position + ALIGN - 1) // ALIGN * ALIGN
+
+
+def to_days(date_str):
+    return (datetime.date.fromisoformat(date_str) - EPOCH).days
+
+
+# ---------------------------------------------------------------------------
+# Écriture
+# ---------------------------------------------------------------------------
+
+def load_frame(router):
+    """Toutes les ventes de tous les shards, via COPY vers un fichier temporaire."""
+    frames = []
+    for shard_name in router.shards:
+        conn = router.connect(shard_name)
+        try:
+            with tempfile.TemporaryFile("w+", encoding="utf-8") as dump:
+                with conn.cursor() as cursor:
+                    cursor.copy_expert(SNAPSHOT_QUERY, dump)
+                dump.seek(0)
+                frames.append(pd.read_csv(dump, dtype={name: str for name in STRING_COLUMNS},
+                                          keep_default_na=False, na_values={name: [""] for name in NUMERIC_COLUMNS}))
+        finally:
+            conn.close()
+    return pd.concat(frames, ignore_index=True)
+
+
+def encode_strings(values):
+    """Colonne texte -> (codes int32, offsets int64, blob uint8), dictionnaire trié."""
+    codes, uniques = pd.factorize(values.mask(values == ""), sort=True, use_na_sentinel=True)
+    encoded = [str(u).encode("utf-8") for u in uniques]
+    offsets = np.zeros(len(encoded) + 1, dtype="<i8")
+    np.cumsum([len(e) for e in encoded], out=offsets[1:])
+    blob = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    return codes.astype("<i4"), offsets, blob
+
+
+def write_snapshot(frame, directory, version, data_version=None):
+    """Écrit l'instantané puis le met en service. Retourne le chemin du fichier."""
+    frame = frame.sort_values("latitude", kind="stable").reset_index(drop=True)
+
+    arrays = {}
+    for name, dtype in NUMERIC_COLUMNS.items():
+        if name == "date_mutation":
+            dates = pd.to_datetime(frame[name]).to_numpy(dtype="datetime64[D]")
+            arrays[name] = dates.astype("<i4")
+        elif name == "niveau_echantillon":
+            arrays[name] = frame[name].fillna(SAMPLE_LEVELS + 1).to_numpy().astype(dtype)
+        else:
+            arrays[name] = frame[name].to_numpy(dtype=dtype, na_value=np.nan)
+    for name in sorted({column for column, _ in SORTS.values()}):
+        values = arrays[name]
+        rows = np.flatnonzero(~np.isnan(values)) if values.dtype.kind == "f" else np.arange(len(values))
+        arrays[f"{name}.order"] = rows[np.argsort(values[rows], kind="stable")].astype("<i4")
+
+    strings = {}
+    for name in STRING_COLUMNS:
+        codes, offsets, blob = encode_strings(frame[name])
+        arrays[f"{name}.codes"], arrays[f"{name}.offsets"], arrays[f"{name}.blob"] = codes, offsets, blob
+        strings[name] = {"codes": f"{name}.codes", "offsets": f"{name}.offsets", "blob": f"{name}.blob"}
+        if name in INDEXED_STRING_COLUMNS:
+            arrays[f"{name}.order"] = np.argsort(codes, kind="stable").astype("<i4")
+
+    blocks = {}
+    position = 0
+    for name, array in arrays.items():
+        blocks[name] = {"dtype": array.dtype.str, "offset": position, "length": len(array)}
+        position = _align(position + array.nbytes)
+
+    header = json.dumps({
+        "format": FORMAT_VERSION,
+        "version": version,
+        "data_version": data_version,
+        "rows": len(frame),
+        "created_at": datetime.datetime.now().isoformat(),
+        "blocks": blocks,
+        "strings": strings,
+    }).encode("utf-8")
+    data_start = _align(PREAMBLE.size + len(header))
+
+    os.makedirs(directory, exist_ok=True)
+    filename = f"dvf_snapshot_{version}.bin"
+    path = os.path.join(directory, filename)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(PREAMBLE.pack(MAGIC, len(header)))
+        f.write(header)
+        for name, array in arrays.items():
+            f.seek(data_start + blocks[name]["offset"])
+            f.write(np.ascontiguousarray(array).tobytes())
+        f.truncate(data_start + position)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+    # Bascule atomique : les lecteurs suivent CURRENT
+    current_tmp = os.path.join(directory, CURRENT_FILE + ".tmp")
+    with open(current_tmp, "w", encoding="utf-8") as f:
+        f.write(filename)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(current_tmp, os.path.join(directory, CURRENT_FILE))
+
+    print(f"Instantané {path} écrit ({len(frame)} ventes, {data_start + position} octets)")
+    return path
+
+
+def build_snapshot(router, directory):
+    version = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
+    data_version = list(router.import_version())
+    path = write_snapshot(load_frame(router), directory, version, data_version)
+    prune_snapshots(directory)
+    return path
+
+
+def prune_snapshots(directory, keep=KEEP_SNAPSHOTS):
+    """Supprime les instantanés les plus anciens ; ceux encore ouverts restent lisibles par leur mmap."""
+    names = sorted(name for name in os.listdir(directory)
+                   if name.startswith("dvf_snapshot_") and name.endswith(".bin"))
+    for name in names[:-keep]:
+        os.remove(os.path.join(directory, name))
+
+
+def current_data_version(directory):
+    """Version des données de l'instantané en service, ou None."""
+    try:
+        with open(os.path.join(directory, CURRENT_FILE), encoding="utf-8") as f:
+            path = os.path.join(directory, f.read().strip())
+        with open(path, "rb") as f:
+            magic, header_length = PREAMBLE.unpack(f.read(PREAMBLE.size))
+            header = json.loads(f.read(header_length))
+    except (FileNotFoundError, struct.error, ValueError):
+        return None
+    if magic != MAGIC or header.get("format") != FORMAT_VERSION:
+        return None
+    return header.get("data_version")
+
+
+def build_snapshot_if_stale(router, directory):
+    """
+    Reconstruit l'instantané si ses données sont antérieures au dernier import.
+    Un seul processus construit à la fois ; les autres attendent puis constatent
+    que l'instantané est à jour. Retourne le chemin du nouvel instantané, ou None.
+    """
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, LOCK_FILE), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            if current_data_version(directory) == list(router.import_version()):
+                return None
+            return build_snapshot(router, directory)
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+# ---------------------------------------------------------------------------
+# Lecture
+# ---------------------------------------------------------------------------
+
+class Snapshot:
+    """Instantané ouvert en lecture seule ; les colonnes sont des vues sur le mmap."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, header_length = PREAMBLE.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} n'est pas un instantané DVF")
+        header = json.loads(self._mmap[PREAMBLE.size:PREAMBLE.size + header_length])
+        if header["format"] != FORMAT_VERSION:
+            raise ValueError(f"Format d'instantané non pris en charge: {header['format']}")
+
+        self.version = header["version"]
+        self.data_version = header.get("data_version")
+        self.rows = header["rows"]
+        # Requêtes en cours sur cet instantané, et remplacement par un plus récent (SnapshotStore)
+        self.leases = 0
+        self.retired = False
+        data_start = _align(PREAMBLE.size + header_length)
+        self.arrays = {
+            name: np.frombuffer(self._mmap, dtype=block["dtype"], count=block["length"],
+                                offset=data_start + block["offset"])
+            for name, block in header["blocks"].items()
+        }
+        self.strings = header["strings"]
+        self._decoders = {
+            column: functools.lru_cache(maxsize=STRING_CACHE_SIZE)(functools.partial(self._decode, column))
+            for column in CACHED_STRING_COLUMNS
+        }
+        self._years = None
+
+    def close(self):
+        self.arrays = {}
+        try:
+            self._mmap.close()
+        except BufferError:
+            # Des vues sont encore utilisées : le mmap sera libéré avec elles
+            pass
+
+    def string(self, column, row):
+        code = int(self.arrays[self.strings[column]["codes"]][row])
+        if code < 0:
+            return None
+        decode = self._decoders.get(column)
+        return decode(code) if decode is not None else self._decode(column, code)
+
+    def _decode(self, column, code):
+        spec = self.strings[column]
+        offsets = self.arrays[spec["offsets"]]
+        return self.arrays[spec["blob"]][offsets[code]:offsets[code + 1]].tobytes().decode("utf-8")
+
+    def lookup(self, column, value):
+        """Code de value dans le dictionnaire (trié) de la colonne texte, ou None s'il n'y figure pas."""
+        spec = self.strings[column]
+        offsets = self.arrays[spec["offsets"]]
+        blob = self.arrays[spec["blob"]]
+        encoded = value.encode("utf-8")
+        # L'ordre des octets UTF-8 est celui des chaînes Python qui a servi au tri
+        low, high = 0, len(offsets) - 1
+        while low < high:
+            middle = (low + high) // 2
+            if blob[offsets[middle]:offsets[middle + 1]].tobytes() < encoded:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(offsets) - 1 and blob[offsets[low]:offsets[low + 1]].tobytes() == encoded:
+            return low
+        return None
+
+    def find(self, column, value):
+        """Lignes dont la colonne texte (INDEXED_STRING_COLUMNS) vaut value."""
+        code = self.lookup(column, value)
+        if code is None:
+            return np.empty(0, dtype=np.int64)
+        codes = self.arrays[self.strings[column]["codes"]]
+        order = self.arrays[f"{column}.order"]
+        start = np.searchsorted(codes, code, side="left", sorter=order)
+        stop = np.searchsorted(codes, code, side="right", sorter=order)
+        return order[start:stop]
+
+    def select(self, bbox, price_param=None, date_param=None, zone=None):
+        """Indices des ventes de la zone correspondant aux filtres (mêmes règles que build_filters)."""
+        a = self.arrays
+        start, stop = 0, self.rows
+        if bbox is not None:
+            lat_min, lat_max, lon_min, lon_max = bbox
+            start = int(np.searchsorted(a["latitude"], lat_min, side="left"))
+            stop = int(np.searchsorted(a["latitude"], lat_max, side="right"))
+
+        mask = np.ones(stop - start, dtype=bool)
+        if bbox is not None:
+            longitude = a["longitude"][start:stop]
+            mask &= (longitude >= lon_min) & (longitude <= lon_max)
+
+        price = parse_price(price_param)
+        if price:
+            valeur = a["valeur_fonciere"][start:stop]
+            mask &= (valeur >= price[0]) & (valeur <= price[1])
+
+        dates = parse_dates(date_param)
+        if dates:
+            jours = a["date_mutation"][start:stop]
+            mask &= (jours >= to_days(dates[0])) & (jours <= to_days(dates[1]))
+
+        selected = np.flatnonzero(mask) + start
+        if zone is not None:
+            # Test exact (polygone, commune) sur les seules lignes retenues par le préfiltre
+            selected = selected[zone.snapshot_mask(self, selected)]
+        return selected
+
+    def query_ventes(self, bbox, price_param, date_param, limit, offset, mode="top", zone=None, sort=DEFAULT_SORT):
+        """Équivalent de build_ventes_query : lignes au même format que celles de la base."""
+        a = self.arrays
+        selected = self.select(bbox, price_param, date_param, zone)
+        wanted = limit + offset
+
+        if mode == "sample":
+            years = sample_years(date_param, self.data_years())
+            level = sample_level(bbox, years) if bbox is not None else 0
+            selected = selected[a["niveau_echantillon"][selected] <= level]
+            keys = a["rang_aleatoire"][selected]
+        else:
+            column, descending = SORTS[sort]
+            permutation = a[f"{column}.order"]
+            if descending:
+                permutation = permutation[::-1]
+            # Parcours attendu de la permutation : wanted / densité de la sélection
+            if len(selected) and wanted * len(permutation) < len(selected) ** 2:
+                return [self.row(i, mode) for i in self._read_in_order(permutation, selected, wanted)[offset:]]
+
+            keys = a[column][selected]
+            if keys.dtype.kind == "f":
+                valid = ~np.isnan(keys)
+                selected, keys = selected[valid], keys[valid]
+            if descending:
+                keys = -keys
+
+        # Sélection partielle des limit + offset premières lignes, puis tri de celles-ci seulement
+        if len(selected) > wanted:
+            partition = np.argpartition(keys, wanted - 1)[:wanted]
+            selected, keys = selected[partition], keys[partition]
+        order = np.argsort(keys, kind="stable")[offset:offset + limit]
+        return [self.row(i, mode) for i in selected[order]]
+
+    def data_years(self):
+        """Nombre d'années couvertes par l'instantané (comme les partitions de dvf_maison)."""
+        if self._years is None:
+            jours = self.arrays["date_mutation"]
+            if len(jours) == 0:
+                self._years = 1
+            else:
+                first = EPOCH + datetime.timedelta(days=int(jours.min()))
+                last = EPOCH + datetime.timedelta(days=int(jours.max()))
+                self._years = last.year - first.year + 1
+        return self._years
+
+    def _read_in_order(self, permutation, selected, wanted):
+        """Les wanted premières lignes de selected dans l'ordre de la permutation, lue par blocs."""
+        member = np.zeros(self.rows, dtype=bool)
+        member[selected] = True
+        found = []
+        count = 0
+        for start in range(0, len(permutation), ORDER_BLOCK):
+            block = permutation[start:start + ORDER_BLOCK]
+            hits = block[member[block]]
+            found.append(hits)
+            count += len(hits)
+            if count >= wanted:
+                break
+        return np.concatenate(found)[:wanted] if found else np.empty(0, dtype=np.int64)
+
+    def row(self, i, mode="top"):
+        a = self.arrays
+        surface = float(a["surface_terrain"][i])
+        row = (
+            self.string("id_mutation", i),
+            float(a["valeur_fonciere"][i]),
+            EPOCH + datetime.timedelta(days=int(a["date_mutation"][i])),
+            float(a["latitude"][i]),
+            float(a["longitude"][i]),
+            self.string("adresse_numero", i),
+            self.string("adresse_nom_voie", i),
+            self.string("code_postal", i),
+            self.string("nom_commune", i),
+            self.string("id_parcelle", i),
+            None if np.isnan(surface) else surface,
+        )
+        if mode == "sample":
+            row += (float(a["rang_aleatoire"][i]),)
+        return row
+
+
+class SnapshotStore:
+    """Instantané en service dans ce processus, rouvert quand CURRENT change."""
+
+    def __init__(self, directory, check_interval=5):
+        self.directory = directory
+        self.check_interval = check_interval
+        self._snapshot = None
+        self._current_name = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        directory = os.getenv("DVF_SNAPSHOT_DIR")
+        return cls(directory) if directory else None
+
+    def current(self):
+        now = time.time()
+        if now - self._last_check >= self.check_interval:
+            with self._lock:
+                if now - self._last_check >= self.check_interval:
+                    self._last_check = now
+                    self._reopen_if_changed()
+        return self._snapshot
+
+    def refresh(self):
+        """Met en service sans attendre l'instantané désigné par CURRENT."""
+        with self._lock:
+            self._last_check = time.time()
+            self._reopen_if_changed()
+        return self._snapshot
+
+    @contextlib.contextmanager
+    def acquire(self):
+        """Instantané en service, qui reste ouvert jusqu'à la sortie du bloc même s'il est remplacé."""
+        self.current()
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is not None:
+                snapshot.leases += 1
+        try:
+            yield snapshot
+        finally:
+            if snapshot is not None:
+                with self._lock:
+                    snapshot.leases -= 1
+                    release = snapshot.retired and snapshot.leases == 0
+                if release:
+                    snapshot.close()
+                    print(f"Instantané {snapshot.version} fermé")
+
+    def _reopen_if_changed(self):
+        try:
+            with open(os.path.join(self.directory, CURRENT_FILE), encoding="utf-8") as f:
+                name = f.read().strip()
+        except FileNotFoundError:
+            return
+        if name != self._current_name:
+            previous = self._snapshot
+            self._snapshot = Snapshot(os.path.join(self.directory, name))
+            self._current_name = name
+            print(f"Instantané {name} en service ({self._snapshot.rows} ventes)")
+            if previous is not None:
+                # Fermé ici s'il n'est plus utilisé, sinon par la dernière requête qui le libère
+                previous.retired = True
+                if previous.leases == 0:
+                    previous.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Instantané binaire des ventes DVF")
+    parser.add_argument("command", choices=["build"])
+    parser.add_argument("--dir", default=os.getenv("DVF_SNAPSHOT_DIR", "snapshots"), help="Répertoire des instantanés")
+    args = parser.parse_args()
+
+    build_snapshot(ShardRouter.from_env(), args.dir)
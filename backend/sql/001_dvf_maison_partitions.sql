@@ -0,0 +1,79 @@
+-- Projection "Maison" de la table dvf, partitionnée par année de date_mutation.
+--
+-- L'API ne lit que les maisons géolocalisées : on les copie dans une table
+-- partitionnée par plage (RANGE) sur date_mutation, une partition par année.
+-- Un filtre sur date_mutation n'examine ainsi que les partitions concernées
+-- (partition pruning), et le chargement d'une nouvelle année se fait par
+-- ATTACH PARTITION (voir import_dvf.py) au lieu d'un INSERT massif dans la
+-- table interrogée.
+--
+-- Usage : psql <base> -f backend/sql/001_dvf_maison_partitions.sql
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS dvf_maison (
+    id_mutation         TEXT NOT NULL,
+    date_mutation       DATE NOT NULL,
+    valeur_fonciere     NUMERIC NOT NULL,
+    adresse_numero      TEXT,
+    adresse_nom_voie    TEXT,
+    code_postal         TEXT,
+    code_commune        TEXT,
+    nom_commune         TEXT,
+    code_departement    TEXT,
+    id_parcelle         TEXT,
+    surface_reelle_bati NUMERIC,
+    surface_terrain     NUMERIC,
+    latitude            DOUBLE PRECISION NOT NULL,
+    longitude           DOUBLE PRECISION NOT NULL
+) PARTITION BY RANGE (date_mutation);
+
+-- Une partition par année présente dans dvf : dvf_maison_<année>, puis copie des maisons.
+-- Sur une base vide (ex: un shard), seule la table mère est créée et les années
+-- sont ajoutées par import_dvf.py.
+DO $$
+DECLARE
+    annee INTEGER;
+BEGIN
+    IF to_regclass('dvf') IS NULL THEN
+        RETURN;
+    END IF;
+
+    FOR annee IN
+        SELECT DISTINCT EXTRACT(YEAR FROM date_mutation::DATE)::INTEGER
+        FROM dvf
+        WHERE type_local = 'Maison' AND date_mutation IS NOT NULL
+    LOOP
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF dvf_maison FOR VALUES FROM (%L) TO (%L)',
+            'dvf_maison_' || annee,
+            make_date(annee, 1, 1),
+            make_date(annee + 1, 1, 1)
+        );
+    END LOOP;
+
+    INSERT INTO dvf_maison (
+        id_mutation, date_mutation, valeur_fonciere, adresse_numero, adresse_nom_voie,
+        code_postal, code_commune, nom_commune, code_departement, id_parcelle,
+        surface_reelle_bati, surface_terrain, latitude, longitude
+    )
+    SELECT id_mutation, date_mutation::DATE, valeur_fonciere::NUMERIC, adresse_numero::TEXT, adresse_nom_voie,
+           code_postal::TEXT, code_commune::TEXT, nom_commune, code_departement::TEXT, id_parcelle,
+           surface_reelle_bati::NUMERIC, surface_terrain::NUMERIC, latitude::DOUBLE PRECISION, longitude::DOUBLE PRECISION
+    FROM dvf
+    WHERE type_local = 'Maison'
+      AND latitude IS NOT NULL
+      AND longitude IS NOT NULL
+      AND valeur_fonciere IS NOT NULL
+      AND date_mutation IS NOT NULL;
+END $$;
+
+-- Index déclarés sur la table mère : PostgreSQL crée l'index local de chaque
+-- partition, y compris pour les partitions rattachées plus tard.
+CREATE INDEX IF NOT EXISTS idx_dvf_maison_lat_lon ON dvf_maison (latitude, longitude);
+CREATE INDEX IF NOT EXISTS idx_dvf_maison_valeur ON dvf_maison (valeur_fonciere DESC);
+CREATE INDEX IF NOT EXISTS idx_dvf_maison_date ON dvf_maison (date_mutation);
+
+COMMIT;
+
+ANALYZE dvf_maison;
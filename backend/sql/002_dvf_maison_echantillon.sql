@@ -0,0 +1,25 @@
+-- Échantillonnage spatial des ventes (mode "sample" de /api/v1/dvf/ventes).
+--
+-- rang_aleatoire : rang aléatoire fixé à l'import
+-- niveau_echantillon : premier niveau de grille où la vente fait partie des
+--   premières de sa cellule (voir import_dvf.rebuild_query)
+--
+-- L'index GiST combine la position et le niveau : une requête "niveau <= z dans
+-- la zone" ne lit que les entrées de l'échantillon, sans parcourir toutes les
+-- ventes de la zone.
+--
+-- Les colonnes sont calculées par import_dvf.py. Pour les années déjà chargées :
+--   python import_dvf.py <année> --refresh
+
+BEGIN;
+
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+
+ALTER TABLE dvf_maison
+    ADD COLUMN IF NOT EXISTS rang_aleatoire DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS niveau_echantillon SMALLINT;
+
+CREATE INDEX IF NOT EXISTS idx_dvf_maison_echantillon
+    ON dvf_maison USING gist (point(longitude, latitude), niveau_echantillon);
+
+COMMIT;
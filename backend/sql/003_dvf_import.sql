@@ -0,0 +1,12 @@
+-- Journal des imports DVF.
+--
+-- import_dvf.py y ajoute une ligne dans la même transaction que le rattachement
+-- de la partition. L'API compare MAX(id) à la version de ses données en mémoire
+-- (index de recherche, ...) pour savoir quand les reconstruire.
+
+CREATE TABLE IF NOT EXISTS dvf_import (
+    id          SERIAL PRIMARY KEY,
+    annee       INTEGER NOT NULL,
+    nb_lignes   INTEGER NOT NULL,
+    imported_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
@@ -0,0 +1,6 @@
+-- Requêtes par commune (paramètre code_commune de /api/v1/dvf/ventes).
+--
+-- Chaque vente porte le code INSEE de sa commune : la sélection d'une commune est
+-- une égalité sur cet index, sans test géométrique.
+
+CREATE INDEX IF NOT EXISTS idx_dvf_maison_commune ON dvf_maison (code_commune);
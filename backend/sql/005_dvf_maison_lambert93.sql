@@ -0,0 +1,16 @@
+-- Coordonnées Lambert-93 (EPSG:2154) des ventes (paramètre crs=lambert93 de /api/v1/dvf/ventes).
+--
+-- Les colonnes sont calculées par import_dvf.py (projection vectorisée, voir
+-- lambert93.py) : une zone Lambert-93 est comparée directement à ces colonnes,
+-- sans reprojection à chaque requête. Pour les années déjà chargées :
+--   python import_dvf.py <année> --refresh
+
+BEGIN;
+
+ALTER TABLE dvf_maison
+    ADD COLUMN IF NOT EXISTS x_lambert93 DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS y_lambert93 DOUBLE PRECISION;
+
+CREATE INDEX IF NOT EXISTS idx_dvf_maison_lambert93 ON dvf_maison (y_lambert93, x_lambert93);
+
+COMMIT;
@@ -0,0 +1,9 @@
+-- Tris du mode "top" de /api/v1/dvf/ventes (paramètre sort).
+--
+-- Prix et date sont déjà indexés (sql/001_dvf_maison_partitions.sql ; l'index sur
+-- valeur_fonciere DESC est aussi parcouru à l'envers pour le tri croissant). La
+-- surface du terrain est souvent absente : l'index partiel ne porte que sur les
+-- ventes qui en ont une, les seules triées.
+
+CREATE INDEX IF NOT EXISTS idx_dvf_maison_surface ON dvf_maison (surface_terrain)
+    WHERE surface_terrain IS NOT NULL;
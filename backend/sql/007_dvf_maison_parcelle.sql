@@ -0,0 +1,3 @@
+-- Historique des ventes d'une parcelle (/api/v1/dvf/parcelles/<id_parcelle>/history).
+
+CREATE INDEX IF NOT EXISTS idx_dvf_maison_parcelle ON dvf_maison (id_parcelle);
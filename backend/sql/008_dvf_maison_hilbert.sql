@@ -0,0 +1,17 @@
+-- Rangement spatial des partitions de dvf_maison selon une courbe de Hilbert.
+--
+-- cle_hilbert est calculée par import_dvf.py (voir hilbert.py), qui insère chaque
+-- partition triée par cette clé : les ventes d'une même emprise occupent alors
+-- quelques pages contiguës au lieu d'être dispersées dans la table. Les index
+-- existants (latitude, longitude) en profitent sans changement des requêtes.
+--
+-- Aucune requête ne filtre sur cle_hilbert : la colonne ne sert qu'à l'ordre
+-- d'insertion et n'est pas indexée. Pour ranger les années déjà chargées :
+--   python import_dvf.py <année> --refresh
+-- puis comparer les pages lues avec python mesure_bbox.py, avant et après.
+
+BEGIN;
+
+ALTER TABLE dvf_maison ADD COLUMN IF NOT EXISTS cle_hilbert BIGINT;
+
+COMMIT;
@@ -0,0 +1,38 @@
+from compact import DICTIONARY_COLUMNS, compact_payload
+
+COLUMNS = ["id_mutation", "valeur_fonciere", "adresse_nom_voie", "code_postal", "nom_commune"]
+ROWS = [
+    ["2024-1", 250000.0, "RUE A", "01000", "BOURG EN BRESSE"],
+    ["2024-2", 180000.0, "RUE B", "01000", "BOURG EN BRESSE"],
+    ["2024-3", 320000.0, "RUE A", "01440", "VIRIAT"],
+]
+
+
+def test_repeated_values_share_a_code():
+    payload = compact_payload(COLUMNS, ROWS)
+    assert payload["format"] == "compact"
+    assert payload["columns"] == COLUMNS
+    assert payload["dictionaries"] == {
+        "adresse_nom_voie": ["RUE A", "RUE B"],
+        "code_postal": ["01000", "01440"],
+        "nom_commune": ["BOURG EN BRESSE", "VIRIAT"],
+    }
+    assert payload["rows"][2] == ["2024-3", 320000.0, 0, 1, 1]
+
+
+def test_rows_decode_to_original_values():
+    payload = compact_payload(COLUMNS, ROWS)
+    decoded = []
+    for row in payload["rows"]:
+        row = list(row)
+        for column in DICTIONARY_COLUMNS:
+            position = COLUMNS.index(column)
+            row[position] = payload["dictionaries"][column][row[position]]
+        decoded.append(row)
+    assert decoded == ROWS
+
+
+def test_input_rows_are_not_modified():
+    rows = [tuple(r) for r in ROWS]
+    compact_payload(COLUMNS, rows)
+    assert rows[0] == tuple(ROWS[0])
@@ -0,0 +1,92 @@
+import pytest
+
+from cost_guard import CLUSTER_GRID, DEFAULT_EXTENT, ESTIMATE_HEADER, MODE_HEADER, CostGuard, cluster_cell_size
+from snapshot import Snapshot, write_snapshot
+from test_snapshot import ROWS, make_frame
+
+
+class FakeRouter:
+    """Routeur dont chaque shard renvoie les lignes données (concaténées comme ShardRouter.fetch_all)."""
+
+    def __init__(self, rows_by_shard):
+        self.rows_by_shard = rows_by_shard
+        self.queries = []
+
+    def shards_for_bbox(self, bbox):
+        return list(self.rows_by_shard)
+
+    def fetch_all(self, query, params=None, shard_names=None):
+        self.queries.append((query, params))
+        return [row for name in shard_names for row in self.rows_by_shard[name]]
+
+
+@pytest.fixture
+def snapshot(tmp_path):
+    return Snapshot(write_snapshot(make_frame(), str(tmp_path), "v1"))
+
+
+def test_decide_thresholds():
+    guard = CostGuard(None, detail_max_rows=10, cluster_max_rows=100)
+    assert guard.decide(0) == "detail"
+    assert guard.decide(10) == "detail"
+    assert guard.decide(11) == "cluster"
+    assert guard.decide(100) == "cluster"
+    assert guard.decide(101) == "reject"
+
+
+def test_estimate_sums_planner_rows_over_shards():
+    plan = lambda rows: [([{"Plan": {"Plan Rows": rows}}],)]
+    router = FakeRouter({"nord": plan(120), "sud": plan(30)})
+    assert CostGuard(router).estimate((45.0, 46.0, 4.0, 5.0), None, None) == 150
+    assert router.queries[0][0].startswith("EXPLAIN (FORMAT JSON)")
+
+
+def test_estimate_from_snapshot_is_exact(snapshot):
+    assert CostGuard(None).estimate((48.8, 48.9, 2.3, 2.4), None, None, snapshot) == 2
+
+
+def test_cluster_cell_size():
+    assert cluster_cell_size((48.0, 49.0, 2.0, 4.0)) == 2.0 / CLUSTER_GRID
+    assert cluster_cell_size(None) == cluster_cell_size(DEFAULT_EXTENT)
+
+
+def test_clusters_merge_cells_across_shards():
+    router = FakeRouter({
+        "nord": [(1.0, 2.0, 2, 97.0, 4.0, 300.0)],
+        "sud": [(1.0, 2.0, 1, 48.0, 2.0, 100.0), (0.0, 0.0, 1, 1.0, 1.0, 50.0)],
+    })
+    clusters = CostGuard(router).clusters((0.0, 64.0, 0.0, 64.0), None, None)
+    merged = next(c for c in clusters if c["nb_ventes"] == 3)
+    assert len(clusters) == 2
+    assert merged["latitude"] == pytest.approx(145.0 / 3)
+    assert merged["valeur_fonciere_moyenne"] == pytest.approx(400.0 / 3)
+
+
+def test_snapshot_clusters(snapshot):
+    clusters = CostGuard(None).clusters((40.0, 50.0, 0.0, 10.0), None, None, snapshot)
+    assert sum(c["nb_ventes"] for c in clusters) == len(ROWS)
+    paris = next(c for c in clusters if c["nb_ventes"] == 2)
+    assert paris["valeur_fonciere_moyenne"] == pytest.approx(375000.0)
+
+
+def test_clusters_without_bbox(snapshot):
+    # Rectangle hors des bornes WGS84 (ex: Lambert-93 sans crs) : toute la table, grille par défaut
+    clusters = CostGuard(None).clusters(None, None, None, snapshot)
+    assert sum(c["nb_ventes"] for c in clusters) == len(ROWS)
+
+
+def test_ventes_endpoint_with_out_of_range_rectangle(snapshot, tmp_path, monkeypatch):
+    import app as app_module
+    from snapshot import SnapshotStore
+
+    monkeypatch.setattr(app_module, "snapshot_store", SnapshotStore(str(tmp_path)))
+    monkeypatch.setattr(app_module.data_reloader, "check", lambda: None)
+    monkeypatch.setattr(app_module.cost_guard, "detail_max_rows", 1)
+
+    client = app_module.app.test_client()
+    response = client.get("/api/v1/dvf/ventes", query_string={
+        "topLeft": "6865000,652000", "bottomRight": "6860000,655000"})
+    assert response.status_code == 200
+    assert response.headers[MODE_HEADER] == "cluster"
+    assert response.headers[ESTIMATE_HEADER] == str(len(ROWS))
+    assert sum(c["nb_ventes"] for c in response.get_json()["clusters"]) == len(ROWS)
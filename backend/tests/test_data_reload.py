@@ -0,0 +1,128 @@
+import threading
+import time
+
+import data_reload
+from data_reload import DataReloader
+
+
+class FakeRouter:
+    def __init__(self, version):
+        self.version = version
+
+    def import_version(self):
+        return self.version
+
+
+class FakeSearchIndex:
+    def __init__(self):
+        self.builds = 0
+
+    def build(self):
+        self.builds += 1
+
+
+class FakeCache:
+    def __init__(self):
+        self.clears = 0
+
+    def clear(self):
+        self.clears += 1
+
+
+def make_reloader(version=(1,)):
+    caches = [FakeCache(), FakeCache()]
+    reloader = DataReloader(FakeRouter(version), None, FakeSearchIndex(), caches, check_interval=0)
+    return reloader, caches
+
+
+def test_reload_clears_caches_when_the_version_changes():
+    reloader, caches = make_reloader()
+    reloader._run(False)
+    assert reloader.search_index.builds == 1
+    assert [c.clears for c in caches] == [1, 1]
+
+    status = reloader.status()
+    assert status["state"] == "idle"
+    assert status["reloads"] == 1
+    assert status["version"] == (1,)
+    assert not status["forced"]
+
+    # Même version : rien à faire, sauf rechargement forcé
+    reloader._run(False)
+    assert [c.clears for c in caches] == [1, 1]
+    reloader._run(True)
+    assert [c.clears for c in caches] == [2, 2]
+    assert reloader.status()["reloads"] == 2
+
+    reloader.router.version = (2,)
+    reloader._run(False)
+    assert [c.clears for c in caches] == [3, 3]
+    assert reloader.status()["version"] == (2,)
+
+
+def test_status_reports_resident_memory(monkeypatch):
+    # avant, début de l'échantillonnage, dernier échantillon, après
+    samples = iter([100.0, 100.0, 180.0, 120.0])
+    monkeypatch.setattr(data_reload, "_rss_mb", lambda: next(samples))
+    monkeypatch.setattr(data_reload, "RSS_SAMPLE_INTERVAL", 3600)
+    reloader, _ = make_reloader()
+    reloader._run(True)
+
+    status = reloader.status()
+    assert status["rss_before_mb"] == 100.0
+    assert status["rss_peak_mb"] == 180.0
+    assert status["rss_after_mb"] == 120.0
+
+
+def test_rss_sampler_keeps_the_maximum(monkeypatch):
+    samples = iter([100.0, 250.0, 120.0])
+    monkeypatch.setattr(data_reload, "_rss_mb", lambda: next(samples, 90.0))
+    sampler = data_reload._RssSampler(interval=3600)
+    sampler._sample()
+    sampler._sample()
+    assert sampler.stop() == 250.0
+
+
+def test_rss_is_read_from_proc():
+    rss = data_reload._rss_mb()
+    assert rss is None or rss > 0
+
+
+def test_failed_reload_keeps_the_previous_version():
+    reloader, caches = make_reloader()
+    reloader._run(False)
+
+    def build():
+        raise RuntimeError("base indisponible")
+    reloader.search_index.build = build
+    reloader.router.version = (2,)
+    reloader._run(False)
+
+    status = reloader.status()
+    assert status["state"] == "failed"
+    assert status["error"] == "base indisponible"
+    assert status["version"] == (1,)
+    assert [c.clears for c in caches] == [1, 1]
+    assert not reloader._running
+
+
+def test_reload_is_refused_while_running():
+    started = threading.Event()
+    release = threading.Event()
+    reloader, _ = make_reloader()
+
+    def build():
+        started.set()
+        release.wait(5)
+    reloader.search_index.build = build
+
+    assert reloader.reload()
+    assert started.wait(5)
+    assert not reloader.reload()
+    release.set()
+    for _ in range(500):
+        if not reloader._running:
+            break
+        time.sleep(0.01)
+    assert reloader.status()["reloads"] == 1
+    assert reloader.reload()
@@ -0,0 +1,21 @@
+import csv
+import io
+
+from export import EXPORT_COLUMNS, build_export_query, stream_csv
+from ventes_query import parse_bbox
+
+
+def test_export_query_from_map_corners():
+    # Coins tels qu'envoyés par la carte : nord-est puis sud-ouest
+    bbox = parse_bbox("48.9,2.4", "48.8,2.2")
+    query, params = build_export_query(bbox, None, None)
+    assert "latitude BETWEEN %s AND %s" in query
+    assert params == [48.8, 48.9, 2.2, 2.4]
+
+
+def test_stream_csv_header_then_batches():
+    row = ["2023-1"] + [None] * (len(EXPORT_COLUMNS) - 1)
+    content = b"".join(stream_csv([[row], [row]])).decode("utf-8")
+    lines = list(csv.reader(io.StringIO(content)))
+    assert lines[0] == EXPORT_COLUMNS
+    assert len(lines) == 3 and lines[1][0] == "2023-1"
@@ -0,0 +1,36 @@
+import numpy as np
+
+from hilbert import ORDER, hilbert_key
+
+
+def cell_centres(order):
+    """Latitude et longitude du centre de chaque cellule de la grille 2^order x 2^order."""
+    side = 1 << order
+    x, y = np.meshgrid(np.arange(side), np.arange(side), indexing="ij")
+    longitude = (x.ravel() + 0.5) / side * 360 - 180
+    latitude = (y.ravel() + 0.5) / side * 180 - 90
+    return latitude, longitude, x.ravel(), y.ravel()
+
+
+def test_bijection_between_cells_and_keys():
+    for order in (1, 2, 5):
+        latitude, longitude, _, _ = cell_centres(order)
+        keys = hilbert_key(latitude, longitude, order=order)
+        assert sorted(keys.tolist()) == list(range(1 << (2 * order)))
+
+
+def test_consecutive_keys_are_adjacent_cells():
+    latitude, longitude, x, y = cell_centres(5)
+    order = np.argsort(hilbert_key(latitude, longitude, order=5))
+    steps = np.abs(np.diff(x[order])) + np.abs(np.diff(y[order]))
+    assert (steps == 1).all()
+
+
+def test_full_order_keys():
+    keys = hilbert_key([-90.0, 48.8566, 90.0], [-180.0, 2.3522, 180.0])
+    assert keys.dtype == np.int64
+    assert keys.min() >= 0 and keys.max() < 1 << (2 * ORDER)
+    # Deux ventes à quelques mètres l'une de l'autre : clés proches
+    near = hilbert_key([48.85660, 48.85662], [2.35220, 2.35223])
+    far = hilbert_key([48.8566, 45.7640], [2.3522, 4.8357])
+    assert abs(int(near[1]) - int(near[0])) < abs(int(far[1]) - int(far[0]))
@@ -0,0 +1,30 @@
+import pandas as pd
+import pytest
+
+from import_dvf import partition_bounds, partition_name, shard_mask
+from shard_router import ShardRouter
+
+
+def test_partition_name():
+    assert partition_name(2024) == "dvf_maison_2024"
+
+
+def test_partition_bounds_cover_one_year():
+    assert partition_bounds(2023) == ("2023-01-01", "2024-01-01")
+
+
+def test_partition_bounds_are_contiguous():
+    assert partition_bounds(2022)[1] == partition_bounds(2023)[0]
+
+
+def test_shard_mask_keeps_the_shard_departements():
+    router = ShardRouter({"nord": {}, "sud": {}}, {"nord": ["59"], "sud": ["13"]}, default="nord")
+    codes = pd.Series(["59", "13", "29", None])
+    assert shard_mask(router, "nord", codes).tolist() == [True, False, True, True]
+    assert shard_mask(router, "sud", codes).tolist() == [False, True, False, False]
+
+
+def test_shard_mask_rejects_unmapped_departements_without_default():
+    router = ShardRouter({"nord": {}, "sud": {}}, {"nord": ["59"], "sud": ["13"]})
+    with pytest.raises(RuntimeError, match="29"):
+        shard_mask(router, "nord", pd.Series(["59", "29"]))
@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from lambert93 import A, E, X_0, Y_0, from_lambert93, to_lambert93
+
+
+def test_origin():
+    x, y = to_lambert93(46.5, 3.0)
+    assert x == pytest.approx(X_0, abs=1e-6)
+    assert y == pytest.approx(Y_0, abs=1e-6)
+
+
+def test_round_trip_over_metropolitan_france():
+    latitude, longitude = np.meshgrid(np.linspace(41.0, 51.5, 43), np.linspace(-5.5, 10.0, 63))
+    x, y = to_lambert93(latitude, longitude)
+    back_lat, back_lon = from_lambert93(x, y)
+    # 1e-8 degré ~ 1 mm
+    assert np.abs(back_lat - latitude).max() < 1e-8
+    assert np.abs(back_lon - longitude).max() < 1e-8
+
+
+@pytest.mark.parametrize("latitude", [44.0, 49.0])
+def test_scale_is_one_on_standard_parallels(latitude):
+    # Longueur projetée d'un petit arc de parallèle / longueur sur l'ellipsoïde
+    d_lon = 1e-4
+    x, y = to_lambert93([latitude, latitude], [3.0, 3.0 + d_lon])
+    projected = np.hypot(x[1] - x[0], y[1] - y[0])
+    phi = np.radians(latitude)
+    ellipsoid = A * np.cos(phi) / np.sqrt(1 - (E * np.sin(phi)) ** 2) * np.radians(d_lon)
+    assert projected / ellipsoid == pytest.approx(1.0, abs=1e-7)
+
+
+def test_axes_orientation():
+    x_west, _ = to_lambert93(46.5, 0.0)
+    _, y_north = to_lambert93(49.0, 3.0)
+    assert x_west < X_0 and y_north > Y_0
@@ -0,0 +1,141 @@
+import datetime
+
+import pytest
+
+from data_reload import DataReloader
+from parcelles import HISTORY_QUERY, ParcelHistory, departement_of
+from shard_router import EXTENTS_QUERY, ShardRouter
+from snapshot import Snapshot, SnapshotStore, write_snapshot
+from test_snapshot import make_frame
+
+
+def vente(id_mutation, id_parcelle, date):
+    return (id_mutation, 100000.0, datetime.date.fromisoformat(date), 48.85, 2.35,
+            None, None, None, None, id_parcelle, None)
+
+
+class FakeRouter:
+    """Routeur non partitionné qui renvoie, par ordre de date, les ventes des parcelles demandées."""
+
+    is_sharded = False
+    shards = {"default": None}
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.calls = []
+
+    def fetch_all(self, query, params=None, shard_names=None):
+        assert query == HISTORY_QUERY
+        self.calls.append(list(params[0]))
+        return sorted((r for r in self.rows if r[9] in params[0]), key=lambda r: r[2])
+
+    def import_version(self):
+        return (len(self.rows),)
+
+
+class FakeSearchIndex:
+    def build(self):
+        pass
+
+
+@pytest.fixture
+def snapshot(tmp_path):
+    frame = make_frame()
+    # La vente la plus récente de P1 est la plus au sud : l'ordre des lignes n'est pas celui des dates
+    frame.loc[0, "date_mutation"], frame.loc[2, "date_mutation"] = "2023-09-30", "2023-03-01"
+    return Snapshot(write_snapshot(frame, str(tmp_path), "v1"))
+
+
+def test_departement_of():
+    assert departement_of("01001000ZD0025") == "01"
+    assert departement_of("2A004000AB0001") == "2A"
+    assert departement_of("97411000AB0012") == "974"
+
+
+def test_snapshot_history_is_ordered_by_date(snapshot):
+    history = ParcelHistory(FakeRouter([]))
+    rows = history.get_many(["P1", "P3"], snapshot)
+    assert [(r[0], r[2]) for r in rows["P1"]] == [("2023-3", datetime.date(2023, 3, 1)),
+                                                  ("2023-1", datetime.date(2023, 9, 30))]
+    assert [r[0] for r in rows["P3"]] == ["2023-4"]
+
+
+def test_database_history_is_ordered_by_date():
+    router = FakeRouter([vente("b", "P1", "2022-05-01"), vente("a", "P1", "2019-02-01"),
+                         vente("c", "P2", "2020-01-01")])
+    rows = ParcelHistory(router).get_many(["P1"])
+    assert [r[0] for r in rows["P1"]] == ["a", "b"]
+
+
+def test_unknown_parcel(snapshot):
+    assert ParcelHistory(FakeRouter([])).get_many(["INCONNUE"], snapshot) == {"INCONNUE": []}
+    assert ParcelHistory(FakeRouter([vente("a", "P1", "2019-02-01")])).get_many(["INCONNUE"]) == {"INCONNUE": []}
+
+
+def test_cache_and_eviction():
+    router = FakeRouter([vente("a", "P1", "2019-02-01"), vente("b", "P2", "2020-01-01")])
+    history = ParcelHistory(router, max_entries=1)
+    history.get_many(["P1"])
+    history.get_many(["P1"])
+    assert router.calls == [["P1"]]
+    history.get_many(["P2", "P1"])
+    assert router.calls == [["P1"], ["P2"]]
+    # P1 a été évincée au profit de P2
+    history.get_many(["P1"])
+    assert router.calls == [["P1"], ["P2"], ["P1"]]
+
+
+def test_reload_invalidates_the_cache():
+    router = FakeRouter([vente("a", "P1", "2019-02-01")])
+    history = ParcelHistory(router)
+    reloader = DataReloader(router, None, FakeSearchIndex(), [history])
+    reloader._run(False)
+    assert [r[0] for r in history.get_many(["P1"])["P1"]] == ["a"]
+
+    # Nouvel import : la version change, l'historique est relu
+    router.rows.append(vente("b", "P1", "2024-06-01"))
+    assert [r[0] for r in history.get_many(["P1"])["P1"]] == ["a"]
+    reloader._run(False)
+    assert [r[0] for r in history.get_many(["P1"])["P1"]] == ["a", "b"]
+
+
+def test_only_the_parcel_shards_are_queried():
+    router = ShardRouter({"nord": {}, "sud": {}}, {"nord": ["59"], "sud": ["13"]})
+    extents = {"nord": [("59", 50.0, 51.0, 2.0, 4.0)],
+               "sud": [("13", 43.0, 44.0, 4.0, 6.0), ("83", 43.0, 44.0, 6.0, 7.0)]}
+    queried = []
+
+    def fetch(shard_name, query, params):
+        if query == EXTENTS_QUERY:
+            return extents[shard_name]
+        queried.append(shard_name)
+        return []
+
+    router.fetch = fetch
+    history = ParcelHistory(router)
+    history.get_many(["13001000AB0001", "83001000AB0001"])
+    assert queried == ["sud"]
+    # Département inconnu : tous les shards
+    history.get_many(["01001000AB0001"])
+    assert queried == ["sud", "nord", "sud"]
+
+
+def test_history_endpoint(snapshot, tmp_path, monkeypatch):
+    import app as app_module
+
+    monkeypatch.setattr(app_module, "snapshot_store", SnapshotStore(str(tmp_path)))
+    monkeypatch.setattr(app_module, "parcel_history", ParcelHistory(FakeRouter([])))
+    monkeypatch.setattr(app_module.data_reloader, "check", lambda: None)
+    client = app_module.app.test_client()
+
+    response = client.get("/api/v1/dvf/parcelles/p1/history")
+    assert response.status_code == 200
+    assert [v["id_mutation"] for v in response.get_json()["ventes"]] == ["2023-3", "2023-1"]
+
+    response = client.get("/api/v1/dvf/parcelles/INCONNUE/history")
+    assert response.status_code == 404
+
+    response = client.post("/api/v1/dvf/parcelles/history", json={"ids": ["P3", "INCONNUE"]})
+    assert response.status_code == 200
+    assert {k: len(v) for k, v in response.get_json().items()} == {"P3": 1, "INCONNUE": 0}
+    assert client.post("/api/v1/dvf/parcelles/history", json={"ids": "P3"}).status_code == 400
@@ -0,0 +1,66 @@
+from search_index import COMMUNES_QUERY, SearchIndex, normalize
+
+
+class FakeRouter:
+    """Routeur renvoyant des lignes fixes pour les requêtes communes et voies."""
+
+    def __init__(self, communes, voies):
+        self.communes = communes
+        self.voies = voies
+
+    def import_version(self):
+        return 1
+
+    def fetch_all(self, query, params=None, shards=None):
+        return self.communes if query == COMMUNES_QUERY else self.voies
+
+
+def make_index():
+    router = FakeRouter(
+        communes=[
+            ("SAINT-GENIS-POUILLY", "01630", 46.24, 6.02, 120),
+            ("POUILLY-EN-AUXOIS", "21320", 47.26, 4.55, 40),
+            ("ÉVIAN-LES-BAINS", "74500", 46.40, 6.59, 80),
+        ],
+        voies=[
+            ("ALL DES HETRES", "SAINT-GENIS-POUILLY", "01630", 46.25, 6.03, 12),
+        ],
+    )
+    return SearchIndex(router, check_interval=None)
+
+
+def test_normalize():
+    assert normalize("Saint-Genis-Pouilly") == "SAINT GENIS POUILLY"
+    assert normalize("  Évian-les-Bains ") == "EVIAN LES BAINS"
+    assert normalize("L'Haÿ-les-Roses") == "L HAY LES ROSES"
+
+
+def test_search_by_prefix_ignores_accents():
+    results = make_index().search("evian")
+    assert [r["label"] for r in results] == ["ÉVIAN-LES-BAINS (74500)"]
+
+
+def test_search_ranks_label_start_first():
+    labels = [r["label"] for r in make_index().search("pouil")]
+    assert labels == ["POUILLY-EN-AUXOIS (21320)", "SAINT-GENIS-POUILLY (01630)"]
+
+
+def test_search_ranks_exact_key_first():
+    labels = [r["label"] for r in make_index().search("pouilly")]
+    assert labels[0] == "SAINT-GENIS-POUILLY (01630)"
+
+
+def test_search_by_word_inside_label_and_postcode():
+    assert make_index().search("hetres")[0]["type"] == "voie"
+    assert make_index().search("0163")[0]["nom_commune"] == "SAINT-GENIS-POUILLY"
+
+
+def test_search_with_house_number_keeps_only_voies():
+    results = make_index().search("12 all des")
+    assert len(results) == 1
+    assert results[0]["adresse_numero"] == "12"
+    assert results[0]["label"].startswith("12 ALL DES HETRES")
+
+
+def test_search_limit():
+    assert len(make_index().search("p", limit=1)) == 1
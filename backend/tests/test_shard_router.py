@@ -0,0 +1,162 @@
+import datetime
+import json
+
+from shard_router import EXTENTS_QUERY, YEARS_QUERY, ShardRouter
+from ventes_query import sample_level
+
+SHARDS = {"nord": {"port": 5433}, "sud": {"port": 5434}}
+DEPARTEMENTS = {"nord": ["59", "75"], "sud": ["13"]}
+EXTENTS = {
+    # shard -> (code_departement, lat_min, lat_max, lon_min, lon_max)
+    "nord": [("59", 50.0, 51.1, 2.0, 4.3), ("75", 48.8, 48.9, 2.2, 2.5), ("29", 47.7, 48.8, -5.2, -3.4)],
+    "sud": [("13", 43.1, 43.9, 4.2, 5.8)],
+}
+
+
+def make_router(rows_by_shard=None, default=None):
+    """Routeur dont chaque shard renvoie les emprises d'EXTENTS, puis les lignes données."""
+    router = ShardRouter(SHARDS, DEPARTEMENTS, default)
+
+    def fetch(shard_name, query, params):
+        if query == EXTENTS_QUERY:
+            return EXTENTS[shard_name]
+        return rows_by_shard[shard_name]
+
+    router.fetch = fetch
+    return router
+
+
+def vente(id_mutation, valeur, jour):
+    return (id_mutation, valeur, datetime.date(2023, 1, jour), 0.0, 0.0, None, None, None, None, None, None)
+
+
+def test_shards_for_bbox_follows_departement_extents():
+    router = make_router()
+    assert router.shards_for_bbox((48.85, 48.86, 2.3, 2.4)) == ["nord"]
+    assert router.shards_for_bbox((43.2, 43.3, 5.3, 5.4)) == ["sud"]
+    assert router.shards_for_bbox((43.0, 51.0, 2.0, 5.0)) == ["nord", "sud"]
+    assert router.shards_for_bbox((0.0, 1.0, 0.0, 1.0)) == []
+    assert router.shards_for_bbox(None) == ["nord", "sud"]
+
+
+def test_unlisted_departement_is_served_by_the_shard_holding_it():
+    router = make_router()
+    assert router.shard_for_departement("29") is None
+    assert router.shards_for_bbox((48.0, 48.5, -4.5, -4.0)) == ["nord"]
+    assert router.shard_for_departement("29") == "nord"
+
+
+def test_default_shard():
+    router = make_router(default="sud")
+    assert router.shard_for_departement("13") == "sud"
+    assert router.shard_for_departement("59") == "nord"
+    assert router.shard_for_departement("971") == "sud"
+
+
+def test_from_env_reads_default(tmp_path, monkeypatch):
+    path = tmp_path / "shards.json"
+    path.write_text(json.dumps({"shards": SHARDS, "departements": DEPARTEMENTS, "default": "nord"}))
+    monkeypatch.setenv("DVF_SHARDS_FILE", str(path))
+    router = ShardRouter.from_env()
+    assert router.is_sharded and router.default_shard == "nord"
+
+
+def test_fetch_ventes_merges_shards_in_order_with_offset_and_limit():
+    router = make_router({
+        "nord": [vente("n1", 900.0, 5), vente("n2", 500.0, 1), vente("n3", 100.0, 9)],
+        "sud": [vente("s1", 700.0, 3), vente("s2", 300.0, 7)],
+    })
+    rows = router.fetch_ventes((43.0, 51.0, 2.0, 5.0), None, None, limit=3, offset=1)
+    assert [r[0] for r in rows] == ["s1", "n2", "s2"]
+
+
+def test_fetch_ventes_merges_on_the_sort_column():
+    # Chaque shard renvoie ses lignes dans l'ordre de la requête : ici par date croissante
+    router = make_router({
+        "nord": [vente("n2", 500.0, 1), vente("n1", 900.0, 5)],
+        "sud": [vente("s1", 700.0, 3)],
+    })
+    rows = router.fetch_ventes((43.0, 51.0, 2.0, 5.0), None, None, limit=2, offset=0, sort="date_asc")
+    assert [r[0] for r in rows] == ["n2", "s1"]
+
+
+def test_fetch_ventes_asks_each_shard_for_limit_plus_offset():
+    router = make_router()
+    seen = []
+
+    def fetch(shard_name, query, params):
+        if query == EXTENTS_QUERY:
+            return EXTENTS[shard_name]
+        seen.append(params[-2:])
+        return []
+
+    router.fetch = fetch
+    router.fetch_ventes((43.0, 51.0, 2.0, 5.0), None, None, limit=20, offset=40)
+    assert seen == [[60, 0], [60, 0]]
+
+
+def test_single_shard_keeps_sql_pagination():
+    router = make_router()
+    seen = []
+
+    def fetch(shard_name, query, params):
+        if query == EXTENTS_QUERY:
+            return EXTENTS[shard_name]
+        seen.append((shard_name, params[-2:]))
+        return []
+
+    router.fetch = fetch
+    router.fetch_ventes((48.85, 48.86, 2.3, 2.4), None, None, limit=20, offset=40)
+    assert seen == [("nord", [20, 40])]
+
+
+def test_no_shard_for_bbox_returns_no_rows():
+    assert make_router().fetch_ventes((0.0, 1.0, 0.0, 1.0), None, None, 10, 0) == []
+
+
+
+def test_sample_mode_scales_level_with_years_loaded():
+    router = make_router()
+    seen = []
+
+    def fetch(shard_name, query, params):
+        if query == EXTENTS_QUERY:
+            return EXTENTS[shard_name]
+        if query == YEARS_QUERY:
+            return [({"nord": 4, "sud": 5}[shard_name],)]
+        seen.append(params[4])
+        return []
+
+    router.fetch = fetch
+    bbox = (48.85, 48.86, 2.3, 2.4)
+    router.fetch_ventes(bbox, None, None, 10, 0, mode="sample")
+    router.fetch_ventes(bbox, None, "2023-01-01,2023-12-31", 10, 0, mode="sample")
+    assert router.data_years() == 5
+    assert seen == [sample_level(bbox, 5), sample_level(bbox)]
+
+
+def test_clear_forgets_extents_years_and_discovered_departements():
+    router = ShardRouter(SHARDS, DEPARTEMENTS)
+    extents = dict(EXTENTS)
+    years = {"nord": 2, "sud": 2}
+
+    def fetch(shard_name, query, params):
+        if query == YEARS_QUERY:
+            return [(years[shard_name],)]
+        return extents[shard_name]
+
+    router.fetch = fetch
+    router.departement_extents()
+    assert router.data_years() == 2
+    assert router.shard_for_departement("29") == "nord"
+
+    # Nouvel import : le Finistère passe au sud, une année de plus
+    extents = {"nord": EXTENTS["nord"][:2], "sud": EXTENTS["sud"] + [EXTENTS["nord"][2]]}
+    years = {"nord": 3, "sud": 3}
+    assert router.data_years() == 2
+    router.clear()
+    assert router.shard_for_departement("29") is None
+    assert router.shard_for_departement("75") == "nord"
+    assert router.data_years() == 3
+    assert router.shards_for_bbox((48.0, 48.5, -4.5, -4.0)) == ["sud"]
+    assert router.shard_for_departement("29") == "sud"
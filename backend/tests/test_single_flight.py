@@ -0,0 +1,72 @@
+import threading
+
+import pytest
+
+from single_flight import SingleFlight
+
+
+def run_concurrently(flight, key, fn, callers):
+    """Lance callers appels de même clé pendant que le premier est bloqué dans fn."""
+    outcomes = [None] * callers
+    started = threading.Event()
+    release = threading.Event()
+
+    def blocking():
+        started.set()
+        release.wait(5)
+        return fn()
+
+    def call(i):
+        try:
+            outcomes[i] = flight.do(key, blocking)
+        except Exception as e:
+            outcomes[i] = e
+
+    leader = threading.Thread(target=call, args=(0,))
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=call, args=(i,)) for i in range(1, callers)]
+    for t in followers:
+        t.start()
+    # Les suivants sont enregistrés avant la fin du premier appel
+    while flight.stats()["coalesced"] < callers - 1:
+        pass
+    release.set()
+    for t in [leader] + followers:
+        t.join(5)
+    return outcomes
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    calls = []
+    outcomes = run_concurrently(flight, "k", lambda: calls.append(1) or "rows", callers=5)
+    assert calls == [1]
+    assert outcomes[0] == ("rows", False)
+    assert outcomes[1:] == [("rows", True)] * 4
+    assert flight.stats() == {"executed": 1, "coalesced": 4, "in_flight": 0}
+
+
+def test_error_is_raised_to_every_caller():
+    flight = SingleFlight()
+
+    def fail():
+        raise RuntimeError("base indisponible")
+
+    outcomes = run_concurrently(flight, "k", fail, callers=3)
+    assert all(isinstance(o, RuntimeError) for o in outcomes)
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_no_caching_after_completion():
+    flight = SingleFlight()
+    assert flight.do("k", lambda: 1) == (1, False)
+    assert flight.do("k", lambda: 2) == (2, False)
+    assert flight.stats()["executed"] == 2
+
+
+def test_different_keys_run_separately():
+    flight = SingleFlight()
+    with pytest.raises(ValueError):
+        flight.do("a", lambda: int("x"))
+    assert flight.do("b", lambda: "ok") == ("ok", False)
@@ -0,0 +1,177 @@
+import datetime
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ventes_query import sample_level
+import snapshot as snapshot_module
+from snapshot import (ALIGN, CURRENT_FILE, FORMAT_VERSION, MAGIC, PREAMBLE, Snapshot, SnapshotStore,
+                      current_data_version, prune_snapshots, write_snapshot)
+
+ROWS = [
+    # id_mutation, date, valeur, lat, lon, commune, parcelle, surface, niveau
+    ("2023-1", "2023-03-01", 300000.0, 48.85, 2.35, "PARIS", "P1", 200.0, 0),
+    ("2023-2", "2023-06-15", 150000.0, 45.76, 4.83, "LYON", "P2", None, 3),
+    ("2023-3", "2023-09-30", 450000.0, 48.86, 2.34, "PARIS", "P1", 500.0, 5),
+    ("2023-4", "2023-12-31", 90000.0, 43.30, 5.37, "MARSEILLE", "P3", 80.0, 13),
+]
+
+
+def make_frame():
+    frame = pd.DataFrame(ROWS, columns=["id_mutation", "date_mutation", "valeur_fonciere", "latitude", "longitude",
+                                        "nom_commune", "id_parcelle", "surface_terrain", "niveau_echantillon"])
+    frame["rang_aleatoire"] = [0.4, 0.1, 0.3, 0.2]
+    frame["x_lambert93"] = 0.0
+    frame["y_lambert93"] = 0.0
+    frame["adresse_numero"] = ["1", "", "3", "4"]
+    frame["adresse_nom_voie"] = "RUE X"
+    frame["code_postal"] = "75001"
+    frame["code_commune"] = "75101"
+    return frame
+
+
+@pytest.fixture
+def snapshot_path(tmp_path):
+    return write_snapshot(make_frame(), str(tmp_path), "v1", data_version=[7])
+
+
+def test_file_layout(snapshot_path):
+    with open(snapshot_path, "rb") as f:
+        content = f.read()
+    magic, header_length = PREAMBLE.unpack_from(content, 0)
+    assert magic == MAGIC
+    header = json.loads(content[PREAMBLE.size:PREAMBLE.size + header_length])
+    assert header["format"] == FORMAT_VERSION
+    assert header["rows"] == len(ROWS)
+    assert header["data_version"] == [7]
+
+    data_start = -(-(PREAMBLE.size + header_length) // ALIGN) * ALIGN
+    for name, block in header["blocks"].items():
+        assert block["offset"] % ALIGN == 0, name
+        end = data_start + block["offset"] + block["length"] * np.dtype(block["dtype"]).itemsize
+        assert end <= len(content), name
+
+
+def test_current_points_to_new_snapshot(snapshot_path, tmp_path):
+    with open(tmp_path / CURRENT_FILE, encoding="utf-8") as f:
+        assert f.read() == os.path.basename(snapshot_path)
+    assert current_data_version(str(tmp_path)) == [7]
+    assert not any(name.endswith(".tmp") for name in os.listdir(tmp_path))
+
+
+def test_rows_sorted_by_latitude_and_strings_round_trip(snapshot_path):
+    snapshot = Snapshot(snapshot_path)
+    assert list(snapshot.arrays["latitude"]) == sorted(r[3] for r in ROWS)
+    ids = {snapshot.string("id_mutation", i) for i in range(snapshot.rows)}
+    assert ids == {r[0] for r in ROWS}
+    # Chaîne vide -> NULL
+    row = next(i for i in range(snapshot.rows) if snapshot.string("id_mutation", i) == "2023-2")
+    assert snapshot.string("adresse_numero", row) is None
+    snapshot.close()
+
+
+def test_lookup_and_find(snapshot_path):
+    snapshot = Snapshot(snapshot_path)
+    assert snapshot.lookup("nom_commune", "LYON") is not None
+    assert snapshot.lookup("nom_commune", "NANTES") is None
+    rows = snapshot.find("id_parcelle", "P1")
+    assert sorted(snapshot.string("id_mutation", i) for i in rows) == ["2023-1", "2023-3"]
+    assert len(snapshot.find("id_parcelle", "P9")) == 0
+
+
+def test_select_filters(snapshot_path):
+    snapshot = Snapshot(snapshot_path)
+
+    def ids(selected):
+        return sorted(snapshot.string("id_mutation", i) for i in selected)
+
+    paris = (48.8, 48.9, 2.3, 2.4)
+    assert ids(snapshot.select(paris)) == ["2023-1", "2023-3"]
+    assert ids(snapshot.select(paris, price_param="200000,350000")) == ["2023-1"]
+    assert ids(snapshot.select(None, date_param="2023-06-15,2023-12-31")) == ["2023-2", "2023-3", "2023-4"]
+
+
+def test_query_ventes_top_and_sample(snapshot_path):
+    snapshot = Snapshot(snapshot_path)
+    rows = snapshot.query_ventes(None, None, None, limit=2, offset=1)
+    assert [r[1] for r in rows] == [300000.0, 150000.0]
+    assert rows[0][2] == datetime.date(2023, 3, 1)
+
+    # Tri par surface : les ventes sans surface sont écartées
+    rows = snapshot.query_ventes(None, None, None, limit=10, offset=0, sort="surface_asc")
+    assert [r[10] for r in rows] == [80.0, 200.0, 500.0]
+
+    # Échantillon de niveau 0 sur toute la table, trié par rang aléatoire
+    rows = snapshot.query_ventes(None, None, None, limit=10, offset=0, mode="sample")
+    assert [r[0] for r in rows] == ["2023-1"]
+    assert len(rows[0]) == 12
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "other.bin"
+    path.write_bytes(PREAMBLE.pack(b"NOTASNAP", 2) + b"{}")
+    with pytest.raises(ValueError):
+        Snapshot(str(path))
+
+
+def test_store_switches_and_keeps_leased_snapshot_open(tmp_path):
+    directory = str(tmp_path)
+    write_snapshot(make_frame(), directory, "v1")
+    store = SnapshotStore(directory, check_interval=3600)
+    with store.acquire() as first:
+        assert first.version == "v1"
+        write_snapshot(make_frame().head(2), directory, "v2")
+        assert store.refresh().version == "v2"
+        # L'ancien instantané reste lisible tant que la requête le détient
+        assert first.retired and first.rows == len(ROWS)
+        assert len(first.arrays["latitude"]) == len(ROWS)
+    assert first.arrays == {}
+
+
+def test_prune_keeps_latest(tmp_path):
+    directory = str(tmp_path)
+    for version in ("v1", "v2", "v3"):
+        write_snapshot(make_frame(), directory, version)
+    prune_snapshots(directory, keep=2)
+    assert sorted(n for n in os.listdir(directory) if n.endswith(".bin")) == [
+        "dvf_snapshot_v2.bin", "dvf_snapshot_v3.bin"]
+
+
+def test_sample_level_follows_years_covered(tmp_path):
+    frame = make_frame()
+    frame.loc[1, "date_mutation"] = "2019-06-15"
+    frame.loc[2, "niveau_echantillon"] = 6
+    snapshot = Snapshot(write_snapshot(frame, str(tmp_path), "v1"))
+    assert snapshot.data_years() == 5
+
+    paris = (48.8, 48.9, 2.3, 2.4)
+    assert (sample_level(paris), sample_level(paris, 5)) == (7, 5)
+    # Sur les 5 années chargées, la grille est plus grossière : la vente de niveau 6 n'en fait plus partie
+    rows = snapshot.query_ventes(paris, None, None, limit=10, offset=0, mode="sample")
+    assert [r[0] for r in rows] == ["2023-1"]
+    rows = snapshot.query_ventes(paris, None, "2023-01-01,2023-12-31", limit=10, offset=0, mode="sample")
+    assert sorted(r[0] for r in rows) == ["2023-1", "2023-3"]
+
+
+def test_string_cache_is_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshot_module, "STRING_CACHE_SIZE", 8)
+    count = 100
+    frame = pd.concat([make_frame()] * (count // len(ROWS)), ignore_index=True)
+    frame["id_mutation"] = [f"2023-{i}" for i in range(count)]
+    frame["nom_commune"] = [f"COMMUNE {i}" for i in range(count)]
+    snapshot = Snapshot(write_snapshot(frame, str(tmp_path), "v1"))
+
+    for _ in range(2):
+        assert sorted(snapshot.row(i)[8] for i in range(count)) == sorted(frame["nom_commune"])
+    info = snapshot._decoders["nom_commune"].cache_info()
+    assert info.currsize == 8
+    assert info.misses == 2 * count
+    # Valeurs répétées : servies par le cache
+    assert snapshot._decoders["adresse_nom_voie"].cache_info().currsize == 1
+    assert snapshot._decoders["adresse_nom_voie"].cache_info().hits == 2 * count - 1
+    # Identifiants : jamais gardés
+    assert "id_mutation" not in snapshot._decoders
+    snapshot.close()
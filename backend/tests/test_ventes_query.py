@@ -0,0 +1,61 @@
+import pytest
+
+from ventes_query import build_filters, build_ventes_query, parse_bbox, sample_level, sample_years
+
+
+def test_parse_bbox():
+    assert parse_bbox("48.9,2.2", "48.8,2.4") == (48.8, 48.9, 2.2, 2.4)
+
+
+def test_parse_bbox_orders_corners():
+    # La carte envoie topLeft = coin nord-est, bottomRight = coin sud-ouest
+    assert parse_bbox("48.9,2.4", "48.8,2.2") == (48.8, 48.9, 2.2, 2.4)
+
+
+def test_parse_bbox_invalid():
+    with pytest.raises((ValueError, IndexError)):
+        parse_bbox("48.9", "48.8,2.4")
+
+
+def test_date_filter_compares_partition_key_directly():
+    where, params = build_filters(None, date_param="2023-01-01,2023-12-31")
+    assert where == "date_mutation BETWEEN %s::date AND %s::date"
+    assert params == ["2023-01-01", "2023-12-31"]
+
+
+def test_build_ventes_query_params_order():
+    bbox = (48.8, 48.9, 2.2, 2.4)
+    query, params = build_ventes_query(bbox, "100000,200000", None, 500, 0)
+    assert "FROM dvf_maison" in query
+    assert "ORDER BY valeur_fonciere DESC" in query
+    assert params == [48.8, 48.9, 2.2, 2.4, 100000.0, 200000.0, 500, 0]
+
+
+def test_sample_level_condition_matches_index_type():
+    bbox = (45.0, 49.0, 0.0, 4.0)
+    query, params = build_ventes_query(bbox, None, None, 500, 0, mode="sample")
+    assert "niveau_echantillon <= %s::smallint" in query
+    assert params[:5] == [0.0, 45.0, 4.0, 49.0, sample_level(bbox)]
+
+
+def test_sample_level_shrinks_with_zone():
+    assert sample_level((45.0, 49.0, 0.0, 4.0)) == 2
+    assert sample_level((48.8, 48.9, 2.3, 2.4)) > sample_level((45.0, 49.0, 0.0, 4.0))
+
+
+def test_sample_years_from_date_range():
+    assert sample_years(None, 6) == 6
+    assert sample_years("2020-01-01,2022-06-30", 6) == 3
+    assert sample_years("2015-01-01,2024-12-31", 6) == 6
+    assert sample_years("2023-05-01,2023-05-31", 0) == 1
+
+
+def test_sample_level_coarser_for_several_years():
+    # Chaque année apporte jusqu'à SAMPLE_PER_CELL ventes par cellule : une grille 2x plus
+    # grossière (4x moins de cellules) par facteur 4 d'années garde la même densité
+    bbox = (48.0, 48.5, 2.0, 2.5)
+    level = sample_level(bbox)
+    assert [sample_level(bbox, years) for years in (1, 2, 4, 5, 16, 17)] == [
+        level, level - 1, level - 1, level - 2, level - 2, level - 3]
+    query, params = build_ventes_query(bbox, None, None, 500, 0, mode="sample", years=5)
+    assert params[4] == level - 2
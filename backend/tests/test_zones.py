@@ -0,0 +1,136 @@
+import json
+
+import numpy as np
+import pytest
+
+from lambert93 import from_lambert93
+from zones import MAX_VERTICES, CommuneZones, Lambert93Zone, parse_polygon
+
+SQUARE = [[0, 0], [10, 0], [10, 10], [0, 10], [0, 0]]
+HOLE = [[4, 4], [6, 4], [6, 6], [4, 6], [4, 4]]
+FAR_SQUARE = [[20, 20], [22, 20], [22, 22], [20, 22], [20, 20]]
+
+
+def polygon(*rings):
+    return json.dumps({"type": "Polygon", "coordinates": list(rings)})
+
+
+def inside(zone, points):
+    """points : [(longitude, latitude), ...]"""
+    points = np.asarray(points, dtype=float)
+    return zone.contains(points[:, 1], points[:, 0]).tolist()
+
+
+def test_polygon_contains_and_bbox():
+    zone = parse_polygon(polygon(SQUARE))
+    assert zone.bbox == (0.0, 10.0, 0.0, 10.0)
+    assert inside(zone, [(5, 5), (0.5, 9.5), (-1, 5), (5, 11), (15, 5)]) == [True, True, False, False, False]
+
+
+def test_hole_is_excluded():
+    zone = parse_polygon(polygon(SQUARE, HOLE))
+    assert inside(zone, [(5, 5), (2, 2), (4.5, 7)]) == [False, True, True]
+
+
+def test_multipolygon_and_feature():
+    geojson = json.dumps({"type": "Feature", "properties": {}, "geometry": {
+        "type": "MultiPolygon", "coordinates": [[SQUARE, HOLE], [FAR_SQUARE]]}})
+    zone = parse_polygon(geojson)
+    assert zone.bbox == (0.0, 22.0, 0.0, 22.0)
+    assert inside(zone, [(21, 21), (5, 5), (2, 2), (15, 15)]) == [True, False, True, False]
+
+
+def test_unclosed_ring_is_closed():
+    zone = parse_polygon(polygon(SQUARE[:-1]))
+    assert inside(zone, [(5, 5), (11, 5)]) == [True, False]
+
+
+def test_concave_polygon():
+    # Forme en U : l'échancrure n'en fait pas partie
+    u_shape = [[0, 0], [9, 0], [9, 9], [6, 9], [6, 3], [3, 3], [3, 9], [0, 9], [0, 0]]
+    zone = parse_polygon(polygon(u_shape))
+    assert inside(zone, [(1.5, 6), (4.5, 6), (7.5, 6), (4.5, 1.5)]) == [True, False, True, True]
+
+
+def test_sql_filter():
+    clause, params = parse_polygon(polygon(SQUARE)).sql_filter()
+    assert clause == "point(longitude, latitude) <@ %s::polygon"
+    assert params == ["((0.0,0.0),(10.0,0.0),(10.0,10.0),(0.0,10.0),(0.0,0.0))"]
+
+    clause, params = parse_polygon(polygon(SQUARE, HOLE)).sql_filter()
+    assert clause == ("((point(longitude, latitude) <@ %s::polygon)::int + "
+                      "(point(longitude, latitude) <@ %s::polygon)::int) %% 2 = 1")
+    assert len(params) == 2
+
+
+@pytest.mark.parametrize("geojson", [
+    "pas du json",
+    "[1, 2]",
+    json.dumps({"type": "Point", "coordinates": [1, 2]}),
+    json.dumps({"type": "Polygon", "coordinates": []}),
+    json.dumps({"type": "Polygon", "coordinates": [[[0, 0], [1, 1]]]}),
+    json.dumps({"type": "Polygon", "coordinates": [[[0, 0], [1, "x"], [1, 1]]]}),
+    json.dumps({"type": "Polygon", "coordinates": [[[0, 0], [1, float("nan")], [1, 1]]]}),
+    json.dumps({"type": "Polygon", "coordinates": [[[i, i % 2] for i in range(MAX_VERTICES + 1)]]}),
+])
+def test_invalid_polygons(geojson):
+    with pytest.raises(ValueError):
+        parse_polygon(geojson)
+
+
+def test_invalid_polygon_is_a_bad_request(monkeypatch):
+    import app as app_module
+
+    monkeypatch.setattr(app_module.data_reloader, "check", lambda: None)
+    response = app_module.app.test_client().get("/api/v1/dvf/ventes", query_string={
+        "polygon": json.dumps({"type": "LineString", "coordinates": [[0, 0], [1, 1]]})})
+    assert response.status_code == 400
+    assert response.get_json()["error"].startswith("Polygone invalide")
+
+
+class FakeRouter:
+    def __init__(self, rows):
+        self.rows = rows
+        self.calls = 0
+
+    def fetch_all(self, query, params=None, shard_names=None):
+        self.calls += 1
+        return self.rows
+
+
+def test_commune_zone_extent_is_cached_and_cleared():
+    router = FakeRouter([(45.0, 45.2, 4.0, 4.3), (45.1, 45.3, 3.9, 4.1)])
+    communes = CommuneZones(router)
+    zone = communes.get("69123")
+    assert zone.bbox == (45.0, 45.3, 3.9, 4.3)
+    assert zone.sql_filter() == ("code_commune = %s", ["69123"])
+    communes.get("69123")
+    assert router.calls == 1
+    communes.clear()
+    communes.get("69123")
+    assert router.calls == 2
+
+
+def test_unknown_commune():
+    assert CommuneZones(FakeRouter([(None, None, None, None)])).get("00000") is None
+
+
+@pytest.mark.parametrize("bounds", [
+    (6860000.0, 6870000.0, 645000.0, 660000.0),      # Paris
+    (6200000.0, 6900000.0, 600000.0, 800000.0),      # traverse le méridien central (x = 700 km)
+    (6700000.0, 6800000.0, 100000.0, 300000.0),      # Bretagne
+    (6100000.0, 6300000.0, 1000000.0, 1200000.0),    # Alpes-Maritimes / Corse
+])
+def test_lambert93_bbox_bounds_the_rectangle(bounds):
+    y_min, y_max, x_min, x_max = bounds
+    zone = Lambert93Zone(*bounds)
+
+    # Échantillonnage dense de tout le rectangle
+    x, y = np.meshgrid(np.linspace(x_min, x_max, 201), np.linspace(y_min, y_max, 201))
+    latitude, longitude = from_lambert93(x.ravel(), y.ravel())
+    lat_min, lat_max, lon_min, lon_max = zone.bbox
+    assert lat_min <= latitude.min() and latitude.max() <= lat_max
+    assert lon_min <= longitude.min() and longitude.max() <= lon_max
+    # ... sans marge superflue
+    assert latitude.min() - lat_min < 1e-5 and lat_max - latitude.max() < 1e-5
+    assert longitude.min() - lon_min < 1e-5 and lon_max - longitude.max() < 1e-5
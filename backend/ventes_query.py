@@ -0,0 +1,220 @@
+"""
+Construction de la requête SQL des ventes DVF (maisons).
+
+La requête lit la table partitionnée dvf_maison (voir sql/001_dvf_maison_partitions.sql).
+Les bornes de date sont comparées directement à la clé de partition date_mutation,
+sans fonction autour de la colonne : PostgreSQL peut ainsi écarter dès la
+planification les partitions (années) hors de la plage demandée.
+
+Deux modes de sélection :
+- "top" : les ventes les plus chères de la zone (tri sur valeur_fonciere)
+- "sample" : un échantillon réparti sur la zone, au plus SAMPLE_PER_CELL ventes par
+  cellule d'une grille adaptée à la taille de la zone. Le niveau de grille de chaque
+  vente est précalculé à l'import (niveau_echantillon, voir import_dvf.py) et indexé
+  avec sa position (GiST) : le coût dépend du nombre de lignes renvoyées, pas du
+  nombre de ventes de la zone.
+  Le niveau est calculé par année (partition) : chaque année apporte jusqu'à
+  SAMPLE_PER_CELL ventes par cellule. Pour garder la même densité quelle que soit
+  la plage de dates, la grille est divisée par deux en largeur (cellules 4 fois plus
+  grandes) pour chaque facteur 4 du nombre d'années couvertes (sample_years).
+
+En mode "top", le paramètre sort choisit le tri (prix, date ou surface, croissant ou
+décroissant). Chaque tri est servi par un index B-tree sur sa colonne : PostgreSQL
+lit les ventes dans l'ordre de l'index et s'arrête à la limite, sans trier toute la
+zone.
+"""
+import math
+
+VENTES_TABLE = "dvf_maison"
+
+VENTES_COLUMNS = """id_mutation, valeur_fonciere, date_mutation, latitude, longitude,
+       adresse_numero, adresse_nom_voie, code_postal, nom_commune, id_parcelle, surface_terrain"""
+
+# Grille d'échantillonnage : cellules de SAMPLE_BASE_CELL degrés au niveau 0,
+# divisées par deux à chaque niveau jusqu'à SAMPLE_LEVELS (~50 m)
+SAMPLE_BASE_CELL = 2.0
+SAMPLE_LEVELS = 12
+SAMPLE_PER_CELL = 4
+# Nombre de cellules visées sur la plus grande dimension de la zone
+SAMPLE_GRID = 8
+
+# Par mode : tri SQL, colonne de la ligne utilisée pour fusionner les shards, tri décroissant
+ORDERINGS = {
+    "top": ("valeur_fonciere DESC", 1, True),
+    "sample": ("rang_aleatoire", 11, False),
+}
+
+# Tris du mode "top" : colonne, tri décroissant
+SORTS = {
+    "price_desc": ("valeur_fonciere", True),
+    "price_asc": ("valeur_fonciere", False),
+    "date_desc": ("date_mutation", True),
+    "date_asc": ("date_mutation", False),
+    "surface_desc": ("surface_terrain", True),
+    "surface_asc": ("surface_terrain", False),
+}
+DEFAULT_SORT = "price_desc"
+# Position des colonnes triables dans une ligne ventes (fusion des shards)
+SORT_ROW_INDEX = {"valeur_fonciere": 1, "date_mutation": 2, "surface_terrain": 10}
+# Colonnes triables pouvant être NULL : les ventes sans valeur sont écartées du tri
+NULLABLE_SORT_COLUMNS = {"surface_terrain"}
+
+
+def parse_bbox(top_left_raw, bottom_right_raw):
+    """
+    Extrait (lat_min, lat_max, lon_min, lon_max) des paramètres topLeft / bottomRight.
+    Les deux points sont au format "y,x". Les coins opposés peuvent être donnés dans
+    n'importe quel ordre (la carte envoie le coin nord-est en topLeft) : les bornes
+    sont remises dans l'ordre. Lève ValueError ou IndexError si le format est invalide.
+    """
+    top_left = top_left_raw.replace(" ", "").split(',')
+    bottom_right = bottom_right_raw.replace(" ", "").split(',')
+
+    y1, x1 = float(top_left[0]), float(top_left[1])
+    y2, x2 = float(bottom_right[0]), float(bottom_right[1])
+
+    return min(y1, y2), max(y1, y2), min(x1, x2), max(x1, x2)
+
+
+def expand_bbox(lat_min, lat_max, lon_min, lon_max):
+    """Élargit la zone de 20% autour de son centre."""
+    lat_center = (lat_min + lat_max) / 2
+    lon_center = (lon_min + lon_max) / 2
+    lat_range = abs(lat_max - lat_min)
+    lon_range = abs(lon_max - lon_min)
+
+    return (lat_center - (lat_range * 0.6), lat_center + (lat_range * 0.6),
+            lon_center - (lon_range * 0.6), lon_center + (lon_range * 0.6))
+
+
+def parse_price(price_param):
+    """"min,max" -> (min, max) en float, ou None si absent."""
+    if price_param and ',' in price_param:
+        price_min, price_max = map(float, price_param.replace(" ", "").split(','))
+        return price_min, price_max
+    return None
+
+
+def parse_dates(date_param):
+    """"YYYY-MM-DD,YYYY-MM-DD" -> (date_min, date_max) en chaînes, ou None si absent."""
+    if date_param and ',' in date_param:
+        date_min, date_max = date_param.replace(" ", "").split(',')
+        return date_min, date_max
+    return None
+
+
+def build_filters(bbox, price_param=None, date_param=None, zone=None):
+    """
+    Construit la clause WHERE (sans le mot-clé) et ses paramètres.
+    - bbox : (lat_min, lat_max, lon_min, lon_max) déjà élargie, ou None
+    - price_param : "min,max"
+    - date_param : "YYYY-MM-DD,YYYY-MM-DD"
+    - zone : polygone, commune ou rectangle Lambert-93 (voir zones.py)
+    """
+    clauses = []
+    params = []
+
+    if bbox is not None and (zone is None or zone.bbox_prefilter):
+        clauses.append("latitude BETWEEN %s AND %s")
+        clauses.append("longitude BETWEEN %s AND %s")
+        params.extend(bbox)
+
+    price = parse_price(price_param)
+    if price:
+        price_min, price_max = price
+        if price_min == price_max:
+            clauses.append("valeur_fonciere = %s")
+            params.append(price_min)
+        else:
+            clauses.append("valeur_fonciere BETWEEN %s AND %s")
+            params.extend([price_min, price_max])
+
+    # Comparaison directe sur la clé de partition : élagage des partitions à la planification
+    dates = parse_dates(date_param)
+    if dates:
+        date_min, date_max = dates
+        if date_min == date_max:
+            clauses.append("date_mutation = %s::date")
+            params.append(date_min)
+        else:
+            clauses.append("date_mutation BETWEEN %s::date AND %s::date")
+            params.extend([date_min, date_max])
+
+    if zone is not None:
+        clause, zone_params = zone.sql_filter()
+        clauses.append(clause)
+        params.extend(zone_params)
+
+    return " AND ".join(clauses) if clauses else "TRUE", params
+
+
+def sample_years(date_param, data_years):
+    """Nombre d'années (partitions) couvertes par la sélection, data_years au plus."""
+    dates = parse_dates(date_param)
+    if not dates:
+        return max(data_years, 1)
+    span = int(dates[1][:4]) - int(dates[0][:4]) + 1
+    return max(min(span, data_years) if data_years else span, 1)
+
+
+def sample_level(bbox, years=1):
+    """
+    Niveau de grille donnant entre SAMPLE_GRID et 2 * SAMPLE_GRID cellules sur la zone,
+    abaissé d'un cran par facteur 4 du nombre d'années : au plus SAMPLE_PER_CELL ventes
+    par cellule d'une grille SAMPLE_GRID, en moyenne, quelle que soit la plage de dates.
+    """
+    lat_min, lat_max, lon_min, lon_max = bbox
+    span = max(lat_max - lat_min, lon_max - lon_min)
+    if span <= 0:
+        return SAMPLE_LEVELS + 1
+    level = math.floor(math.log2(SAMPLE_BASE_CELL * SAMPLE_GRID / span))
+    while years > 1:
+        level -= 1
+        years = math.ceil(years / 4)
+    return min(max(level, 0), SAMPLE_LEVELS + 1)
+
+
+def ordering(mode, sort=DEFAULT_SORT):
+    """(tri SQL, colonne de la ligne utilisée pour fusionner les shards, tri décroissant)."""
+    if mode != "top":
+        return ORDERINGS[mode]
+    column, descending = SORTS[sort]
+    return f"{column} {'DESC' if descending else 'ASC'}", SORT_ROW_INDEX[column], descending
+
+
+def build_ventes_query(bbox, price_param, date_param, limit, offset, mode="top", zone=None, sort=DEFAULT_SORT,
+                       years=1):
+    """
+    Retourne (requête, paramètres) pour la liste paginée des ventes.
+    years : nombre d'années couvertes par la sélection (mode "sample", voir sample_years).
+    """
+    where, params = build_filters(bbox, price_param, date_param, zone)
+    columns = VENTES_COLUMNS
+    order_by = ordering(mode, sort)[0]
+
+    if mode == "top" and SORTS[sort][0] in NULLABLE_SORT_COLUMNS:
+        # Condition du prédicat de l'index partiel (sql/006_dvf_maison_tris.sql)
+        where = f"{SORTS[sort][0]} IS NOT NULL AND " + where
+
+    if mode == "sample":
+        columns += ", rang_aleatoire"
+        if bbox is None:
+            where = "niveau_echantillon = 0 AND " + where
+        else:
+            # Conditions couvertes par l'index GiST (position, niveau_echantillon). Le niveau
+            # est transmis en entier (int4) : sans conversion en smallint, l'opérateur
+            # int2 <= int4 n'appartient pas à la classe d'opérateurs btree_gist et la
+            # condition devient un filtre appliqué après lecture de toute la zone.
+            lat_min, lat_max, lon_min, lon_max = bbox
+            where = ("point(longitude, latitude) <@ box(point(%s, %s), point(%s, %s)) "
+                     "AND niveau_echantillon <= %s::smallint AND " + where)
+            params = [lon_min, lat_min, lon_max, lat_max, sample_level(bbox, years)] + params
+
+    query = f"""
+        SELECT {columns}
+        FROM {VENTES_TABLE}
+        WHERE {where}
+        ORDER BY {order_by}
+        LIMIT %s OFFSET %s
+    """
+    return query, params + [limit, offset]
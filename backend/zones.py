@@ -0,0 +1,218 @@
+"""
+Zones de recherche au-delà du rectangle WGS84 : polygone GeoJSON, commune, ou
+rectangle en coordonnées Lambert-93.
+
+Chaque zone fournit :
+- bbox : son emprise (lat_min, lat_max, lon_min, lon_max), utilisée comme préfiltre
+  (index lat/lon, tranche de l'instantané, choix des shards) ;
+- sql_filter() : la condition exacte, ajoutée à la clause WHERE ;
+- snapshot_mask(snapshot, selected) : la même condition, vectorisée sur les lignes
+  de l'instantané déjà retenues par le préfiltre.
+
+Polygone : le test d'appartenance suit la règle pair-impair sur l'ensemble des
+anneaux (extérieurs et trous, de tous les polygones d'un MultiPolygon). En SQL il
+utilise le type géométrique natif polygon de PostgreSQL (point <@ polygon), sans
+PostGIS. Le prétraitement (tableaux d'arêtes, pentes, emprise) est mis en cache par
+polygone.
+
+Commune : chaque vente porte son code_commune, la condition est une égalité
+indexée (voir sql/004_dvf_maison_commune.sql). L'emprise de chaque commune est
+calculée une fois puis mise en cache.
+
+Lambert-93 : le rectangle est comparé aux colonnes x_lambert93 / y_lambert93
+calculées à l'import (voir sql/005_dvf_maison_lambert93.sql), sans reprojection des
+ventes. Seule son emprise WGS84 (choix des shards, tranche de l'instantané) est
+calculée, à partir de points de son contour.
+"""
+import functools
+import json
+import threading
+
+import numpy as np
+
+from lambert93 import X_0, from_lambert93
+from ventes_query import VENTES_TABLE
+
+# Systèmes de coordonnées acceptés pour topLeft / bottomRight
+CRS = ("wgs84", "lambert93")
+
+# Nombre maximal de sommets acceptés pour un polygone dessiné
+MAX_VERTICES = 5000
+
+# Marge (degrés) de l'emprise WGS84 d'un rectangle Lambert-93 : couvre l'erreur d'arrondi de
+# from_lambert93 (sub-millimétrique, soit ~1e-8 degré)
+LAMBERT_BBOX_MARGIN = 1e-6
+
+COMMUNE_EXTENT_QUERY = f"""
+    SELECT MIN(latitude), MAX(latitude), MIN(longitude), MAX(longitude)
+    FROM {VENTES_TABLE}
+    WHERE code_commune = %s
+"""
+
+
+class PolygonZone:
+    """Polygone (ou multipolygone) prétraité pour le test point dans polygone."""
+
+    # La condition latitude / longitude de la bbox reste le préfiltre indexé
+    bbox_prefilter = True
+
+    def __init__(self, rings):
+        self.rings = rings
+        vertices = np.concatenate(rings)
+        self.bbox = (float(vertices[:, 1].min()), float(vertices[:, 1].max()),
+                     float(vertices[:, 0].min()), float(vertices[:, 0].max()))
+
+        # Arêtes (x1, y1) -> (x2, y2) de tous les anneaux ; les arêtes horizontales
+        # ne coupent jamais la demi-droite horizontale partant du point
+        starts = np.concatenate([ring[:-1] for ring in rings])
+        ends = np.concatenate([ring[1:] for ring in rings])
+        keep = starts[:, 1] != ends[:, 1]
+        self.x1, self.y1 = starts[keep, 0], starts[keep, 1]
+        self.y2 = ends[keep, 1]
+        self.slope = (ends[keep, 0] - self.x1) / (self.y2 - self.y1)
+        # Clé de regroupement des requêtes identiques (voir single_flight.py)
+        self.key = ("polygon", b"".join(ring.tobytes() for ring in rings))
+
+    def contains(self, latitude, longitude):
+        """Masque des points (tableaux NumPy) situés dans le polygone."""
+        inside = np.zeros(len(latitude), dtype=bool)
+        for x1, y1, y2, slope in zip(self.x1, self.y1, self.y2, self.slope):
+            crosses = (y1 > latitude) != (y2 > latitude)
+            inside ^= crosses & (longitude < x1 + (latitude - y1) * slope)
+        return inside
+
+    def sql_filter(self):
+        point = "point(longitude, latitude)"
+        params = [_polygon_literal(ring) for ring in self.rings]
+        if len(self.rings) == 1:
+            return f"{point} <@ %s::polygon", params
+        # Règle pair-impair : dans un nombre impair d'anneaux
+        parity = " + ".join([f"({point} <@ %s::polygon)::int"] * len(self.rings))
+        return f"({parity}) %% 2 = 1", params
+
+    def snapshot_mask(self, snapshot, selected):
+        return self.contains(snapshot.arrays["latitude"][selected], snapshot.arrays["longitude"][selected])
+
+
+class CommuneZone:
+    """Ventes d'une commune, identifiée par son code INSEE."""
+
+    bbox_prefilter = True
+
+    def __init__(self, code_commune, bbox):
+        self.code_commune = code_commune
+        self.bbox = bbox
+        self.key = ("commune", code_commune)
+
+    def sql_filter(self):
+        return "code_commune = %s", [self.code_commune]
+
+    def snapshot_mask(self, snapshot, selected):
+        code = snapshot.lookup("code_commune", self.code_commune)
+        if code is None:
+            return np.zeros(len(selected), dtype=bool)
+        return snapshot.arrays["code_commune.codes"][selected] == code
+
+
+class Lambert93Zone:
+    """Rectangle (y_min, y_max, x_min, x_max) en mètres Lambert-93."""
+
+    # La condition sur x_lambert93 / y_lambert93 (indexée) remplace celle sur latitude / longitude
+    bbox_prefilter = False
+
+    def __init__(self, y_min, y_max, x_min, x_max):
+        self.bounds = (y_min, y_max, x_min, x_max)
+        self.key = ("lambert93", self.bounds)
+
+        # Sur la conique, la longitude varie de façon monotone le long de chaque côté et la
+        # latitude aussi, sauf sur les côtés horizontaux où elle est extrême au méridien central :
+        # les quatre coins et ces deux points suffisent à borner le rectangle
+        x_central = min(max(X_0, x_min), x_max)
+        x = np.array([x_min, x_max, x_min, x_max, x_central, x_central])
+        y = np.array([y_min, y_min, y_max, y_max, y_min, y_max])
+        latitude, longitude = from_lambert93(x, y)
+        self.bbox = (float(latitude.min()) - LAMBERT_BBOX_MARGIN, float(latitude.max()) + LAMBERT_BBOX_MARGIN,
+                     float(longitude.min()) - LAMBERT_BBOX_MARGIN, float(longitude.max()) + LAMBERT_BBOX_MARGIN)
+
+    def sql_filter(self):
+        return "y_lambert93 BETWEEN %s AND %s AND x_lambert93 BETWEEN %s AND %s", list(self.bounds)
+
+    def snapshot_mask(self, snapshot, selected):
+        y_min, y_max, x_min, x_max = self.bounds
+        x = snapshot.arrays["x_lambert93"][selected]
+        y = snapshot.arrays["y_lambert93"][selected]
+        return (x >= x_min) & (x <= x_max) & (y >= y_min) & (y <= y_max)
+
+
+def _polygon_literal(ring):
+    return "(" + ",".join(f"({float(x)!r},{float(y)!r})" for x, y in ring) + ")"
+
+
+def _ring(coordinates):
+    ring = np.asarray(coordinates, dtype=float)
+    if ring.ndim != 2 or ring.shape[0] < 3 or ring.shape[1] < 2:
+        raise ValueError("chaque anneau doit contenir au moins 3 positions [longitude, latitude]")
+    ring = ring[:, :2]
+    if not np.isfinite(ring).all():
+        raise ValueError("coordonnées non numériques")
+    if not (ring[0] == ring[-1]).all():
+        ring = np.vstack([ring, ring[:1]])
+    return ring
+
+
+@functools.lru_cache(maxsize=256)
+def parse_polygon(geojson):
+    """
+    Polygone GeoJSON (Polygon, MultiPolygon, ou Feature les contenant) -> PolygonZone.
+    Lève ValueError si le texte n'est pas un polygone valide.
+    """
+    try:
+        geometry = json.loads(geojson)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"GeoJSON invalide: {e}")
+    if isinstance(geometry, dict) and geometry.get("type") == "Feature":
+        geometry = geometry.get("geometry")
+    if not isinstance(geometry, dict):
+        raise ValueError("géométrie GeoJSON attendue")
+
+    if geometry.get("type") == "Polygon":
+        polygons = [geometry.get("coordinates")]
+    elif geometry.get("type") == "MultiPolygon":
+        polygons = geometry.get("coordinates")
+    else:
+        raise ValueError(f"type de géométrie non pris en charge: {geometry.get('type')}")
+
+    rings = [_ring(ring) for polygon in polygons or [] for ring in polygon or []]
+    if not rings:
+        raise ValueError("polygone vide")
+    if sum(len(ring) for ring in rings) > MAX_VERTICES:
+        raise ValueError(f"polygone trop détaillé (plus de {MAX_VERTICES} sommets)")
+    return PolygonZone(rings)
+
+
+class CommuneZones:
+    """Zones des communes, avec leur emprise calculée une fois par commune."""
+
+    def __init__(self, router):
+        self.router = router
+        self._zones = {}
+        self._lock = threading.Lock()
+
+    def get(self, code_commune):
+        """CommuneZone du code donné, ou None si aucune vente n'est connue pour cette commune."""
+        zone = self._zones.get(code_commune)
+        if zone is None:
+            extents = [r for r in self.router.fetch_all(COMMUNE_EXTENT_QUERY, [code_commune]) if r[0] is not None]
+            if not extents:
+                return None
+            bbox = (min(float(r[0]) for r in extents), max(float(r[1]) for r in extents),
+                    min(float(r[2]) for r in extents), max(float(r[3]) for r in extents))
+            zone = CommuneZone(code_commune, bbox)
+            with self._lock:
+                self._zones[code_commune] = zone
+        return zone
+
+    def clear(self):
+        """Oublie les emprises calculées (après un import)."""
+        with self._lock:
+            self._zones = {}